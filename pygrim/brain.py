@@ -1,62 +1,141 @@
 from .expr import *
 
 import contextlib
-from itertools import chain, zip_longest
+from fractions import Fraction
+from functools import lru_cache
 import itertools
+import math
 
-def interleave_longest(*iterables):
-    o = object()
-    i = chain.from_iterable(zip_longest(*iterables, fillvalue=o))
-    return [x for x in i if x is not o]
-
-some_nonnumbers = [Undefined, True_, False_, Infinity, -Infinity, Infinity*ConstI, -ConstI*Infinity,
-    UnsignedInfinity, Undefined, Tuple(), Tuple(Tuple()), Tuple(0), Tuple(0, 0), Tuple(0, 1), Tuple(1, 2, 3),
-    Set(), Set(Set()), Set(0), Set(0, 1), Set(-1, 0, 1), ZZ, RR, QQ, CC,
-    Matrix2x2(1, 0, 0, 1)]
-
-some_primes = [2,3,5,7,11,13,17,19,101,1009,10007]
-
-some_integers = [Expr(_n) for _n in [0,1,-1,2,-2,3,-3,4,-4,5,-5,6,-6,7,8,9,
-    10,11,12,24,30,32,40,41,42,60,64,100,120,127,128,255,256,257,720,
-    1000,1729,10**4,10**5,10**6,10**9,10**12,10**15,10**30]]
-
-some_fractions = [Div(1,2),-Div(1,2),Div(3,2),-Div(3,2),Div(5,2),Div(7,2),Div(1,3),Div(2,3),Div(4,3),Div(1,4),Div(3,4),Div(5,4),Div(1,5),Div(1,6),Div(1,24)]
+# Neg(Infinity) is not an atom, so share one instance instead of
+# rebuilding it in every comparison.
+neg_infinity = -Infinity
 
-some_algebraic_irrationals = [Sqrt(2), -Sqrt(2), Sqrt(2)/2, -Sqrt(2)/2, GoldenRatio, 1/GoldenRatio, Sqrt(2)+1, Sqrt(2)-1]
+# Small constants used throughout the rewrite rules. Integers are
+# interned, so these can be tested with `is`.
+expr_zero = Expr(0)
+expr_one = Expr(1)
+expr_neg_one = Expr(-1)
+expr_two = Expr(2)
+expr_half = Div(1, 2)
 
-some_transcendentals = [Pi, 2*Pi, Pi/2, 3*Pi/2, -Pi, -Pi/2, 2*Pi/3, -2*Pi/3, Pi/4, -Pi/4, 3*Pi/4, -3*Pi/4, Pi/6, 5*Pi/6, Log(2), Log(3), ConstE]
+# Primality of small integers is decided by table lookup.
+small_primes_max = 1000
+small_primes = frozenset(p for p in range(2, small_primes_max + 1)
+    if all(p % d for d in range(2, int(p**0.5) + 1)))
 
-some_complex_algebraics = [ConstI, -ConstI, 2*ConstI, -2*ConstI, ConstI/2, -ConstI/2,
-    1+ConstI, 1-ConstI, -1+ConstI, -1-ConstI,
-    2+ConstI, 2-ConstI, -2+ConstI, -2-ConstI,
-    1+2*ConstI, 1-2*ConstI, -1+2*ConstI, -1-2*ConstI,
-    Div(1,2)+ConstI, Div(1,2)-ConstI, Div(3,2)+ConstI,
-    (1+ConstI)/2, (1-ConstI)/2, (-1+ConstI)/2, (-1-ConstI)/2,
-    Exp(Pi*ConstI/3), Exp(2*Pi*ConstI/3), Exp(Pi*ConstI/6), Exp(5*Pi*ConstI/6),
-    Exp(Pi*ConstI/4), Exp(-Pi*ConstI/4), Exp(3*Pi*ConstI/4), Exp(-3*Pi*ConstI/4)]
-
-some_complex_transcendentals = [Pi*ConstI, 2*Pi*ConstI, -Pi*ConstI, Div(1,2)+Pi*ConstI, Div(1,2)-Pi*ConstI, Pi+Sqrt(5)*ConstI,
-    Pi+ConstI, Pi-ConstI, -Pi+ConstI, -Pi-ConstI, Pi/2+ConstI, Pi/2-ConstI,
-    -Pi/2+ConstI, -Pi/2-ConstI, 3*Pi/2+ConstI, 3*Pi/2-ConstI, -3*Pi/2+ConstI, -3*Pi/2-ConstI, 2*Pi+ConstI, 2*Pi-ConstI, -2*Pi+ConstI, -2*Pi-ConstI,
-    5*Pi/2+ConstI, 5*Pi/2-ConstI]
+def interleave_longest(*iterables):
+    """
+    Generates the items of the given iterables in round-robin order,
+    skipping iterables that have been exhausted.
 
-some_rationals = interleave_longest(some_integers, some_fractions)
-some_algebraics = interleave_longest(some_integers, some_fractions, some_algebraic_irrationals, some_complex_algebraics)
-some_reals = interleave_longest(some_integers, some_fractions, some_algebraic_irrationals, some_transcendentals)
-some_extended_reals = interleave_longest(some_integers, some_fractions, some_algebraic_irrationals, some_transcendentals, [Infinity, -Infinity])
-some_complexes = interleave_longest(some_integers, some_fractions, some_algebraic_irrationals, some_complex_algebraics, some_transcendentals, some_complex_transcendentals)
-some_everything = interleave_longest(some_nonnumbers, some_complexes)
+        >>> list(interleave_longest([1, 2, 3], [4], [5, 6]))
+        [1, 4, 5, 2, 6, 3]
 
-some_upper_half_plane = [ConstI, 2*ConstI, ConstI/2, 1+ConstI, 1+2*ConstI, 1+ConstI/2, -1+ConstI, -1+2*ConstI, -1+ConstI/2, 2+ConstI, 3+ConstI,
-    Div(1,2)+ConstI, Div(1,2)+2*ConstI, Div(1,2)+ConstI/2, Div(1,3)+ConstI, Div(1,3)+2*ConstI, Div(1,3)+ConstI/2, Sqrt(2)+Pi*I, -Sqrt(2)+I/Pi]
+    """
+    iterators = [iter(it) for it in iterables]
+    while iterators:
+        remaining = []
+        for it in iterators:
+            for x in it:
+                yield x
+                remaining.append(it)
+                break
+        iterators = remaining
+
+# Test values for some_values(). These are built on first use (and then
+# cached) since most users of Brain never need them.
+
+@lru_cache(maxsize=None)
+def some_nonnumbers():
+    return [Undefined, True_, False_, Infinity, -Infinity, Infinity*ConstI, -ConstI*Infinity,
+        UnsignedInfinity, Undefined, Tuple(), Tuple(Tuple()), Tuple(0), Tuple(0, 0), Tuple(0, 1), Tuple(1, 2, 3),
+        Set(), Set(Set()), Set(0), Set(0, 1), Set(-1, 0, 1), ZZ, RR, QQ, CC,
+        Matrix2x2(1, 0, 0, 1)]
+
+@lru_cache(maxsize=None)
+def some_primes():
+    return [2,3,5,7,11,13,17,19,101,1009,10007]
+
+@lru_cache(maxsize=None)
+def some_integers():
+    return [Expr(_n) for _n in [0,1,-1,2,-2,3,-3,4,-4,5,-5,6,-6,7,8,9,
+        10,11,12,24,30,32,40,41,42,60,64,100,120,127,128,255,256,257,720,
+        1000,1729,10**4,10**5,10**6,10**9,10**12,10**15,10**30]]
+
+@lru_cache(maxsize=None)
+def some_fractions():
+    return [Div(1,2),-Div(1,2),Div(3,2),-Div(3,2),Div(5,2),Div(7,2),Div(1,3),Div(2,3),Div(4,3),Div(1,4),Div(3,4),Div(5,4),Div(1,5),Div(1,6),Div(1,24)]
+
+@lru_cache(maxsize=None)
+def some_algebraic_irrationals():
+    return [Sqrt(2), -Sqrt(2), Sqrt(2)/2, -Sqrt(2)/2, GoldenRatio, 1/GoldenRatio, Sqrt(2)+1, Sqrt(2)-1]
+
+@lru_cache(maxsize=None)
+def some_transcendentals():
+    return [Pi, 2*Pi, Pi/2, 3*Pi/2, -Pi, -Pi/2, 2*Pi/3, -2*Pi/3, Pi/4, -Pi/4, 3*Pi/4, -3*Pi/4, Pi/6, 5*Pi/6, Log(2), Log(3), ConstE]
+
+@lru_cache(maxsize=None)
+def some_complex_algebraics():
+    return [ConstI, -ConstI, 2*ConstI, -2*ConstI, ConstI/2, -ConstI/2,
+        1+ConstI, 1-ConstI, -1+ConstI, -1-ConstI,
+        2+ConstI, 2-ConstI, -2+ConstI, -2-ConstI,
+        1+2*ConstI, 1-2*ConstI, -1+2*ConstI, -1-2*ConstI,
+        Div(1,2)+ConstI, Div(1,2)-ConstI, Div(3,2)+ConstI,
+        (1+ConstI)/2, (1-ConstI)/2, (-1+ConstI)/2, (-1-ConstI)/2,
+        Exp(Pi*ConstI/3), Exp(2*Pi*ConstI/3), Exp(Pi*ConstI/6), Exp(5*Pi*ConstI/6),
+        Exp(Pi*ConstI/4), Exp(-Pi*ConstI/4), Exp(3*Pi*ConstI/4), Exp(-3*Pi*ConstI/4)]
+
+@lru_cache(maxsize=None)
+def some_complex_transcendentals():
+    return [Pi*ConstI, 2*Pi*ConstI, -Pi*ConstI, Div(1,2)+Pi*ConstI, Div(1,2)-Pi*ConstI, Pi+Sqrt(5)*ConstI,
+        Pi+ConstI, Pi-ConstI, -Pi+ConstI, -Pi-ConstI, Pi/2+ConstI, Pi/2-ConstI,
+        -Pi/2+ConstI, -Pi/2-ConstI, 3*Pi/2+ConstI, 3*Pi/2-ConstI, -3*Pi/2+ConstI, -3*Pi/2-ConstI, 2*Pi+ConstI, 2*Pi-ConstI, -2*Pi+ConstI, -2*Pi-ConstI,
+        5*Pi/2+ConstI, 5*Pi/2-ConstI]
+
+@lru_cache(maxsize=None)
+def some_rationals():
+    return list(interleave_longest(some_integers(), some_fractions()))
+
+@lru_cache(maxsize=None)
+def some_algebraics():
+    return list(interleave_longest(some_integers(), some_fractions(), some_algebraic_irrationals(), some_complex_algebraics()))
+
+@lru_cache(maxsize=None)
+def some_reals():
+    return list(interleave_longest(some_integers(), some_fractions(), some_algebraic_irrationals(), some_transcendentals()))
+
+@lru_cache(maxsize=None)
+def some_extended_reals():
+    return list(interleave_longest(some_integers(), some_fractions(), some_algebraic_irrationals(), some_transcendentals(), [Infinity, -Infinity]))
+
+@lru_cache(maxsize=None)
+def some_complexes():
+    return list(interleave_longest(some_integers(), some_fractions(), some_algebraic_irrationals(), some_complex_algebraics(), some_transcendentals(), some_complex_transcendentals()))
+
+@lru_cache(maxsize=None)
+def some_everything():
+    return list(interleave_longest(some_nonnumbers(), some_complexes()))
+
+@lru_cache(maxsize=None)
+def some_upper_half_plane():
+    return [ConstI, 2*ConstI, ConstI/2, 1+ConstI, 1+2*ConstI, 1+ConstI/2, -1+ConstI, -1+2*ConstI, -1+ConstI/2, 2+ConstI, 3+ConstI,
+        Div(1,2)+ConstI, Div(1,2)+2*ConstI, Div(1,2)+ConstI/2, Div(1,3)+ConstI, Div(1,3)+2*ConstI, Div(1,3)+ConstI/2, Sqrt(2)+Pi*I, -Sqrt(2)+I/Pi]
 
 def And_terms(expr):
-    if expr.head() == And:
-        for x in expr.args():
-            for t in And_terms(x):
-                yield t
-    else:
-        yield expr
+    """
+    Returns the list of terms of a (possibly nested) And expression,
+    in left-to-right order.
+    """
+    terms = []
+    stack = [expr]
+    _And = And
+    while stack:
+        expr = stack.pop()
+        if expr.head() == _And:
+            stack.extend(reversed(expr.args()))
+        else:
+            terms.append(expr)
+    return terms
 
 def randomized_cartesian(*lists):
     from random import randrange
@@ -81,267 +160,1072 @@ def randomized_cartesian(*lists):
         seen.add(idx)
 
 
-# todo: design a real algorithm
-def custom_cartesian(*lists):
-    if len(lists) == 1:
-        for v in lists[0]:
-            yield (v,)
-    elif len(lists) == 2:
-        N = 0
-        A = len(lists[0])
-        B = len(lists[1])
-        for N in range(max(A,B)):
-            for i in range(N+1):
-                a = i
-                b = N - i
-                if 0 <= a < A and 0 <= b < B:
-                    yield lists[0][a], lists[1][b]
-    elif len(lists) == 3:
-        N = 0
-        A = len(lists[0])
-        B = len(lists[1])
-        C = len(lists[2])
-        for N in range(max(A,B,C)):
-            for i in range(N+1):
-                for j in range(N+1):
-                    a = i
-                    b = N - i
-                    c = N - i - j
-                    if 0 <= a < A and 0 <= b < B and 0 <= c < C:
-                        yield lists[0][a], lists[1][b], lists[2][c]
-    elif len(lists) == 4:
-        N = 0
-        A = len(lists[0])
-        B = len(lists[1])
-        C = len(lists[2])
-        D = len(lists[3])
-        for N in range(max(A,B,C,D)):
-            for i in range(N+1):
-                for j in range(N+1):
-                    for k in range(N+1):
-                        a = i
-                        b = N - i
-                        c = N - i - j
-                        d = N - i - j - k
-                        if 0 <= a < A and 0 <= b < B and 0 <= c < C and 0 <= d < D:
-                            yield lists[0][a], lists[1][b], lists[2][c], lists[3][d]
-    elif len(lists) == 5:
-        N = 0
-        A = len(lists[0])
-        B = len(lists[1])
-        C = len(lists[2])
-        D = len(lists[3])
-        E = len(lists[4])
-        for N in range(max(A,B,C,D,E)):
-            for i in range(N+1):
-                for j in range(N+1):
-                    for k in range(N+1):
-                        for l in range(N+1):
-                            a = i
-                            b = N - i
-                            c = N - i - j
-                            d = N - i - j - k
-                            e = N - i - j - k - l
-                            if 0 <= a < A and 0 <= b < B and 0 <= c < C and 0 <= d < D and 0 <= e < E:
-                                yield lists[0][a], lists[1][b], lists[2][c], lists[3][d], lists[4][d]
-    elif len(lists) == 6:
-        N = 0
-        A = len(lists[0])
-        B = len(lists[1])
-        C = len(lists[2])
-        D = len(lists[3])
-        E = len(lists[4])
-        F = len(lists[4])
-        for N in range(max(A,B,C,D,E,F)):
-            for i in range(N+1):
-                for j in range(N+1):
-                    for k in range(N+1):
-                        for l in range(N+1):
-                            for m in range(N+1):
-                                a = i
-                                b = N - i
-                                c = N - i - j
-                                d = N - i - j - k
-                                e = N - i - j - k - l
-                                f = N - i - j - k - l - m
-                                if 0 <= a < A and 0 <= b < B and 0 <= c < C and 0 <= d < D and 0 <= e < E and 0 <= f < F:
-                                    yield lists[0][a], lists[1][b], lists[2][c], lists[3][d], lists[4][d], lists[5][d]
+_diagonal_cartesian_functions = {}
+
+def _diagonal_cartesian_function(n):
+    """
+    Returns a generator function taking n lists and enumerating their
+    cartesian product diagonal by diagonal. The function is generated
+    (and cached) for each arity, with one nested loop per list; the loop
+    bounds are computed from the remaining index budget so that no
+    candidate index tuple has to be rejected.
+    """
+    if n in _diagonal_cartesian_functions:
+        return _diagonal_cartesian_functions[n]
+    L = ["l%i" % i for i in range(n)]
+    code = []
+    code.append("def cartesian(%s):" % ", ".join(L))
+    if n == 0:
+        code.append("    yield ()")
+    elif n == 1:
+        code.append("    for x0 in l0:")
+        code.append("        yield (x0,)")
     else:
-        for v in itertools.product(*lists):
-            yield v
+        code.append("    %s = %s" % (", ".join("n%i" % i for i in range(n)),
+                                     ", ".join("len(l%i)" % i for i in range(n))))
+        code.append("    if not (%s):" % " and ".join("n%i" % i for i in range(n)))
+        code.append("        return")
+        # t_k = number of index steps available to lists k+1, ..., n-1
+        for k in range(n - 1):
+            code.append("    t%i = %s" % (k, " + ".join("n%i" % i for i in range(k + 1, n)) + " - %i" % (n - k - 1)))
+        code.append("    for r0 in range(t0 + n0):")
+        indent = "        "
+        for k in range(n - 1):
+            code.append(indent + "for i%i in range(max(0, r%i - t%i), min(n%i, r%i + 1)):" % (k, k, k, k, k))
+            indent += "    "
+            code.append(indent + "x%i = l%i[i%i]" % (k, k, k))
+            code.append(indent + "r%i = r%i - i%i" % (k + 1, k, k))
+        code.append(indent + "yield (%s)" % ", ".join(["x%i" % k for k in range(n - 1)] + ["l%i[r%i]" % (n - 1, n - 1)]))
+    namespace = {}
+    exec("\n".join(code), namespace)
+    f = namespace["cartesian"]
+    _diagonal_cartesian_functions[n] = f
+    return f
+
+# Generated up front for the arities used in practice.
+_diagonal_cartesian_small = tuple(_diagonal_cartesian_function(n) for n in range(5))
 
-additive_ops = set([Pos, Neg, Add, Sub])
-ring_arithmetic_ops = set([Pos, Neg, Add, Sub, Mul])
-field_arithmetic_ops = set([Pos, Neg, Add, Sub, Mul, Div])
-arithmetic_ops = set([Pos, Neg, Add, Sub, Mul, Div, Sqrt, Pow])
-number_part_ops = set([Sign, Abs, Re, Im, Conjugate, Floor, Ceil])
+def custom_cartesian(*lists):
+    """
+    Generates the cartesian product of the given lists, ordered by the
+    sum of the indices (diagonal by diagonal), so that tuples made from
+    early elements of all the lists come first.
 
-positive_real_constants = set([Pi, ConstE, ConstGamma, ConstCatalan, GoldenRatio])
-irrational_constants = set([Pi, ConstE, GoldenRatio])
-complex_constants = positive_real_constants.union(set([ConstI]))
+        >>> list(custom_cartesian([0, 1, 2], "ab"))
+        [(0, 'a'), (0, 'b'), (1, 'a'), (1, 'b'), (2, 'a'), (2, 'b')]
+        >>> list(custom_cartesian([0, 1, 2], [0, 1, 2]))[:6]
+        [(0, 0), (0, 1), (1, 0), (0, 2), (1, 1), (2, 0)]
 
-set_logic_ops = set([Not, And, Or, Implies, Equal, NotEqual, Element, NotElement, Less, LessEqual, Greater, GreaterEqual])
+    """
+    n = len(lists)
+    if n < len(_diagonal_cartesian_small):
+        return _diagonal_cartesian_small[n](*lists)
+    return _diagonal_cartesian_function(n)(*lists)
+
+# Sets of symbols used in membership tests. Expr hashes are cached,
+# so frozenset lookups are much cheaper than scanning tuples (which
+# calls Expr.__eq__ for each item).
+
+additive_ops = frozenset([Pos, Neg, Add, Sub])
+ring_arithmetic_ops = frozenset([Pos, Neg, Add, Sub, Mul])
+field_arithmetic_ops = frozenset([Pos, Neg, Add, Sub, Mul, Div])
+arithmetic_ops = frozenset([Pos, Neg, Add, Sub, Mul, Div, Sqrt, Pow])
+number_part_ops = frozenset([Sign, Abs, Re, Im, Conjugate, Floor, Ceil])
+
+unary_additive_ops = frozenset([Pos, Neg])
+nonnegative_preserving_ops = frozenset([Pos, Add, Mul, Exp, Sqrt])
+positive_preserving_ops = frozenset([Pos, Add, Mul, Sqrt])
+positive_real_functions = frozenset([Exp, Cosh])
+real_preserving_ops = frozenset([Pos, Neg, Add, Sub, Mul, Exp, Sin, Cos])
+real_valued_ops = frozenset([Floor, Ceil, Re, Im, Abs, Arg])
+complex_preserving_ops = frozenset([Pos, Neg, Add, Sub, Mul, Sqrt, Exp, Sin, Cos, Abs, RealAbs, Asin, Acos, Floor, Ceil])
+trigonometric_functions = frozenset([Sin, Cos, Tan, Cot, Csc, Sec])
+
+positive_real_constants = frozenset([Pi, ConstE, ConstGamma, ConstCatalan, GoldenRatio])
+real_constants = frozenset([Pi, ConstGamma, ConstE, ConstCatalan])
+irrational_constants = frozenset([Pi, ConstE, GoldenRatio])
+complex_constants = positive_real_constants.union([ConstI])
+
+set_logic_ops = frozenset([Not, And, Or, Implies, Equal, NotEqual, Element, NotElement, Less, LessEqual, Greater, GreaterEqual])
+
+# Proper subsets of each standard domain, i.e. the domains x cannot
+# belong to when it is known not to belong to the given domain.
+domain_subsets = {
+    CC: (RR, QQ, ZZ, PP, HH, AlgebraicNumbers),
+    RR: (QQ, ZZ, PP),
+    QQ: (ZZ, PP),
+    ZZ: (PP,),
+    AlgebraicNumbers: (QQ, ZZ),
+}
+
+# Supersets of each standard domain.
+domain_supersets = {
+    RR: (CC,),
+    QQ: (RR, CC, AlgebraicNumbers),
+    ZZ: (QQ, RR, CC, AlgebraicNumbers),
+    HH: (CC,),
+    PP: (ZZGreaterEqual(2), ClosedOpenInterval(2, Infinity), ZZ, QQ, RR, CC, AlgebraicNumbers),
+    AlgebraicNumbers: (CC,),
+}
+
+integer_set_supersets = (ZZ, QQ, RR, CC, AlgebraicNumbers)
 
 def infer_not_domain(inferences, x, dom):
+    # the flattened terms of a union are never unions themselves
     if dom.head() == Union:
-        for dom2 in dom.head_args_flattened(Union):
-            infer_not_domain(inferences, x, dom2)
-        return
-    def add(x, dom):
-         inferences.add(NotElement(x, dom))
-    add(x, dom)
-    # singleton set
-    if dom.head() == Set and len(dom.args()) == 1:
-        inferences.add(NotEqual(x, dom.args()[0]))
-    if dom == CC:
-        add(x, RR)
-        add(x, QQ)
-        add(x, ZZ)
-        add(x, PP)
-        add(x, HH)
-        add(x, AlgebraicNumbers)
-    elif dom == RR:
-        add(x, QQ)
-        add(x, ZZ)
-        add(x, PP)
-    elif dom == QQ:
-        add(x, ZZ)
-        add(x, PP)
-    elif dom == ZZ:
-        add(x, PP)
-    elif dom == AlgebraicNumbers:
-        add(x, QQ)
-        add(x, ZZ)
+        doms = dom.head_args_flattened(Union)
+    else:
+        doms = (dom,)
+    for dom in doms:
+        inferences.add(NotElement(x, dom))
+        # singleton set
+        if dom.head() == Set and len(dom.args()) == 1:
+            inferences.add(NotEqual(x, dom.args()[0]))
+        for dom2 in domain_subsets.get(dom, ()):
+            inferences.add(NotElement(x, dom2))
+
+def _infer_integer_set(inferences, x, dom):
+    for dom2 in integer_set_supersets:
+        inferences.add(Element(x, dom2))
+    if dom.head() == ZZGreaterEqual:
+        n, = dom.args()
+        if n.is_integer():
+            inferences.add(GreaterEqual(x, n))
+
+# (lower endpoint open, upper endpoint open)
+interval_types = {
+    OpenInterval: (True, True),
+    ClosedInterval: (False, False),
+    OpenClosedInterval: (True, False),
+    ClosedOpenInterval: (False, True),
+}
+
+def _bound_greater_equal(a, v):
+    """
+    Checks whether the expression a is known to satisfy a >= v
+    where v is a Python int.
+    """
+    if a.is_integer():
+        return int(a) >= v
+    return GreaterEqual(a, v).simple() is True_
+
+def _bound_less_equal(b, v):
+    """
+    Checks whether the expression b is known to satisfy b <= v
+    where v is a Python int.
+    """
+    if b.is_integer():
+        return int(b) <= v
+    return LessEqual(b, v).simple() is True_
+
+def _bound_is_real(a):
+    return a.is_integer() or Element(a, RR).simple() is True_
+
+def _infer_interval(inferences, x, dom):
+    lower_open, upper_open = interval_types[dom.head()]
+    a, b = dom.args()
+    if lower_open:
+        lower, lower_rev = Less, Greater
+    else:
+        lower, lower_rev = LessEqual, GreaterEqual
+    if upper_open:
+        upper, upper_rev = Less, Greater
+    else:
+        upper, upper_rev = LessEqual, GreaterEqual
+    inferences.add(lower(a, x))
+    inferences.add(upper(x, b))
+    inferences.add(lower_rev(x, a))
+    inferences.add(upper_rev(b, x))
+    # a closed endpoint must be finite for x to be real
+    # todo: simplify based on other assumptions?
+    if (lower_open or _bound_is_real(a)) and (upper_open or _bound_is_real(b)):
+        inferences.add(Element(x, RR))
+        inferences.add(Element(x, CC))
+    for v in (-1, 0, 1):
+        if _bound_greater_equal(a, v):
+            inferences.add(lower_rev(x, v))
+            inferences.add(lower(v, x))
+        if _bound_less_equal(b, v):
+            inferences.add(upper(x, v))
+            inferences.add(upper_rev(v, x))
+
+# Inference rules for domains given by a head applied to arguments.
+domain_head_handlers = {
+    ZZGreaterEqual: _infer_integer_set,
+    ZZLessEqual: _infer_integer_set,
+    Range: _infer_integer_set,
+    OpenInterval: _infer_interval,
+    ClosedInterval: _infer_interval,
+    OpenClosedInterval: _infer_interval,
+    ClosedOpenInterval: _infer_interval,
+}
 
 def infer_domain(inferences, x, dom):
+    # the flattened terms of an intersection are never intersections themselves
     if dom.head() == Intersection:
-        for dom2 in dom.head_args_flattened(Intersection):
-            infer_domain(inferences, x, dom2)
-        return
-    def add(x, dom):
-         inferences.add(Element(x, dom))
-    add(x, dom)
-    # singleton set
-    if dom.head() == Set and len(dom.args()) == 1:
-        inferences.add(Equal(x, dom.args()[0]))
-    if dom == RR:
-        add(x, CC)
-    elif dom == QQ:
-        add(x, RR)
-        add(x, CC)
-        add(x, AlgebraicNumbers)
-    elif dom == ZZ:
-        add(x, QQ)
-        add(x, RR)
-        add(x, CC)
-        add(x, AlgebraicNumbers)
-    elif dom == HH:
-        add(x, CC)
-        inferences.add(Greater(Im(x), 0))
-        inferences.add(Less(0, Im(x)))
-    elif dom == PP:
-        add(x, ZZGreaterEqual(2))
-        add(x, ClosedOpenInterval(2, Infinity))
-        add(x, ZZ)
-        add(x, QQ)
-        add(x, RR)
-        add(x, CC)
-        add(x, AlgebraicNumbers)
-    elif dom == AlgebraicNumbers:
-        add(x, CC)
-    elif dom.head() in (ZZGreaterEqual, ZZLessEqual, Range):
-        add(x, ZZ)
-        add(x, QQ)
-        add(x, RR)
-        add(x, CC)
-        add(x, AlgebraicNumbers)
-        if dom.head() == ZZGreaterEqual:
-            n, = dom.args()
-            if n.is_integer():
-                inferences.add(GreaterEqual(x, n))
-    elif dom.head() == OpenInterval:
-        add(x, RR)
-        add(x, CC)
-        a, b = dom.args()
-        inferences.add(Less(a, x))
-        inferences.add(Less(x, b))
-        inferences.add(Greater(x, a))
-        inferences.add(Greater(b, x))
-        for v in (-1, 0, 1):
-            if GreaterEqual(a, v).simple() == True_:
-                inferences.add(Greater(x, v))
-                inferences.add(Less(v, x))
-            if LessEqual(b, v).simple() == True_:
-                inferences.add(Less(x, v))
-                inferences.add(Greater(v, x))
-    elif dom.head() == ClosedInterval:
-        a, b = dom.args()
-        inferences.add(LessEqual(a, x))
-        inferences.add(LessEqual(x, b))
-        inferences.add(GreaterEqual(x, a))
-        inferences.add(GreaterEqual(b, x))
-        # todo: simplify based on other assumptions?
-        if Element(a, RR).simple() == True_ and Element(b, RR).simple() == True_:
-            add(x, RR)
-            add(x, CC)
-        for v in (-1, 0, 1):
-            if GreaterEqual(a, v).simple() == True_:
-                inferences.add(GreaterEqual(x, v))
-                inferences.add(LessEqual(v, x))
-            if LessEqual(b, v).simple() == True_:
-                inferences.add(LessEqual(x, v))
-                inferences.add(GreaterEqual(v, x))
-    elif dom.head() == OpenClosedInterval:
-        a, b = dom.args()
-        inferences.add(Less(a, x))
-        inferences.add(LessEqual(x, b))
-        inferences.add(Greater(x, a))
-        inferences.add(GreaterEqual(b, x))
-        if Element(b, RR).simple() == True_:
-            add(x, RR)
-            add(x, CC)
-        for v in (-1, 0, 1):
-            if GreaterEqual(a, v).simple() == True_:
-                inferences.add(Greater(x, v))
-                inferences.add(Less(v, x))
-            if LessEqual(b, v).simple() == True_:
-                inferences.add(LessEqual(x, v))
-                inferences.add(GreaterEqual(v, x))
-    elif dom.head() == ClosedOpenInterval:
-        a, b = dom.args()
-        inferences.add(LessEqual(a, x))
-        inferences.add(Less(x, b))
-        inferences.add(GreaterEqual(x, a))
-        inferences.add(Greater(b, x))
-        if Element(a, RR).simple() == True_:
-            add(x, RR)
-            add(x, CC)
-        for v in (-1, 0, 1):
-            if GreaterEqual(a, v).simple() == True_:
-                inferences.add(GreaterEqual(x, v))
-                inferences.add(LessEqual(v, x))
-            if LessEqual(b, v).simple() == True_:
-                inferences.add(Less(x, v))
-                inferences.add(Greater(v, x))
+        doms = dom.head_args_flattened(Intersection)
+    else:
+        doms = (dom,)
+    for dom in doms:
+        head = dom.head()
+        inferences.add(Element(x, dom))
+        if head is None:
+            for dom2 in domain_supersets.get(dom, ()):
+                inferences.add(Element(x, dom2))
+            if dom == HH:
+                inferences.add(Greater(Im(x), 0))
+                inferences.add(Less(0, Im(x)))
+        else:
+            # singleton set
+            if head == Set and len(dom.args()) == 1:
+                inferences.add(Equal(x, dom.args()[0]))
+            handler = domain_head_handlers.get(head)
+            if handler is not None:
+                handler(inferences, x, dom)
+
+
+# Bit flags for membership of an expression in the standard domains;
+# see Brain.element_bits and Brain.not_element_bits.
+ZZ_bit = 1
+QQ_bit = 2
+RR_bit = 4
+CC_bit = 8
+AlgebraicNumbers_bit = 16
+PP_bit = 32
+HH_bit = 64
+
+domain_bits = ((ZZ, ZZ_bit), (QQ, QQ_bit), (RR, RR_bit), (CC, CC_bit),
+    (AlgebraicNumbers, AlgebraicNumbers_bit), (PP, PP_bit), (HH, HH_bit))
+
+# The domains closed under the ring operations (Pos, Neg, Add, Sub, Mul).
+ring_domain_bits = ZZ_bit | QQ_bit | RR_bit | CC_bit | AlgebraicNumbers_bit
+
+# Bit flags for known relations between an expression x and zero;
+# see Brain.zero_relation_bits.
+Equal_zero_bit = 1
+NotEqual_zero_bit = 2
+Greater_zero_bit = 4
+Less_zero_bit = 8
+GreaterEqual_zero_bit = 16
+LessEqual_zero_bit = 32
+
+zero_relation_bits = {Equal: Equal_zero_bit, NotEqual: NotEqual_zero_bit,
+    Greater: Greater_zero_bit, Less: Less_zero_bit,
+    GreaterEqual: GreaterEqual_zero_bit, LessEqual: LessEqual_zero_bit}
+
+# Scores of atoms (other than integers) for Brain.complexity.
+atom_complexity = {}
+for _atoms, _score in (
+        ((True_, False_), 1),
+        ((Add, Sub, Neg, Pos, Mul), 10),
+        ((Div, Sqrt, GoldenRatio, ConstI), 20),
+        ((Pi, ConstE, Pow, Exp, Log, Sin, Cos, Tan, Sinh, Cosh, Tanh), 100),
+        ((Gamma, Erf, Erfc, Erfi, RiemannZeta, ConstGamma, ConstCatalan), 1000)):
+    for _atom in _atoms:
+        atom_complexity[_atom] = _score
+
+def simple_dispatch_table(cls):
+    """
+    Returns a dict mapping symbol names to the simple_<name> methods
+    defined by the class cls.
+    """
+    table = {}
+    for name in dir(cls):
+        if name.startswith("simple_"):
+            f = getattr(cls, name)
+            if callable(f):
+                table[name[7:]] = f
+    # Grouping heads simplify to their single argument; dispatch them
+    # straight to simple() instead of through a wrapper method.
+    for name in ("Pos", "Parentheses", "Brackets", "Braces"):
+        table.setdefault(name, cls.simple)
+    return table
+
+# Default for dict lookups where None is a valid cached value.
+_MISSING = object()
+
+def cached_predicate(f):
+    """
+    Decorator for Brain predicates taking a single expression.
+    The result (True, False, or None) is stored in the simple_cache of
+    the brain under the key (name, x), so that it is discarded together
+    with other cached data when the assumptions change.
+    """
+    name = f.__name__
+    def wrapper(self, x):
+        key = (name, x)
+        cache = self.simple_cache
+        v = cache.get(key, _MISSING)
+        if v is not _MISSING:
+            return v
+        v = f(self, x)
+        cache[key] = v
+        return v
+    wrapper.__name__ = name
+    wrapper.__doc__ = f.__doc__
+    return wrapper
+
+# Rules proving that x = head(...) is real, complex or positive from
+# properties of the arguments. Each handler takes the brain and x and
+# returns True if the rule applies, or None to fall back to numerical
+# and exact evaluation.
+
+def _real_args_real(brain, x):
+    if x.head() in ring_arithmetic_ops and brain.arithmetic_domain_bits(x) & RR_bit:
+        return True
+    if all(brain.is_real(arg) for arg in x.args()):
+        return True
+
+def _real_complex_arg(brain, x):
+    z, = x.args()
+    if brain.is_complex(z):
+        return True
+
+def _real_Div(brain, x):
+    p, q = x.args()
+    if brain.is_real(p) and brain.is_real(q) and brain.is_not_zero(q):
+        return True
+
+def _real_Sqrt(brain, x):
+    arg, = x.args()
+    if brain.is_real(arg) and brain.is_nonnegative(arg):
+        return True
+
+def _real_Log(brain, x):
+    arg, = x.args()
+    if brain.is_real(arg) and brain.is_positive(arg):
+        return True
+
+def _real_Pow(brain, x):
+    base, exp = x.args()
+    if brain.is_real(base) and brain.is_real(exp):
+        if brain.is_positive(base) and brain.is_positive(exp):
+            return True
+        if brain.is_not_zero(base) and brain.is_integer(exp):
+            return True
+        if brain.is_integer(exp) and brain.is_nonnegative(exp):
+            return True
 
+def _real_Atan2(brain, x):
+    t, u = x.args()
+    if brain.is_real(t) and brain.is_real(u):
+        return True
+
+real_head_handlers = {head: _real_args_real for head in real_preserving_ops}
+real_head_handlers.update({head: _real_complex_arg for head in real_valued_ops})
+real_head_handlers.update({
+    Div: _real_Div,
+    Sqrt: _real_Sqrt,
+    Log: _real_Log,
+    Pow: _real_Pow,
+    Atan2: _real_Atan2,
+})
+
+def _complex_args_complex(brain, x):
+    if x.head() in ring_arithmetic_ops and brain.arithmetic_domain_bits(x) & CC_bit:
+        return True
+    if all(brain.is_complex(arg) for arg in x.args()):
+        return True
+
+def _complex_Div(brain, x):
+    p, q = x.args()
+    if brain.is_complex(p) and brain.is_complex(q) and brain.is_not_zero(q):
+        return True
+
+def _complex_Pow(brain, x):
+    base, exp = x.args()
+    # todo: more generally for re(exp) > 0
+    if brain.is_complex(base) and brain.is_complex(exp) and \
+        (brain.is_not_zero(base) or (brain.is_real(exp) and brain.is_positive(exp))):
+        return True
+
+def _complex_Log(brain, x):
+    arg, = x.args()
+    if brain.is_complex(arg) and brain.is_not_zero(arg):
+        return True
+
+def _complex_DedekindEta(brain, x):
+    tau, = x.args()
+    # improve...
+    if brain.element_bits.get(tau, 0) & HH_bit:
+        return True
+    if brain.is_complex(tau) and brain.is_positive(brain.simple(Im(tau))):
+        return True
+
+complex_head_handlers = {head: _complex_args_complex for head in complex_preserving_ops}
+complex_head_handlers.update({
+    Div: _complex_Div,
+    Pow: _complex_Pow,
+    Log: _complex_Log,
+    Atan2: _real_Atan2,
+    DedekindEta: _complex_DedekindEta,
+})
+
+# Only consulted for x already known to be real.
+
+def _positive_real_arg(brain, x):
+    t, = x.args()
+    if brain.is_real(t):
+        return True
+
+def _positive_args_positive(brain, x):
+    if all(brain.is_positive(arg) for arg in x.args()):
+        return True
+
+def _positive_Div(brain, x):
+    p, q = x.args()
+    if brain.is_positive(p) and brain.is_positive(q):
+        return True
+
+def _positive_Pow(brain, x):
+    base, exp = x.args()
+    if brain.is_positive(base):
+        return True
+
+positive_head_handlers = {head: _positive_real_arg for head in positive_real_functions}
+positive_head_handlers.update({head: _positive_args_positive for head in positive_preserving_ops})
+positive_head_handlers.update({
+    Div: _positive_Div,
+    Pow: _positive_Pow,
+})
+
+# Closed forms of exp(2 pi i p/q) keyed by the reduced fraction (p, q),
+# see Brain.simple_Exp_two_pi_i_k_n.
+exp_two_pi_i_table = {
+    (0, 1): expr_one,
+    (1, 2): expr_neg_one,
+    (1, 4): ConstI,
+    (3, 4): -ConstI,
+    (1, 8): Sqrt(2)/2 * (1 + ConstI),
+    (3, 8): Sqrt(2)/2 * (-1 + ConstI),
+    (5, 8): Sqrt(2)/2 * (-1 - ConstI),
+    (7, 8): Sqrt(2)/2 * (1 - ConstI),
+    (1, 3): (-1 + Sqrt(3)*ConstI)/2,
+    (2, 3): (-1 - Sqrt(3)*ConstI)/2,
+    (1, 6): (1 + Sqrt(3)*ConstI)/2,
+    (5, 6): (1 - Sqrt(3)*ConstI)/2,
+}
+
+# Closed forms of sin(pi v/120) for 0 <= v <= 60, see Brain.simple_Sin.
+sin_pi_120_table = {
+    0: expr_zero,
+    10: (Sqrt(2)*(Sqrt(3)-1))/4,   # todo: sqrt(6)?
+    12: (Sqrt(5)-1)/4,
+    15: Sqrt(2-Sqrt(2))/2,
+    20: Div(1,2),
+    30: Sqrt(2)/2,
+    36: (Sqrt(5)+1)/4,
+    40: Sqrt(3)/2,
+    45: Sqrt(Sqrt(2)+2)/2,
+    50: (Sqrt(2)*(Sqrt(3)+1))/4,
+    60: expr_one,
+}
+
+# Closed forms of Gamma(p/q) for 0 < p < q, keyed by (q, p)
+# (https://arxiv.org/abs/math/0403510).
+# A tuple (ppi, qpi, p2, q2, p3, q3, p5, q5, r, s) stands for
+# Pi^(ppi/qpi) 2^(p2/q2) 3^(p3/q3) 5^(p5/q5) r s, where the power
+# product is simplified by the brain.
+def _gamma_fmpq_table():
+    S = Sqrt
+    G = lambda a, b: Gamma(Div(a, b))
+    A = 5 + S(5)
+    B = 5 - S(5)
+    C = S(5 + 2*S(5))
+    D = S(5 - 2*S(5))
+    return {
+        (2, 1): Sqrt(Pi),
+        (3, 2): 2*Pi/(Sqrt(3) * G(1,3)),
+        (4, 3): Sqrt(2) * Pi / G(1,4),
+        (5, 3): Pi * S(2) / S(5) * S(B) * G(2, 5)**-1,
+        (5, 4): Pi * S(2) / S(5) * S(A) * G(1, 5)**-1,
+        (6, 1): Gamma(Div(1,3))**2 * Sqrt(3) / (Sqrt(Pi) * Pow(2,Div(1,3))),
+        (6, 5): 2*Pow(Pi,Div(3,2)) * Pow(2,Div(1,3)) / (Sqrt(3) * Gamma(Div(1,3))**2),
+        (8, 3): Sqrt(Pi) * S(S(2)-1) * G(1,4)**-1 * G(1,8),
+        (8, 5): Sqrt(Pi) * 2**Div(3,4) * G(1,4) * G(1,8)**-1,
+        (8, 7): Pi * 2**Div(3,4) * S(S(2)+1) * G(1,8)**-1,
+        (10, 1): (-1, 2, -7, 10, 0, 1, 0, 1, S(A), G(1,5) * G(2,5)),
+        (10, 3): (1, 2, -3, 5, 0, 1, -1, 2, B, G(1,5) * G(2,5)**-1),
+        (10, 7): Sqrt(Pi) * 2**Div(3,5) * G(1,5)**-1 * G(2,5),
+        (10, 9): (3, 2, 7, 10, 0, 1, -1, 2, S(A), G(1,5)**-1 * G(2,5)**-1),
+        (12, 1): (-1, 2, -1, 4, 3, 8, 0, 1, S(S(3)+1), G(1,3) * G(1,4)),
+        (12, 5): (1, 2, 1, 4, -1, 8, 0, 1, S(S(3)-1), G(1,4) * G(1,3)**-1),
+        (12, 7): (1, 2, 1, 4, 1, 8, 0, 1, S(S(3)-1), G(1,3) * G(1,4)**-1),
+        (12, 11): (3, 2, 3, 4, -3, 8, 0, 1, S(S(3)+1), G(1,3)**-1 * G(1,4)**-1),
+        (15, 2): (0, 1, -1, 1, -7, 20, -1, 3, S(B) * S(S(15)-D), G(1,3)**-1 * G(2,5) * G(1,15)),
+        (15, 4): (0, 1, -3, 2, -3, 10, -1, 2, S(A) * S(S(15)-C) * S(S(15)-D), G(1,5)**-1 * G(2,5) * G(1,15)),
+        (15, 7): (0, 1, -1, 1, 9, 20, -1, 6, S(B) * S(S(15)+D), G(1,3) * G(1,5) * G(1,15)**-1),
+        (15, 8): (1, 1, 1, 2, -9, 20, -1, 3, S(S(15)-C), G(1,3)**-1 * G(1,5)**-1 * G(1,15)),
+        (15, 11): 2 * Pi * 3**Div(3,10) * G(1,5) * G(2,5)**-1 * G(1,15)**-1,
+        (15, 13): (1, 1, 1, 2, 7, 20, -1, 6, S(S(15)+C), G(1,3) * G(2,5)**-1 * G(1,15)**-1),
+        (15, 14): (1, 1, -1, 2, 0, 1, -1, 2, S(A) * S(S(15)+C) * S(S(15)+D), G(1,15)**-1),
+        (20, 3): (1, 2, -21, 20, 0, 1, -7, 8, B * S(S(10)-S(B)), G(2,5)**-1 * G(1,20)),
+        (20, 7): (1, 2, -3, 20, 0, 1, -3, 8, S(S(10)-S(A)), G(1,5)**-1 * G(1,20)),
+        (20, 9): (1, 1, -1, 5, 0, 1, -1, 2, S(S(10)-S(A)) * S(S(10)-S(B)), G(1,5)**-1 * G(2,5)**-1 * G(1,20)),
+        (20, 11): 2**Div(1,5) * Sqrt(A) * G(1,5) * G(2,5) * G(1,20)**-1,
+        (20, 13): (1, 2, 3, 20, 0, 1, -1, 8, S(B) * S(S(10)+S(B)), G(1,5) * G(1,20)**-1),
+        (20, 17): (1, 2, 1, 20, 0, 1, -1, 8, S(A) * S(S(10)+S(A)), G(2,5) * G(1,20)**-1),
+        (20, 19): (1, 1, 0, 1, 0, 1, -1, 2, S(A) * S(S(10)+S(A)) * S(S(10)+S(B)), G(1,20)**-1),
+        (24, 5): (1, 2, -1, 6, -1, 2, 0, 1, S(S(2)-1) * S(S(3)-1), G(1,3)**-1 * G(1,24)),
+        (24, 7): (1, 2, -1, 4, -3, 8, 0, 1, S(S(3)-1) * S(S(3)-S(2)), G(1,4)**-1 * G(1,24)),
+        (24, 11): (1, 1, 1, 12, -3, 8, 0, 1, S(S(2)-1) * S(S(3)-S(2)), G(1,3)**-1 * G(1,4)**-1 * G(1,24)),
+        (24, 13): (0, 1, 2, 3, 3, 8, 0, 1, S(S(3)+1), G(1,3) * G(1,4) * G(1,24)**-1),
+        (24, 17): (1, 2, 1, 1, 3, 8, 0, 1, S(S(2)+1), G(1,4) * G(1,24)**-1),
+        (24, 19): (1, 2, 11, 12, 1, 2, 0, 1, S(S(3)+S(2)), G(1,3) * G(1,24)**-1),
+        (24, 23): (1, 1, 3, 4, 0, 1, 0, 1, S(S(2)+1) * S(S(3)+1) * S(S(3)+S(2)), G(1,24)**-1),
+        (30, 1): (-1, 2, -16, 15, 9, 20, -1, 6, S(A) * S(S(15)+C), G(1,3) * G(1,5)),
+        (30, 7): (-1, 2, -22, 15, 3, 20, -1, 6, S(B) * S(S(15)+D), G(1,3) * G(2,5)),
+        (30, 11): (1, 2, -11, 15, -1, 20, -1, 3, S(A) * S(S(15)-C), G(1,3)**-1 * G(1,5)),
+        (30, 13): (1, 2, -41, 30, 7, 20, -2, 3, B * S(S(15)-D), G(1,3) * G(2,5)**-1),
+        (30, 17): (1, 2, -2, 15, -7, 20, -1, 3, S(B) * S(S(15)-D), G(1,3)**-1 * G(2,5)),
+        (30, 19): (1, 2, -23, 30, 1, 20, -2, 3, A * S(S(15)-C), G(1,3) * G(1,5)**-1),
+        (30, 23): (3, 2, -1, 30, -3, 20, -5, 6, B * S(S(15)+D), G(1,3)**-1 * G(2,5)**-1),
+        (30, 29): (3, 2, -13, 30, -9, 20, -5, 6, A * S(S(15)+C), G(1,3)**-1 * G(1,5)**-1),
+        (60, 11): (1, 2, -5,4, -1,2, -17,24,  S(A) * S(S(15) - C) * S(S(10) - S(A)), G(1,3)**-1 * G(1,60)),
+        (60, 13): (1, 2, -13, 10, -3, 20, -3, 8,  S(B) * S(S(3) + 1) * S(S(5) - S(3)) * S(S(15) - D), G(2,5)**-1 * G(7,60)),
+        (60, 17): (1, 2, -3, 4, -1, 2, -11, 24, S(B) * S(S(15) - D) * S(S(10) - S(B)), G(1,3)**-1 * G(7,60)),
+        (60, 19): (1, 2, -7, 5, -9, 20, -5, 8, S(A) * S(S(3) - 1) * S(S(5) - S(3)) * S(S(15) - C), G(1,5)**-1 * G(1,60)),
+        (60, 23): (1, 1, -11, 20, -3, 20, -7, 12, S(B) * S(S(3) + 1) * S(S(5) - S(3)) * S(S(10) - S(B)), G(1,3)**-1 * G(2,5)**-1 * G(7,60)),
+        (60, 29): (1, 1, -23, 20, -9, 20, -7, 12, S(A) * S(S(3) - 1) * S(S(5) - S(3)) * S(S(10) - S(A)), G(1,3)**-1 * G(1,5)**-1 * G(1,60)),
+        (60, 31): (0, 1, -1, 10, 9, 20, -1, 6, S(A) * S(S(15) + C), G(1,3) * G(1,5) * G(1,60)**-1),
+        (60, 37): (0, 1, -7, 10, 3, 20, -1, 6, S(B) * S(S(15) + D), G(1,3) * G(2,5) * G(7,60)**-1),
+        (60, 41): (1, 2, 3, 20, 9, 20, -1, 8, S(A) * S(S(10) + S(A)), G(1,5) * G(1,60)**-1),  # typo corrected
+        (60, 43): (1, 2, -1, 2, 1, 2, -7, 24, S(B) * S(S(3)-1) * S(S(5) + S(3)), G(1,3) * G(7,60)**-1),
+        (60, 47): (1, 2, 1, 20, 3, 20, -3, 8, S(B) * S(S(10) + S(B)), G(2,5) * G(7,60)**-1),  # typo corrected
+        (60, 49): (1, 2, 0, 1, 1, 2, -1, 24, S(A) * S(S(3) + 1) * S(S(5) + S(3)), G(1,3) * G(1,60)**-1),
+        (60, 53): (1, 1, -5, 4, 0, 1, -3, 4, B * S(S(3) - 1) * S(S(5) + S(3)) * S(S(15) + D) * S(S(10) + S(B)), G(7,60)**-1),
+        (60, 59): (1, 1, -5, 4, 0, 1, -3, 4, A * S(S(3) + 1) * S(S(5) + S(3)) * S(S(15) + C) * S(S(10) + S(A)), G(1,60)**-1),
+    }
+
+gamma_fmpq_table = _gamma_fmpq_table()
+
+# Closed forms of HurwitzZeta(s, a) for special rational a, grouped by s.
+# (The case a = 1/2 holds for any s and is handled separately.)
+hurwitz_zeta_special_values = {
+    expr_two: [(Div(1,4), Pi**2 + 8*ConstCatalan),
+               (Div(3,4), Pi**2 - 8*ConstCatalan)],
+    Expr(3): [(Div(1,4), 28*RiemannZeta(3) + Pi**3),
+              (Div(3,4), 28*RiemannZeta(3) - Pi**3),
+              (Div(1,6), 91*RiemannZeta(3) + 2*Sqrt(3)*Pi**3),
+              (Div(5,6), 91*RiemannZeta(3) - 2*Sqrt(3)*Pi**3)],
+}
+
+# Gauss's digamma theorem: DigammaFunction(p/q) for 0 < p < q <= 12,
+# keyed by (p, q).
+def _digamma_rational_table():
+    table = {}
+    for q in range(2, 13):
+        for p in range(1, q):
+            if math.gcd(p, q) == 1:
+                s = -ConstGamma - Log(2*q) - (Pi/2)*Cot(Pi*p/q)
+                s += 2 * sum(Cos(2*Pi*k*p/q)*Log(Sin(Pi*k/q)) for k in range(1, (q-1)//2+1))
+                table[p, q] = s
+    return table
+
+digamma_rational_table = _digamma_rational_table()
+
+# Named hypergeometric functions, keyed by (p, q, regularized).
+hypergeometric_heads = {
+    (0, 1, False): Hypergeometric0F1,
+    (1, 1, False): Hypergeometric1F1,
+    (1, 2, False): Hypergeometric1F2,
+    (2, 0, False): Hypergeometric2F0,
+    (2, 1, False): Hypergeometric2F1,
+    (2, 2, False): Hypergeometric2F2,
+    (3, 2, False): Hypergeometric3F2,
+    (0, 1, True): Hypergeometric0F1Regularized,
+    (1, 1, True): Hypergeometric1F1Regularized,
+    (1, 2, True): Hypergeometric1F2Regularized,
+    (2, 1, True): Hypergeometric2F1Regularized,
+    (2, 2, True): Hypergeometric2F2Regularized,
+    (3, 2, True): Hypergeometric3F2Regularized,
+}
+
+# Higher derivatives of an Airy function f, reduced to f and f' using
+# f''(x) = x f(x). Todo: could implement higher derivatives.
+airy_derivatives = {
+    2: lambda f, x: x * f(x),
+    3: lambda f, x: f(x) + x * f(x, 1),
+    4: lambda f, x: x**2 * f(x) + 2 * f(x, 1),
+}
+
+# Values of the Airy functions and their first derivatives at 0.
+airy_values_at_zero = {
+    (AiryAi, 0): Gamma(Div(1,3)) / (2*3**Div(1,6)*Pi),
+    (AiryAi, 1): -(1/(3**Div(1,3) * Gamma(Div(1,3)))),
+    (AiryBi, 0): (3**Div(1,3) * Gamma(Div(1,3))) / (2*Pi),
+    (AiryBi, 1): 3**Div(1,6) / Gamma(Div(1,3)),
+}
+
+
+# Factorials simplified to integers by Brain.simple_Factorial.
+small_factorials = tuple(Expr(math.factorial(n)) for n in range(101))
+
+def quadratic_key(a, b, c):
+    """
+    Hashable key for a + b*Sqrt(c) given by alg.as_quadratic(). The flint
+    types are imported lazily, so the module-level tables below are keyed
+    by Fractions (which hash but do not compare equal to fmpq).
+    """
+    return (Fraction(int(a.p), int(a.q)), Fraction(int(b.p), int(b.q)), int(c))
+
+# Special values of ModularJ(a + b*Sqrt(c)) for tau reduced to the
+# fundamental domain.
+# https://en.wikipedia.org/wiki/J-invariant#Special_values
+# Todo: implement an algorithm!
+modular_j_values = {
+    (Fraction(-1,2), Fraction(1,2), -3) : expr_zero,
+    (0, 1, -1) : Expr(1728),
+    (0, 2, -1) : Expr(66**3),
+    (0, 3, -1) : 64*(2+Sqrt(3))**2*(21+20*Sqrt(3))**3,
+    (0, 4, -1) : 27*(724+513*Sqrt(2))**3,
+    (0, 1, -2) : Expr(20**3),
+    (0, 2, -2) : 1000*(19+13*Sqrt(2))**3,
+    (0, 2, -3) : 13500*(30+17*Sqrt(3))**3,
+    (Fraction(-1,2), 1, -1) : 27*(724-513*Sqrt(2))**3,
+    (0, 1, -6) : 432 * (14 + 9*Sqrt(2))**3 * (2 - Sqrt(2)),
+    (Fraction(-1,2), Fraction(1,2), -7) : Expr(-15**3),
+    (Fraction(-1,2), Fraction(1,2), -11) : Expr(-32**3),
+    (Fraction(-1,2), Fraction(1,2), -19) : Expr(-96**3),
+    (Fraction(-1,2), Fraction(1,2), -43) : Expr(-960**3),
+    (Fraction(-1,2), Fraction(1,2), -67) : Expr(-5280**3),
+    (Fraction(-1,2), Fraction(1,2), -163) : Expr(-640320**3),
+}
+
+def _modular_lambda_values():
+    # http://mathworld.wolfram.com/EllipticLambdaFunction.html
+    # -163: jjj's fxtbook
+    # Todo: fill in more values
+    h = Fraction(1,2)
+    h3 = Fraction(1,3)
+    x11 = (17+3*Sqrt(33))**Div(1,3)
+    T163 = (1+557403*Sqrt(489))**Div(1,3)
+    return {
+        (0, 1, -1) : expr_one/2,
+        (0, 1, -2) : (Sqrt(2) - 1)**2,
+        (0, 2, -1) : 17 - 12*Sqrt(2),
+        (0, 1, -3) : ((Sqrt(3)-1)**2/8),
+        (0, 1, -5) : (Div(1,2)-Sqrt(Sqrt(5)-2)),
+        (0, 1, -6) : (2-Sqrt(3))**2*(Sqrt(3)-Sqrt(2))**2,
+        (0, 1, -7) : ((3-Sqrt(7))**2/32),
+        (0, 2, -2) : ((1+Sqrt(2)-Sqrt(2*Sqrt(2)+2))**4),
+        (0, 3, -1) : ((Sqrt(2)-3**Div(1,4))**2*(Sqrt(3)-1)**2/4),
+        (0, 1, -10) : ((Sqrt(10)-3)**2*(Sqrt(2)-1)**4),
+        (0, 2, -3)  : (Sqrt(3)-Sqrt(2))**4 * (Sqrt(2)-1)**4,
+        (0, 1, -13) : (Sqrt(5*Sqrt(13)-17) - Sqrt(19-5*Sqrt(13)))**2 / 4,
+        (0, 1, -14) : (-11-8*Sqrt(2)-2*(Sqrt(2)+2)*Sqrt(5+4*Sqrt(2))+Sqrt(11+8*Sqrt(2))*(2+2*Sqrt(2)+Sqrt(2)*Sqrt(5+4*Sqrt(2))))**2,
+        (0, 1, -15) : (3-Sqrt(5))**2*(Sqrt(5)-Sqrt(3))**2*(2-Sqrt(3))**2/128,
+        (0, 4, -1)  : (33+24*Sqrt(2)-4*Sqrt(140+99*Sqrt(2)))**2,
+        (0, 1, -18) : (Sqrt(2)-1)**6 * (2-Sqrt(3))**6,
+        (0, 1, -22) : (3*Sqrt(11)-7*Sqrt(2))**2 * (10-3*Sqrt(11))**2,
+        (0, 1, -30) : (Sqrt(3)-Sqrt(2))**4 * (2-Sqrt(3))**2 * (Sqrt(6)-Sqrt(5))**2 * (4-Sqrt(15))**2,
+        (0, 1, -34) : (Sqrt(2)-1)**4 * (3*Sqrt(2)-Sqrt(17))**2 * (Sqrt(297+72*Sqrt(17))-Sqrt(296+72*Sqrt(17)))**2,
+        (0, 1, -42) : (Sqrt(2)-1)**4 * (2-Sqrt(3))**4 * (Sqrt(7)-Sqrt(6))**2 * (8-3*Sqrt(7))**2,
+        (0, 1, -58) : (13*Sqrt(58)-99)**2 * (Sqrt(2)-1)**12,
+        (0, 1, -163) : (2 - Sqrt(3 + 80040*T163 - 2*80040**2/(3*T163)))/4,
+        (0, 1, -210) : (Sqrt(2)-1)**4*(2-Sqrt(3))**2*(Sqrt(7)-Sqrt(6))**4*(8-3*Sqrt(7))**2*(Sqrt(10)-3)**4*(4-Sqrt(15))**4*(Sqrt(15)-Sqrt(14))**2*(6-Sqrt(35))**2,
+        (-h, h, -3) : -exp_two_pi_i_table[1, 3],
+        (0, h, -6)  : 1 - (2-Sqrt(3))**2*(Sqrt(2)+Sqrt(3))**2,
+        (0, h, -10) : 1 - (1+Sqrt(2))**4*(Sqrt(10)-3)**2,
+        (0, h, -58) : 1 - (13*Sqrt(58)-99)**2 * (Sqrt(2)+1)**12,
+        (0, 2*h3, -3) : (833 + 588*Sqrt(2) - 480*Sqrt(3) - 340*Sqrt(6)),
+        # (0, 1, -11) : (Sqrt(1+2*x11-4/x11) - Sqrt(11+2*x11-4/x11))**2 / 24,  todo: incorrect in mathworld?
+        # (0, h3, -15) : (8 + Sqrt(3*(23-7*Sqrt(5))/2))/16,   todo: incorrect in mathworld?
+    }
+
+# Special values of ModularLambda(a + b*Sqrt(c)), see Brain.simple_ModularLambda.
+modular_lambda_values = _modular_lambda_values()
+
+def _dedekind_eta_values():
+    h = Fraction(1,2)
+    etai = Gamma(Div(1,4)) / (2 * Pi**Div(3,4))
+    return {
+        (0, 1, -1) : etai,
+        (0, 2, -1) : etai / 2**Div(3,8),
+        (0, 3, -1) : etai / (3**Div(3,8) * (2+Sqrt(3))**Div(1,12)),
+        (0, 4, -1) : etai / (2**Div(13,16) * (1+Sqrt(2))**Div(1,4)),
+        (0, 5, -1) : etai / Sqrt(5*GoldenRatio),
+        (0, 6, -1) : (1/6**Div(3,8)) * ((5-Sqrt(3))/2 - 3**Div(3,4)/Sqrt(2))**Div(1,6) * etai,
+        (0, 7, -1) : (1/Sqrt(7)) * (-Div(7,2) + Sqrt(7) + Div(1,2)*Sqrt(-7+4*Sqrt(7)))**Div(1,4) * etai,
+        (0, 8, -1) : (1/2**Div(41,32)) * Sqrt(2**Div(1,4) - 1) / (1+Sqrt(2))**Div(1,8) * etai,
+        (0, 16, -1) : (1/2**Div(113,64)) * (2**Div(1,4)-1)**Div(1,4) / (1+Sqrt(2))**Div(1,16) * Sqrt(-2**Div(5,8) + Sqrt(1+Sqrt(2))) * etai,
+        (0, 1, -3) : 3**Div(1,8) / 2**Div(4,3) * Gamma(Div(1,3))**Div(3,2) / Pi,
+        (-h, h, -3) : Exp(-Pi*ConstI/24) * 3**Div(1,8) * Gamma(Div(1,3))**Div(3,2) / (2*Pi),
+    }
+
+# Special values of DedekindEta(a + b*Sqrt(c)), see Brain.simple_DedekindEta.
+dedekind_eta_values = _dedekind_eta_values()
+
+# Rewrites of Re(x) and Im(x) for a complex, non-real x = head(...),
+# used by Brain.simple_Re and Brain.simple_Im. Each handler takes the
+# brain and x and returns the rewritten expression, or None to fall back
+# to numerical evaluation.
+
+def _split_real_factors(brain, x):
+    real = []
+    nonreal = []
+    for t in x.args():
+        if brain.is_real(t):
+            real.append(t)
+        else:
+            nonreal.append(t)
+    return real, nonreal
+
+def _re_Add(brain, x):
+    return brain.simple_Add(*[brain.simple_Re(t) for t in x.args()])
+
+def _re_Sub(brain, x):
+    a, b = x.args()
+    return brain.simple_Sub(brain.simple_Re(a), brain.simple_Re(b))
+
+def _re_Neg(brain, x):
+    a, = x.args()
+    return brain.simple_Neg(brain.simple_Re(a))
+
+def _re_Mul(brain, x):
+    real, nonreal = _split_real_factors(brain, x)
+    if real:
+        return brain.simple(Mul(*real) * Re(Mul(*nonreal)))
+
+def _re_Div(brain, x):
+    a, b = x.args()
+    if brain.is_not_zero(b):
+        if brain.is_real(b):
+            if brain.is_real(a):
+                return a / b
+            return brain.simple(Re(a) / b)
+
+def _re_Exp(brain, x):
+    a, = x.args()
+    return brain.simple(Exp(Re(a)) * Cos(Im(a)))
+
+re_head_handlers = {
+    Add: _re_Add,
+    Sub: _re_Sub,
+    Neg: _re_Neg,
+    Mul: _re_Mul,
+    Div: _re_Div,
+    Exp: _re_Exp,
+}
+
+def _im_Add(brain, x):
+    return brain.simple_Add(*[brain.simple_Im(t) for t in x.args()])
+
+def _im_Sub(brain, x):
+    a, b = x.args()
+    return brain.simple_Sub(brain.simple_Im(a), brain.simple_Im(b))
+
+def _im_Neg(brain, x):
+    a, = x.args()
+    return brain.simple_Neg(brain.simple_Im(a))
+
+def _im_Mul(brain, x):
+    real, nonreal = _split_real_factors(brain, x)
+    if real:
+        return brain.simple(Mul(*real) * Im(Mul(*nonreal)))
+
+def _im_Exp(brain, x):
+    a, = x.args()
+    return brain.simple(Exp(Re(a)) * Sin(Im(a)))
+
+im_head_handlers = {
+    Add: _im_Add,
+    Sub: _im_Sub,
+    Neg: _im_Neg,
+    Mul: _im_Mul,
+    Exp: _im_Exp,
+}
+
+# Exact evaluation of head(*args) as an fmpq (Brain.evaluate_fmpq).
+# Handlers raise NotImplementedError when they do not apply.
+
+def _fmpq_Neg(brain, args):
+    x, = args
+    return -brain.evaluate_fmpq(x)
+
+def _fmpq_Sub(brain, args):
+    x, y = args
+    return brain.evaluate_fmpq(x) - brain.evaluate_fmpq(y)
+
+# Integer terms and factors are accumulated as Python ints and combined
+# with the rational part once, avoiding an fmpq temporary per term.
+
+def _fmpq_Add(brain, args):
+    n = 0
+    s = brain._fmpq(0)
+    for x in args:
+        v = x._integer
+        if v is not None:
+            n += v
+        else:
+            s += brain.evaluate_fmpq(x)
+    return s + n
+
+def _fmpq_Mul(brain, args):
+    n = 1
+    s = brain._fmpq(1)
+    for x in args:
+        v = x._integer
+        if v is not None:
+            n *= v
+        else:
+            s *= brain.evaluate_fmpq(x)
+    return s * n
+
+def _fmpq_Div(brain, args):
+    x, y = args
+    return brain.evaluate_fmpq(x) / brain.evaluate_fmpq(y)
+
+def _fmpq_Pow(brain, args):
+    x, y = args
+    y = brain.simple(y)
+    if y.is_integer():
+        a = brain.evaluate_fmpq(x)
+        b = int(y)
+        if abs(a) == 1:
+            b = b % 2
+        # todo: more systematic solution
+        if a.height_bits() * abs(b) < 10000:
+            return a ** b
+    raise NotImplementedError
+
+fmpq_head_handlers = {
+    Neg: _fmpq_Neg,
+    Sub: _fmpq_Sub,
+    Add: _fmpq_Add,
+    Mul: _fmpq_Mul,
+    Div: _fmpq_Div,
+    Pow: _fmpq_Pow,
+}
+
+# Exact evaluation of head(*args) as an algebraic number
+# (Brain._evaluate_alg). Handlers raise NotImplementedError when they
+# do not apply.
+
+def _alg_Pos(brain, args):
+    x, = args
+    return brain._evaluate_alg(x)
+
+def _alg_Neg(brain, args):
+    x, = args
+    return -brain._evaluate_alg(x)
+
+def _alg_Sub(brain, args):
+    x, y = args
+    return brain._evaluate_alg(x) - brain._evaluate_alg(y)
+
+def _alg_Add(brain, args):
+    s = brain._alg(0)
+    for x in args:
+        s += brain._evaluate_alg(x)
+    return s
+
+def _alg_Mul(brain, args):
+    s = brain._alg(1)
+    for x in args:
+        s *= brain._evaluate_alg(x)
+    return s
+
+def _alg_Div(brain, args):
+    x, y = args
+    return brain._evaluate_alg(x) / brain._evaluate_alg(y)
+
+def _alg_Sqrt(brain, args):
+    x, = args
+    return brain._evaluate_alg(x).sqrt()
+
+def _alg_Pow(brain, args):
+    x, y = args
+    x = brain._evaluate_alg(x)
+    y = brain._evaluate_alg(y)
+    return x ** y
+
+def _alg_Sign(brain, args):
+    x, = args
+    return brain._evaluate_alg(x).sgn()
+
+def _alg_Re(brain, args):
+    x, = args
+    return brain._evaluate_alg(x).real
+
+def _alg_Im(brain, args):
+    x, = args
+    return brain._evaluate_alg(x).imag
+
+def _alg_Abs(brain, args):
+    x, = args
+    return abs(brain._evaluate_alg(x))
+
+def _alg_Exp(brain, args):
+    x, = args
+    v = brain._evaluate_alg(brain.simple(x / (Pi * ConstI)))
+    if v.is_rational():
+        return brain._alg.exp_pi_i(v.fmpq())
+    raise NotImplementedError
+
+# f(pi x) for rational x, as methods of alg
+alg_pi_functions = {
+    Cos: "cos_pi",
+    Sin: "sin_pi",
+    Tan: "tan_pi",
+    Cot: "cot_pi",
+    Sec: "sec_pi",
+    Csc: "csc_pi",
+}
+
+def _alg_trigonometric(head):
+    name = alg_pi_functions[head]
+    def handler(brain, args):
+        x, = args
+        v = brain._evaluate_alg(brain.simple(x / Pi))
+        if v.is_rational():
+            return getattr(brain._alg, name)(v.fmpq())
+        raise NotImplementedError
+    return handler
+
+alg_head_handlers = {
+    Pos: _alg_Pos,
+    Neg: _alg_Neg,
+    Sub: _alg_Sub,
+    Add: _alg_Add,
+    Mul: _alg_Mul,
+    Div: _alg_Div,
+    Sqrt: _alg_Sqrt,
+    Pow: _alg_Pow,
+    Sign: _alg_Sign,
+    Re: _alg_Re,
+    Im: _alg_Im,
+    Abs: _alg_Abs,
+    Exp: _alg_Exp,
+}
+alg_head_handlers.update({head: _alg_trigonometric(head) for head in alg_pi_functions})
+
+# Categories of extended real numbers, see Brain.extended_real_category.
+xreal_neg_inf = 0
+xreal_finite = 1
+xreal_pos_inf = 2
+xreal_unknown = 3
+
+xreal_categories = (xreal_neg_inf, xreal_finite, xreal_pos_inf, xreal_unknown)
+
+# Decisions of a < b and a <= b for extended reals a != b,
+# keyed by (category of a, category of b).
+extended_real_less = {
+    (xreal_neg_inf, xreal_finite): True_,
+    (xreal_neg_inf, xreal_pos_inf): True_,
+    (xreal_finite, xreal_pos_inf): True_,
+}
+extended_real_less_equal = {
+    (xreal_finite, xreal_neg_inf): False_,
+    (xreal_pos_inf, xreal_finite): False_,
+    (xreal_pos_inf, xreal_neg_inf): False_,
+}
+for _c in xreal_categories:
+    extended_real_less[(xreal_pos_inf, _c)] = False_
+    extended_real_less[(_c, xreal_neg_inf)] = False_
+    extended_real_less_equal[(xreal_neg_inf, _c)] = True_
+    extended_real_less_equal[(_c, xreal_pos_inf)] = True_
 
 class Brain(object):
     """
     A "brain" for performing symbolic computation.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._simple_dispatch = simple_dispatch_table(cls)
+
     def infer(self, thm):
-        self.inferences.add(thm)
+        for x in self._infer(thm):
+            self.update_domain_bits(x)
+
+    def infer_all(self, thms):
+        """
+        Infers each of the theorems thms, recomputing the domain bits
+        only once for each expression they are about.
+        """
+        touched = set()
+        for thm in thms:
+            touched.update(self._infer(thm))
+        for x in touched:
+            self.update_domain_bits(x)
+
+    def _infer(self, thm):
+        """
+        Adds thm and its consequences to the inferences. Returns the
+        expressions whose domain bits need to be updated.
+        """
+        # propagation only depends on thm, so it need not be repeated
+        if thm in self.inferred:
+            return ()
+        self.inferred.add(thm)
+        # Consequences can be about other expressions than the subject
+        # of thm (for example, Element(x, HH) gives Greater(Im(x), 0)),
+        # so collect them first to find everything that was touched.
+        new = set([thm])
         if thm.head() == Element:
             x, dom = thm.args()
-            infer_domain(self.inferences, x, dom)
+            infer_domain(new, x, dom)
             if dom.head() == SetMinus:
                 inset, outset = dom.args()
-                infer_domain(self.inferences, x, inset)
-                infer_not_domain(self.inferences, x, outset)
-        if thm.head() == NotElement:
+                infer_domain(new, x, inset)
+                infer_not_domain(new, x, outset)
+        elif thm.head() == NotElement:
             x, dom = thm.args()
-            infer_not_domain(self.inferences, x, dom)
+            infer_not_domain(new, x, dom)
+        self.inferences.update(new)
+        touched = []
+        for t in new:
+            head = t.head()
+            if head == Element or head == NotElement:
+                touched.append(t.args()[0])
+            elif head in zero_relation_bits:
+                args = t.args()
+                if len(args) == 2 and args[1] is expr_zero:
+                    touched.append(args[0])
+        return touched
+
+    def update_domain_bits(self, x):
+        """
+        Recomputes the bit flags recording which of the standard domains
+        x is known to belong to (or not to belong to), and which relations
+        with zero x is known to satisfy, from the inferences.
+        """
+        bits = 0
+        not_bits = 0
+        zero_bits = 0
+        inferences = self.inferences
+        for dom, bit in domain_bits:
+            if Element(x, dom) in inferences:
+                bits |= bit
+            if NotElement(x, dom) in inferences:
+                not_bits |= bit
+        for rel, bit in zero_relation_bits.items():
+            if rel(x, 0) in inferences:
+                zero_bits |= bit
+        self.element_bits[x] = bits
+        self.not_element_bits[x] = not_bits
+        self.zero_relation_bits[x] = zero_bits
+
+    # Computational types; flint is imported when the first brain is
+    # created, and the types are shared by all brains.
+    _fmpz = None
+
+    @classmethod
+    def _bind_flint_types(cls):
+        from flint import arb, acb, fmpz, fmpq, ctx
+        from flint import fmpz_poly, fmpq_poly, fmpq_mat
+        from .algebraic import alg
+        cls._arb = arb
+        cls._acb = acb
+        cls._arb_zero = arb(0)
+        cls._fmpq = fmpq
+        cls._fmpz_poly = fmpz_poly
+        cls._fmpq_poly = fmpq_poly
+        cls._fmpq_mat = fmpq_mat
+        cls._alg = alg
+        cls._flint_ctx = ctx
+        cls._fmpz = fmpz
 
     def __init__(self, variables=(), assumptions=None, fungrim=False, penalty={}):
         """
@@ -356,30 +1240,34 @@ class Brain(object):
 
         """
         self.simple_cache = {}
+        # simple_cache of each enclosing assuming() context, innermost first
+        self.outer_caches = ()
         self.arb_cache = {}
         self.penalty = penalty
+        self.complexity_cache = {}
+        self.alg_expr_cache = {}
+        self.sin_pi_120_cache = [None] * 240
+        self.gamma_fmpq_cache = {}
 
         # Init computational types
-        from flint import arb, acb, fmpz, fmpq, ctx
-        self._arb = arb
-        self._acb = acb
-        self._fmpz = fmpz
-        self._fmpq = fmpq
-        self._flint_ctx = ctx
+        if Brain._fmpz is None:
+            Brain._bind_flint_types()
 
         # Init assumptions
         self.variables = frozenset(variables)
         self.inferences = set()
+        self.inferred = set()
+        self.element_bits = {}
+        self.not_element_bits = {}
+        self.zero_relation_bits = {}
 
         if assumptions is None:
-            self.assumptions = frozenset()
+            self.assumptions = ()
         else:
-            self.assumptions = frozenset(assumptions.head_args_flattened(And))
+            self.assumptions = tuple(assumptions.head_args_flattened(And))
 
         # Simple inferences (mostly based on the domain)
-        for asm in self.assumptions:
-            # asm = asm.simple()
-            self.infer(asm)
+        self.infer_all(self.assumptions)
 
     @contextlib.contextmanager
     def assuming(self, assumptions):
@@ -399,28 +1287,38 @@ class Brain(object):
 
         """
         assert isinstance(assumptions, Expr)
-        if assumptions == True_:
+        if assumptions is True_:
             yield
         else:
             variables = assumptions.free_variables()
             old_inferences = self.inferences
+            old_inferred = self.inferred
+            old_element_bits = self.element_bits
+            old_not_element_bits = self.not_element_bits
+            old_zero_relation_bits = self.zero_relation_bits
             old_variables = self.variables
             old_cache = self.simple_cache
-            old_arb_cache = self.arb_cache
+            old_outer_caches = self.outer_caches
             try:
                 self.inferences = old_inferences.copy()
+                self.inferred = old_inferred.copy()
+                self.element_bits = old_element_bits.copy()
+                self.not_element_bits = old_not_element_bits.copy()
+                self.zero_relation_bits = old_zero_relation_bits.copy()
                 self.variables = old_variables.union(variables)
                 self.simple_cache = {}
-                self.arb_cache = {}
-                assumptions = frozenset(assumptions.head_args_flattened(And))
-                for asm in assumptions:
-                    self.infer(asm)
+                self.outer_caches = (old_cache,) + old_outer_caches
+                self.infer_all(assumptions.head_args_flattened(And))
                 yield
             finally:
                 self.inferences = old_inferences
+                self.inferred = old_inferred
+                self.element_bits = old_element_bits
+                self.not_element_bits = old_not_element_bits
+                self.zero_relation_bits = old_zero_relation_bits
                 self.variables = old_variables
                 self.simple_cache = old_cache
-                self.simple_arb_cache = old_arb_cache
+                self.outer_caches = old_outer_caches
 
     def __repr__(self):
         s = ""
@@ -431,6 +1329,23 @@ class Brain(object):
         return s
 
     # todo: cache is duplicated here and in numeric; also doesn't apply to subexpressions...Z
+    # Numerical enclosures do not depend on the assumptions, so arb_cache
+    # is shared by all assuming() contexts.
+
+    def _enclosure(self, x):
+        """
+        Performs numerical evaluation and returns an enclosure of x as
+        an arb or acb, or None on failure.
+        """
+        val = self.arb_cache.get(x, _MISSING)
+        if val is not _MISSING:
+            return val
+        try:
+            val = x.n(as_arb=True)
+        except (NotImplementedError, ValueError, ImportError):
+            val = None
+        self.arb_cache[x] = val
+        return val
 
     def real_enclosure(self, x):
         """
@@ -438,18 +1353,10 @@ class Brain(object):
         Success proves that x is a real number.
         Returns None on failure.
         """
-        res = None
-        try:
-            if x in self.arb_cache:
-                val = self.arb_cache[x]
-            else:
-                val = x.n(as_arb=True)
-                self.arb_cache[x] = val
-            if type(val) == self._arb:
-                res = val
-        except (NotImplementedError, ValueError, ImportError):
-            self.arb_cache[x] = None
-        return res
+        val = self._enclosure(x)
+        if type(val) == self._arb:
+            return val
+        return None
 
     def complex_enclosure(self, x):
         """
@@ -457,21 +1364,41 @@ class Brain(object):
         Success proves that x is a complex number.
         Returns None on failure.
         """
-        res = None
-        try:
-            if x in self.arb_cache:
-                val = self.arb_cache[x]
-            else:
-                val = x.n(as_arb=True)
-                self.arb_cache[x] = val
-            assert val is None or val.is_finite()
-            if type(val) == self._acb:
-                res = val
-            elif type(val) == self._arb:
-                res = self._acb(val)
-        except (NotImplementedError, ValueError, ImportError):
-            self.arb_cache[x] = None
-        return res
+        val = self._enclosure(x)
+        assert val is None or val.is_finite()
+        if type(val) == self._acb:
+            return val
+        if type(val) == self._arb:
+            return self._acb(val)
+        return None
+
+    def enclosure_parts(self, x):
+        """
+        Performs numerical evaluation and returns enclosures of the real
+        and imaginary parts of x as a pair of arbs. This is equivalent to
+        reading .real and .imag of complex_enclosure(x), but avoids
+        converting real results to an acb.
+        Returns (None, None) on failure.
+        """
+        val = self._enclosure(x)
+        assert val is None or val.is_finite()
+        if type(val) == self._arb:
+            return val, self._arb_zero
+        if type(val) == self._acb:
+            return val.real, val.imag
+        return None, None
+
+    def clear_cache(self):
+        """
+        Forget all memoized results of the current assumption context,
+        along with the context-independent caches, to bound memory use.
+        """
+        self.simple_cache.clear()
+        self.arb_cache.clear()
+        self.complexity_cache.clear()
+        self.alg_expr_cache.clear()
+        self.gamma_fmpq_cache.clear()
+        self.sin_pi_120_cache[:] = [None] * 240
 
     def simple(self, expr):
         """
@@ -481,35 +1408,36 @@ class Brain(object):
         if expr in self.inferences:
             return True_
 
-        if expr.is_atom():
+        parts = expr._args
+        if parts is None:
             return expr
 
-        if expr in self.simple_cache:
-            v = self.simple_cache[expr]
+        cache = self.simple_cache
+        v = cache.get(expr, _MISSING)
+        if v is not _MISSING:
             if v is None:
                 return expr
             return v
 
         input_expr = expr
-        self.simple_cache[input_expr] = None
-
-        head = expr.head()
-        if head is not None and head.is_symbol():
-            s = head._symbol
-            f = "simple_" + s
-            if hasattr(self, f):
-                args = expr.args()
-                expr2 = getattr(self, f)(*args)
-                expr = expr2
+        cache[input_expr] = None
+
+        head = parts[0]
+        s = head._symbol
+        if s is not None:
+            f = self._simple_dispatch.get(s)
+            if f is not None:
+                expr = f(self, *parts[1:])
             else:
-                args = expr.args()
-                args = [self.simple(x) for x in args]
+                simple = self.simple
+                args = [simple(x) for x in parts[1:]]
                 expr = head(*args)
 
-        self.simple_cache[input_expr] = expr
+        cache[input_expr] = expr
 
         return expr
 
+    @cached_predicate
     def is_zero(self, x):
         """
         Check if x is the number zero.
@@ -517,13 +1445,13 @@ class Brain(object):
         """
         if x.is_integer():
             return int(x) == 0
-        if Equal(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Equal_zero_bit:
             return True
-        if NotEqual(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & NotEqual_zero_bit:
             return False
-        if Greater(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Greater_zero_bit:
             return False
-        if Less(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Less_zero_bit:
             return False
         if self.is_integer(x) == False:
             return False
@@ -552,24 +1480,26 @@ class Brain(object):
             return v
         return not v
 
+    @cached_predicate
     def is_infinity(self, x):
         """
         Checks if x is an infinity (UnsignedInfinity or c*Infinity for some
         nonzero complex number c). Returns True, False, or None for unknown.
         """
-        if x == Infinity:
+        head = x.head()
+        if x is Infinity:
             return True
         if x == UnsignedInfinity:
             return True
         if x == Undefined:
             return False
-        if Element(x, CC) in self.inferences:
+        if self.element_bits.get(x, 0) & CC_bit:
             return False
-        if x.head() in (Pos, Neg):
+        if head in unary_additive_ops:
             arg, = x.args()
             if self.is_infinity(arg):
                 return True
-        if x.head() == Mul:
+        if head == Mul:
             args = x.args()
             if any(self.is_infinity(arg) for arg in args):
                 if all(self.is_infinity(arg) or (self.is_complex(arg) and self.is_not_zero(arg)) for arg in x.args()):
@@ -579,36 +1509,37 @@ class Brain(object):
             return False
         return None
 
+    @cached_predicate
     def is_nonnegative(self, x):
         """
         Check if x is an object satisfying x >= 0.
         Return True, False, or None for unknown.
         """
+        head = x.head()
         if x.is_integer():
             return int(x) >= 0
         if x in positive_real_constants:
             return True
-        if GreaterEqual(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & GreaterEqual_zero_bit:
             return True
-        if Greater(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Greater_zero_bit:
             return True
-        if Less(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Less_zero_bit:
             return False
         if self.is_real(x):
-            if x.head() in (Pos, Add, Mul, Exp, Sqrt):
+            if head in nonnegative_preserving_ops:
                 if all(self.is_nonnegative(arg) for arg in x.args()):
                     return True
-            if x.head() == Div:
+            if head == Div:
                 p, q = x.args()
                 if self.is_nonnegative(p) and self.is_positive(q):
                     return True
-            if x.head() == Pow:
+            if head == Pow:
                 base, exp = x.args()
                 if self.is_positive(base):
                     return True
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0 and real >= 0:
                 return True
             if imag != 0 or real < 0:
@@ -620,43 +1551,32 @@ class Brain(object):
             return val1 >= 0
         return None
 
+    @cached_predicate
     def is_positive(self, x):
         """
         Check if x is an object satisfying x > 0.
         Returns True, False, or None for unknown.
         """
+        head = x.head()
         if x.is_integer():
             return int(x) > 0
         if x in positive_real_constants:
             return True
-        if Greater(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Greater_zero_bit:
             return True
-        if LessEqual(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & LessEqual_zero_bit:
             return False
-        if Less(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Less_zero_bit:
             return False
         if self.is_real(x):
-            if x.head() in (Exp, Cosh):
-                t, = x.args()
-                if self.is_real(t):
-                    return True
-            if x.head() in (Pos, Add, Mul, Sqrt):
-                if all(self.is_positive(arg) for arg in x.args()):
-                    return True
-            if x.head() == Div:
-                p, q = x.args()
-                if self.is_positive(p) and self.is_positive(q):
-                    return True
-            if x.head() == Pow:
-                base, exp = x.args()
-                if self.is_positive(base):
-                    return True
-            if x.head() == Re:
+            handler = positive_head_handlers.get(head)
+            if handler is not None and handler(self, x):
+                return True
+            if head == Re:
                 t, = x.args()
                 return self.is_positive(t)
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0 and real > 0:
                 return True
             if imag != 0 or real <= 0:
@@ -668,6 +1588,7 @@ class Brain(object):
             return val1 > 0
         return None
 
+    @cached_predicate
     def is_negative(self, x):
         """
         Check if x is an object satisfying x < 0.
@@ -677,15 +1598,14 @@ class Brain(object):
             return int(x) < 0
         if x in positive_real_constants:
             return False
-        if Less(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Less_zero_bit:
             return True
-        if GreaterEqual(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & GreaterEqual_zero_bit:
             return False
-        if Greater(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Greater_zero_bit:
             return False
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0 and real < 0:
                 return True
             if imag != 0 or real >= 0:
@@ -697,6 +1617,7 @@ class Brain(object):
             return val1 < 0
         return None
 
+    @cached_predicate
     def is_nonpositive(self, x):
         """
         Check if x is an object satisfying x <= 0.
@@ -706,15 +1627,14 @@ class Brain(object):
             return int(x) <= 0
         if x in positive_real_constants:
             return False
-        if LessEqual(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & LessEqual_zero_bit:
             return True
-        if Less(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Less_zero_bit:
             return True
-        if Greater(x, 0) in self.inferences:
+        if self.zero_relation_bits.get(x, 0) & Greater_zero_bit:
             return False
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0 and real <= 0:
                 return True
             if imag != 0 or real > 0:
@@ -726,24 +1646,58 @@ class Brain(object):
             return val1 <= 0
         return None
 
+    def arithmetic_domain_bits(self, x):
+        """
+        Computes in a single walk over the ring operations (Pos, Neg, Add,
+        Sub, Mul) at the top of x the bit flags of the domains among
+        ZZ, QQ, RR, CC and AlgebraicNumbers that x belongs to by closure,
+        judging the leaves only by literal integers, constants and the
+        recorded assumptions. A cleared bit means unknown, not false.
+        """
+        key = ("arithmetic_domain_bits", x)
+        cache = self.simple_cache
+        bits = cache.get(key)
+        if bits is not None:
+            return bits
+        if x.is_integer():
+            bits = ring_domain_bits
+        elif x.head() in ring_arithmetic_ops:
+            bits = ring_domain_bits
+            for arg in x.args():
+                bits &= self.arithmetic_domain_bits(arg)
+                if not bits:
+                    break
+        else:
+            bits = self.element_bits.get(x, 0) & ring_domain_bits
+            if x in real_constants:
+                bits |= RR_bit | CC_bit
+            elif x == ConstI:
+                bits |= AlgebraicNumbers_bit | CC_bit
+        cache[key] = bits
+        return bits
+
+    @cached_predicate
     def is_integer(self, x):
         """
         Checks if x is an integer. Returns True, False, or None for unknown.
         """
+        head = x.head()
         if x.is_integer():
             return True
-        if Element(x, ZZ) in self.inferences:
+        if self.element_bits.get(x, 0) & ZZ_bit:
             return True
-        if NotElement(x, ZZ) in self.inferences:
+        if self.not_element_bits.get(x, 0) & ZZ_bit:
             return False
-        if x.head() in (Pos, Neg, Add, Sub, Mul):
+        if head in ring_arithmetic_ops:
+            if self.arithmetic_domain_bits(x) & ZZ_bit:
+                return True
             if all(self.is_integer(arg) for arg in x.args()):
                 return True
-        if x.head() == Pow:
+        if head == Pow:
             base, exp = x.args()
             if self.is_integer(base) and self.is_integer(exp) and self.is_nonnegative(exp):
                 return True
-        if x.head() == Factorial:
+        if head == Factorial:
             n, = x.args()
             if self.is_integer(n) and self.is_nonnegative(n):
                 return True
@@ -766,31 +1720,35 @@ class Brain(object):
     # todo: irrational + rational, irrational * rational, irrational / rational, rational / irrational
     # todo: square roots
     # todo: exp, log, sin, cos, tan of rational numbers
+    @cached_predicate
     def is_rational(self, x):
         """
         Check if x is a rational number.
         Returns True, False, or None for unknown.
         """
+        head = x.head()
         if self.is_integer(x):
             return True
-        if Element(x, QQ) in self.inferences:
+        if self.element_bits.get(x, 0) & QQ_bit:
             return True
-        if NotElement(x, QQ) in self.inferences:
+        if self.not_element_bits.get(x, 0) & QQ_bit:
             return False
         if x == Pi or x == ConstE:
             return False
-        if x.head() in (Pos, Neg, Add, Sub, Mul):
+        if head in ring_arithmetic_ops:
+            if self.arithmetic_domain_bits(x) & QQ_bit:
+                return True
             if all(self.is_rational(arg) for arg in x.args()):
                 return True
-        if x.head() == Div:
+        if head == Div:
             p, q = x.args()
             if self.is_rational(p) and self.is_rational(q) and self.is_not_zero(q):
                 return True
-        if x.head() == Pow:
+        if head == Pow:
             base, exp = x.args()
             if self.is_rational(base) and self.is_integer(exp) and (self.is_not_zero(base) or self.is_nonnegative(exp)):
                 return True
-        if x.head() == Sqrt:
+        if head == Sqrt:
             # todo: implement an algorithm
             v, = x.args()
             if v.is_integer():
@@ -808,112 +1766,89 @@ class Brain(object):
             return val1.is_rational()
         return None
 
+    @cached_predicate
     def is_algebraic(self, x):
         """
         Check if x is an algebraic number.
         Returns True, False, or None for unknown.
         """
+        head = x.head()
         if self.is_integer(x):
             return True
-        if Element(x, AlgebraicNumbers) in self.inferences:
+        if self.element_bits.get(x, 0) & AlgebraicNumbers_bit:
             return True
-        if NotElement(x, AlgebraicNumbers) in self.inferences:
+        if self.not_element_bits.get(x, 0) & AlgebraicNumbers_bit:
             return False
         if x == Pi or x == ConstE:
             return False
         if x == ConstI or x == GoldenRatio:
             return True
-        if x.head() in (Pos, Neg, Add, Sub, Mul):
+        if head in ring_arithmetic_ops:
+            if self.arithmetic_domain_bits(x) & AlgebraicNumbers_bit:
+                return True
             if all(self.is_algebraic(arg) for arg in x.args()):
                 return True
-        if x.head() == Div:
+        if head == Div:
             p, q = x.args()
             if self.is_algebraic(p) and self.is_algebraic(q) and self.is_not_zero(q):
                 return True
-        if x.head() == Pow:
+        if head == Pow:
             base, exp = x.args()
             if self.is_algebraic(base):
                 if self.is_rational(exp) and (self.is_not_zero(base) or self.is_nonnegative(exp)):
                     return True
                 # Gelfond-Schneider
-                if self.is_algebraic(exp) and self.is_rational(exp) == False and self.is_not_zero(base) and self.equal(base, Expr(1)) == False:
+                if self.is_algebraic(exp) and self.is_rational(exp) == False and self.is_not_zero(base) and self.equal(base, expr_one) == False:
                     return False
             # transcendental ^ rational
             if self.is_complex(base) and (self.is_algebraic(base) == False) and self.is_rational(exp) and self.is_not_zero(exp):
                 return False
-        if x.head() == Sqrt:
+        if head == Sqrt:
             v, = x.args()
             return self.is_algebraic(v)
-        if x.head() == Exp:
+        if head == Exp:
             v, = x.args()
             if self.is_algebraic(v) and self.is_not_zero(v):
                 return False
             if self.is_rational(self.simple(v / (Pi * ConstI))):
                 return True
-        if x.head() in (Sin, Cos, Tan, Cot, Csc, Sec):
+        if head in trigonometric_functions:
             v, = x.args()
             if self.is_algebraic(v) and self.is_not_zero(v):
                 return False
-        if x.head() == Log:
+        if head == Log:
             v, = x.args()
-            if self.is_algebraic(v) and (self.equal(v, Expr(1)) == False):
+            if self.is_algebraic(v) and (self.equal(v, expr_one) == False):
                 return False
         if self.is_infinity(x) or x == Undefined:
             return False
         return None
 
-    def _is_real(self, x):
+    @cached_predicate
+    def is_real(self, x):
         """
         Check if x is a real number.
         Return True, False, or None for unknown.
         """
+        head = x.head()
         if self.is_rational(x):  # todo: remove this?
             return True
-        if Element(x, RR) in self.inferences:
+        if self.element_bits.get(x, 0) & RR_bit:
             return True
-        if NotElement(x, RR) in self.inferences:
+        if self.not_element_bits.get(x, 0) & RR_bit:
             return False
-        if x in (Pi, ConstGamma, ConstE, ConstCatalan):
+        if x in real_constants:
             return True
         if x == ConstI:
             return False
-        if x.head() in (Pos, Neg, Add, Sub, Mul, Exp, Sin, Cos):
-            if all(self.is_real(arg) for arg in x.args()):
-                return True
-        if x.head() in (Floor, Ceil, Re, Im, Abs, Arg):
-            z, = x.args()
-            if self.is_complex(z):
-                return True
-        if x.head() == Div:
-            p, q = x.args()
-            if self.is_real(p) and self.is_real(q) and self.is_not_zero(q):
-                return True
-        if x.head() == Sqrt:
-            arg, = x.args()
-            if self.is_real(arg) and self.is_nonnegative(arg):
-                return True
-        if x.head() == Log:
-            arg, = x.args()
-            if self.is_real(arg) and self.is_positive(arg):
-                return True
-        if x.head() == Pow:
-            base, exp = x.args()
-            if self.is_real(base) and self.is_real(exp):
-                if self.is_positive(base) and self.is_positive(exp):
-                    return True
-                if self.is_not_zero(base) and self.is_integer(exp):
-                    return True
-                if self.is_integer(exp) and self.is_nonnegative(exp):
-                    return True
-        if x.head() == Atan2:
-            t, u = x.args()
-            if self.is_real(t) and self.is_real(u):
-                return True
-        v = self.complex_enclosure(x)
-        if v is not None:
-            if v.imag == 0:
+        handler = real_head_handlers.get(head)
+        if handler is not None and handler(self, x):
+            return True
+        real, imag = self.enclosure_parts(x)
+        if imag is not None:
+            if imag == 0:
                 return True
-            if v.imag != 0:
+            if imag != 0:
                 return False
         if self.is_infinity(x) or x == Undefined:
             return False
@@ -924,68 +1859,26 @@ class Brain(object):
             return val1.is_real()
         return None
 
-    def is_real(self, x):
-        # xxx
-        t = Element(x, RR, RR)
-        if t in self.simple_cache:
-            v = self.simple_cache[t]
-            if v == True_:
-                return True
-            if v == False_:
-                return False
-            return None
-        v = self._is_real(x)
-        if v == True:
-            self.simple_cache[t] = True_
-        elif v == False:
-            self.simple_cache[t] = False_
-        else:
-            self.simple_cache[t] = t
-        return v
-
-    def _is_complex(self, x):
+    @cached_predicate
+    def is_complex(self, x):
         """
         Check if x is a complex number.
         Return True, False, or None for unknown.
         """
+        head = x.head()
         if self.is_integer(x):
             return True
         if x == ConstI:
             return True
-        if x in (Pi, ConstGamma, ConstE, ConstCatalan):
+        if x in real_constants:
             return True
-        if Element(x, CC) in self.inferences:
+        if self.element_bits.get(x, 0) & CC_bit:
             return True
-        if NotElement(x, CC) in self.inferences:
+        if self.not_element_bits.get(x, 0) & CC_bit:
             return False
-        if x.head() in (Pos, Neg, Add, Sub, Mul, Sqrt, Exp, Sin, Cos, Abs, RealAbs, Asin, Acos, Floor, Ceil):
-            if all(self.is_complex(arg) for arg in x.args()):
-                return True
-        if x.head() == Div:
-            p, q = x.args()
-            if self.is_complex(p) and self.is_complex(q) and self.is_not_zero(q):
-                return True
-        if x.head() == Pow:
-            base, exp = x.args()
-            # todo: more generally for re(exp) > 0
-            if self.is_complex(base) and self.is_complex(exp) and \
-                (self.is_not_zero(base) or (self.is_real(exp) and self.is_positive(exp))):
-                return True
-        if x.head() == Log:
-            arg, = x.args()
-            if self.is_complex(arg) and self.is_not_zero(arg):
-                return True
-        if x.head() == Atan2:
-            t, u = x.args()
-            if self.is_real(t) and self.is_real(u):
-                return True
-        if x.head() == DedekindEta:
-            tau, = x.args()
-            # improve...
-            if Element(tau, HH) in self.inferences:
-                return True
-            if self.is_complex(tau) and self.is_positive(self.simple(Im(tau))):
-                return True
+        handler = complex_head_handlers.get(head)
+        if handler is not None and handler(self, x):
+            return True
         if self.is_infinity(x) or x == Undefined:
             return False
         v = self.complex_enclosure(x)
@@ -993,25 +1886,6 @@ class Brain(object):
             return True
         return None
 
-    def is_complex(self, x):
-        # xxx
-        t = Element(x, CC, CC)
-        if t in self.simple_cache:
-            v = self.simple_cache[t]
-            if v == True_:
-                return True
-            if v == False_:
-                return False
-            return None
-        v = self._is_complex(x)
-        if v == True:
-            self.simple_cache[t] = True_
-        elif v == False:
-            self.simple_cache[t] = False_
-        else:
-            self.simple_cache[t] = t
-        return v
-
     def evaluate_all_alg(self, L):
         R = []
         for val in L:
@@ -1024,6 +1898,12 @@ class Brain(object):
     # todo: identify different types; bools, tuples, sets, matrices, ...
     # todo: fall back to simplifying
     def _equal(self, a, b):
+        # exact rational arithmetic is cheap; try it first
+        try:
+            return self.evaluate_fmpq(a) == self.evaluate_fmpq(b)
+        except (NotImplementedError, ZeroDivisionError):
+            pass
+
         # try numerical exclusion test
         val1 = self.complex_enclosure(a)
         if val1 is not None:
@@ -1031,6 +1911,9 @@ class Brain(object):
             if val2 is not None:
                 if not val1.overlaps(val2):
                     return False
+                # identical exact enclosures prove equality
+                if val1 == val2:
+                    return True
                 val3 = self.complex_enclosure(a - b)
                 if val3 is not None:
                     if not val3.contains(0):
@@ -1064,7 +1947,7 @@ class Brain(object):
                 return False
             try:
                 normal = self.expand_multivariate(a - b)
-                if normal == Expr(0):
+                if normal is expr_zero:
                     return True
             except NotImplementedError:
                 pass
@@ -1109,6 +1992,13 @@ class Brain(object):
         if NotEqual(b, a) in self.inferences:
             return False
 
+        # decided pairs are recorded in the inferences, undecided ones here
+        if ("equal", a, b) in self.simple_cache:
+            eqv = Equal(a, b)
+            self.simple_cache[eqv] = eqv
+            self.simple_cache[Equal(b, a)] = eqv
+            return None
+
         val = self._equal(a, b)
         if val is True:
             eqv = True_
@@ -1120,6 +2010,13 @@ class Brain(object):
             eqv = False_
         else:
             eqv = Equal(a, b)
+            self.simple_cache[("equal", a, b)] = None
+            self.simple_cache[("equal", b, a)] = None
+        if val is not None:
+            if b is expr_zero:
+                self.update_domain_bits(a)
+            elif a is expr_zero:
+                self.update_domain_bits(b)
 
         self.simple_cache[Equal(a, b)] = eqv
         self.simple_cache[Equal(b, a)] = eqv
@@ -1127,47 +2024,49 @@ class Brain(object):
         return val
 
     def is_one(self, x):
-        return self.equal(x, Expr(1))
+        return self.equal(x, expr_one)
 
     def is_neg_one(self, x):
-        return self.equal(x, Expr(-1))
+        return self.equal(x, expr_neg_one)
 
     def greater(self, a, b):
         v = self.simple(Greater(a, b))
-        if v == True_:
+        if v is True_:
             return True
-        if v == False_:
+        if v is False_:
             return False
         return None
 
     def less(self, a, b):
         v = self.simple(Less(a, b))
-        if v == True_:
+        if v is True_:
             return True
-        if v == False_:
+        if v is False_:
             return False
         return None
 
     def greater_equal(self, a, b):
         v = self.simple(GreaterEqual(a, b))
-        if v == True_:
+        if v is True_:
             return True
-        if v == False_:
+        if v is False_:
             return False
         return None
 
     def less_equal(self, a, b):
+        if a.is_integer() and b.is_integer():
+            return int(a) <= int(b)
         v = self.simple(LessEqual(a, b))
-        if v == True_:
+        if v is True_:
             return True
-        if v == False_:
+        if v is False_:
             return False
         return None
 
     def is_extended_real(self, x):
-        if x == Infinity:
+        if x is Infinity:
             return True
-        if x == -Infinity:
+        if x == neg_infinity:
             return True
         v = self.is_real(x)
         if v:
@@ -1182,6 +2081,21 @@ class Brain(object):
         Returns True, False, or None for unknown.
         """
         assert isinstance(x, Expr)
+        key = ("element", x, S)
+        v = self.simple_cache.get(key, _MISSING)
+        if v is _MISSING:
+            # Assumptions only grow in nested contexts, so an answer
+            # already decided in an enclosing context remains valid.
+            for cache in self.outer_caches:
+                v = cache.get(key)
+                if v is not None:
+                    break
+            else:
+                v = self._element(x, S)
+            self.simple_cache[key] = v
+        return v
+
+    def _element(self, x, S):
         if Element(x, S) in self.inferences:
             return True
         if NotElement(x, S) in self.inferences:
@@ -1203,8 +2117,9 @@ class Brain(object):
             z = self.is_integer(x)
             if not z:
                 return z
-            if x.is_integer() and int(x) <= 20:
-                return int(x) in [2,3,5,7,11,13,17,19]
+            v = x._integer
+            if v is not None and v <= small_primes_max:
+                return v in small_primes
             return None
         if S == AlgebraicNumbers:
             return self.is_algebraic(x)
@@ -1269,41 +2184,51 @@ class Brain(object):
             return self.is_element_Lattice(x, S)
         # todo: check for comprehensions
         if head == Set:
-            check = [self.equal(x, y) for y in S.args()]
-            if True in check:
-                return True
-            if all(c == False for c in check):
-                return False
-            return None
+            result = False
+            for y in S.args():
+                v = self.equal(x, y)
+                if v == True:
+                    return True
+                if v != False:
+                    result = None
+            return result
         # todo: check for comprehensions
         if head == Union:
             if len(S.args()) == 0:
                 return False
-            check = [self.element(x, T) for T in S.args()]
-            if True in check:
-                return True
-            if all(c == False for c in check):
-                return False
-            return None
+            # try the cheapest members first so that a decisive answer
+            # is found early
+            result = False
+            for T in sorted(S.args(), key=self.complexity):
+                v = self.element(x, T)
+                if v == True:
+                    return True
+                if v != False:
+                    result = None
+            return result
         # todo: check for comprehensions
         if head == Intersection:
             assert len(S.args()) >= 1
-            check = [self.element(x, T) for T in S.args()]
-            if all(c == True for c in check):
-                return True
-            if False in check:
-                return False
-            return None
+            result = True
+            for T in sorted(S.args(), key=self.complexity):
+                v = self.element(x, T)
+                if v == False:
+                    return False
+                if v != True:
+                    result = None
+            return result
         if head == SetMinus:
             assert len(S.args()) == 2
             T, U = S.args()
             v1 = self.element(x, T)
-            if v1 == False:
-                return False
+            if v1 != True:
+                if v1 == False:
+                    return False
+                return None
             v2 = self.element(x, U)
-            if v1 == True and v2 == False:
+            if v2 == False:
                 return True
-            if v1 == True and v2 == True:
+            if v2 == True:
                 return False
             return None
         return None
@@ -1313,9 +2238,9 @@ class Brain(object):
         Return an expression equivalent to Not(x), simplified if possible.
         """
         x = self.simple(x)
-        if x == True_:
+        if x is True_:
             return False_
-        if x == False_:
+        if x is False_:
             return True_
         if x.head() == NotEqual and len(x.args()) == 2:
             return Equal(*x.args())
@@ -1329,60 +2254,72 @@ class Brain(object):
 
     def simple_And(self, *args):
         # todo: identify For-expression iteration, etc.
-        # todo: early termination
         # todo: postponed simplifications
-        args = [self.simple(arg) for arg in args]
-        if False_ in args:
-            return False_
-        args = [arg for arg in args if arg != True_]
-        if len(args) == 0:
+        terms = []
+        seen = set()
+        for arg in args:
+            arg = self.simple(arg)
+            if arg is False_:
+                return False_
+            if arg is not True_ and arg not in seen:
+                seen.add(arg)
+                terms.append(arg)
+        if len(terms) == 0:
             return True_
-        if len(args) == 1:
-            return args[0]
-        return And(*args)
+        if len(terms) == 1:
+            return terms[0]
+        return And(*terms)
 
     def simple_Or(self, *args):
         # todo: identify For-expression iteration, etc.
-        # todo: early termination
         # todo: postponed simplifications
-        args = [self.simple(arg) for arg in args]
-        if True_ in args:
-            return True_
-        args = [arg for arg in args if arg != False_]
-        if len(args) == 0:
+        terms = []
+        seen = set()
+        for arg in args:
+            arg = self.simple(arg)
+            if arg is True_:
+                return True_
+            if arg is not False_ and arg not in seen:
+                seen.add(arg)
+                terms.append(arg)
+        if len(terms) == 0:
             return False_
-        if len(args) == 1:
-            return args[0]
-        return Or(*args)
+        if len(terms) == 1:
+            return terms[0]
+        return Or(*terms)
 
     def simple_Implies(self, *args):
         args = [self.simple(arg) for arg in args]
         assert len(args) == 2
         P, Q = args
-        if P == False_:
+        if P is False_:
             return True_
-        if P == True_:
+        if P is True_:
             return Q
         return Implies(*args)
 
     def simple_Equal(self, *args):
-        args = [self.simple(arg) for arg in args]
+        # integer atoms (typically the 0 in Equal(x, 0)) are already simple
+        args = [arg if arg._integer is not None else self.simple(arg) for arg in args]
         assert len(args) >= 2   # define Equal for len = 0, 1 ?
+        # structurally identical arguments are trivially equal,
+        # so only the distinct ones need to be compared
+        distinct = list(dict.fromkeys(args))
         # all equal
-        if all(self.equal(args[0], arg) for arg in args[1:]):
+        if all(self.equal(distinct[0], arg) for arg in distinct[1:]):
             return True_
         # any not equal
-        for i in range(len(args)):
-            for j in range(i + 1, len(args)):
-                a = args[i]
-                b = args[j]
+        for i in range(len(distinct)):
+            for j in range(i + 1, len(distinct)):
+                a = distinct[i]
+                b = distinct[j]
                 if self.equal(a, b) == False:
                     return False_
         # todo: remove duplicates?
         return Equal(*args)
 
     def simple_NotEqual(self, *args):
-        args = [self.simple(arg) for arg in args]
+        args = [arg if arg._integer is not None else self.simple(arg) for arg in args]
         if len(args) != 2:
             return NotEqual(*args) # XXX
         # all equal
@@ -1432,35 +2369,61 @@ class Brain(object):
                 return True_
         return NotElement(*args)
 
-    def simple_LessEqual(self, *args):
-        args = [self.simple(arg) for arg in args]
-        if len(args) == 2:
-            a, b = args
-            if a.is_integer() and b.is_integer():
-                if int(a) <= int(b):
-                    return True_
+    def _simple_order(self, lhs, rhs, strict, greater):
+        """
+        Decides lhs < rhs, lhs <= rhs, lhs > rhs or lhs >= rhs (according
+        to the flags strict and greater) for simplified lhs and rhs.
+        Returns True_, False_, or None for unknown.
+        """
+        # a > b and a >= b are decided as b < a and b <= a
+        if greater:
+            a, b = rhs, lhs
+        else:
+            a, b = lhs, rhs
+        if a.is_integer() and b.is_integer():
+            if strict:
+                return True_ if int(a) < int(b) else False_
+            return True_ if int(a) <= int(b) else False_
+        if self.is_real(lhs) and self.is_real(rhs):
+            v = self.real_enclosure(lhs - rhs)
+            if v is not None:
+                if greater:
+                    v = -v
+                if strict:
+                    if v < 0:
+                        return True_
+                    if v >= 0:
+                        return False_
                 else:
-                    return False_
-            if self.is_real(a) and self.is_real(b):
-                v = self.real_enclosure(a - b)
-                if v is not None:
                     if v <= 0:
                         return True_
                     if v > 0:
                         return False_
-            if self.is_extended_real(a) and self.is_extended_real(b):
-                if self.equal(a, b):
-                    return True_
-                if a == -Infinity:
-                    return True_
-                if b == Infinity:
-                    return True_
-                if self.is_real(a) and b == -Infinity:
-                    return False_
-                if self.is_real(b) and a == Infinity:
-                    return False_
-                if a == Infinity and b == -Infinity:
-                    return False_
+        if self.is_extended_real(lhs) and self.is_extended_real(rhs):
+            if self.equal(lhs, rhs):
+                return False_ if strict else True_
+            key = (self.extended_real_category(a), self.extended_real_category(b))
+            if strict:
+                return extended_real_less.get(key)
+            return extended_real_less_equal.get(key)
+        return None
+
+    def extended_real_category(self, x):
+        if x is Infinity:
+            return xreal_pos_inf
+        if x == neg_infinity:
+            return xreal_neg_inf
+        if self.is_real(x):
+            return xreal_finite
+        return xreal_unknown
+
+    def simple_LessEqual(self, *args):
+        args = [self.simple(arg) for arg in args]
+        if len(args) == 2:
+            a, b = args
+            v = self._simple_order(a, b, False, False)
+            if v is not None:
+                return v
         # todo: generalize, improve
         if len(args) == 3:
             a, b, c = args
@@ -1469,64 +2432,20 @@ class Brain(object):
 
     def simple_Less(self, *args):
         args = [self.simple(arg) for arg in args]
-        if len(args) == 2:
-            a, b = args
-            if a.is_integer() and b.is_integer():
-                if int(a) < int(b):
-                    return True_
-                else:
-                    return False_
-            if self.is_real(a) and self.is_real(b):
-                v = self.real_enclosure(a - b)
-                if v is not None:
-                    if v < 0:
-                        return True_
-                    if v >= 0:
-                        return False_
-            if self.is_extended_real(a) and self.is_extended_real(b):
-                if self.equal(a, b):
-                    return False_
-                if a == -Infinity and self.is_real(b):
-                    return True_
-                if a == -Infinity and b == Infinity:
-                    return True_
-                if self.is_real(a) and b == Infinity:
-                    return True_
-                if a == Infinity:
-                    return False_
-                if b == -Infinity:
-                    return False_
+        if len(args) == 2:
+            a, b = args
+            v = self._simple_order(a, b, True, False)
+            if v is not None:
+                return v
         return Less(*args)
 
     def simple_GreaterEqual(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 2:
             a, b = args
-            if a.is_integer() and b.is_integer():
-                if int(a) >= int(b):
-                    return True_
-                else:
-                    return False_
-            if self.is_real(a) and self.is_real(b):
-                v = self.real_enclosure(a - b)
-                if v is not None:
-                    if v >= 0:
-                        return True_
-                    if v < 0:
-                        return False_
-            if self.is_extended_real(a) and self.is_extended_real(b):
-                if self.equal(a, b):
-                    return True_
-                if b == -Infinity:
-                    return True_
-                if a == Infinity:
-                    return True_
-                if self.is_real(b) and a == -Infinity:
-                    return False_
-                if self.is_real(a) and b == Infinity:
-                    return False_
-                if b == Infinity and a == -Infinity:
-                    return False_
+            v = self._simple_order(a, b, False, True)
+            if v is not None:
+                return v
             if self.is_zero(b) and self.is_positive(a):
                 return True_
         return GreaterEqual(*args)
@@ -1535,68 +2454,44 @@ class Brain(object):
         args = [self.simple(arg) for arg in args]
         if len(args) == 2:
             a, b = args
-            if a.is_integer() and b.is_integer():
-                if int(a) > int(b):
-                    return True_
-                else:
-                    return False_
-            if self.is_real(a) and self.is_real(b):
-                v = self.real_enclosure(a - b)
-                if v is not None:
-                    if v > 0:
-                        return True_
-                    if v <= 0:
-                        return False_
-            if self.is_extended_real(a) and self.is_extended_real(b):
-                if self.equal(a, b):
-                    return False_
-                if b == -Infinity and self.is_real(a):
-                    return True_
-                if b == -Infinity and a == Infinity:
-                    return True_
-                if self.is_real(b) and a == Infinity:
-                    return True_
-                if b == Infinity:
-                    return False_
-                if a == -Infinity:
-                    return False_
+            v = self._simple_order(a, b, True, True)
+            if v is not None:
+                return v
         return Greater(*args)
 
-    def simple_Pos(self, x):
-        return self.simple(x)
-
-    def simple_Parentheses(self, x):
-        return self.simple(x)
-
-    def simple_Brackets(self, x):
-        return self.simple(x)
-
-    def simple_Braces(self, x):
-        return self.simple(x)
-
     def complexity(self, expr):
-        if expr in self.penalty:
-            return self.penalty[expr]
-        if expr.is_integer():
-            v = int(expr)
-            return 1 + v.bit_length() + (v<0)
-        if expr.is_atom():
-            if expr in [True_, False_]:
-                return 1
-            if expr in [Add, Sub, Neg, Pos, Mul]:
-                return 10
-            if expr in [Div, Sqrt, GoldenRatio, ConstI]:
-                return 20
-            if expr in [Pi, ConstE, Pow, Exp, Log, Sin, Cos, Tan, Sinh, Cosh, Tanh]:
-                return 100
-            if expr in [Gamma, Erf, Erfc, Erfi, RiemannZeta, ConstGamma, ConstCatalan]:
-                return 1000
-            return 1000000
-        head = expr.head()
-        args = expr.args()
-        a = self.complexity(head)
-        b = sum(self.complexity(arg) for arg in args)
-        return a + 2*b + 1
+        """
+        Returns a score for the size of expr, used to choose between
+        equivalent expressions. Scores only depend on expr and the
+        penalty table, so they are cached for the lifetime of the brain.
+        """
+        cache = self.complexity_cache
+        v = cache.get(expr)
+        if v is not None:
+            return v
+        # Post-order walk with an explicit stack, so that large or deeply
+        # nested expressions do not pay for (or overflow) Python recursion.
+        penalty = self.penalty
+        stack = [(expr, False)]
+        while stack:
+            node, ready = stack.pop()
+            if node in cache:
+                continue
+            if ready:
+                v = cache[node._args[0]]
+                v += 2 * sum(cache[arg] for arg in node._args[1:])
+                cache[node] = v + 1
+            elif node in penalty:
+                cache[node] = penalty[node]
+            elif node._integer is not None:
+                v = node._integer
+                cache[node] = 1 + v.bit_length() + (v<0)
+            elif node._args is None:
+                cache[node] = atom_complexity.get(node, 1000000)
+            else:
+                stack.append((node, True))
+                stack.extend((arg, False) for arg in node._args)
+        return cache[expr]
 
     def sort_expressions(self, terms):
         return sorted(terms, key=lambda x: (not self.is_real(x), self.complexity(x), str(x)))
@@ -1626,36 +2521,36 @@ class Brain(object):
             return Neg(x)
         if head == Add:
             args = [self.polish_arithmetic(arg) for arg in expr.args()]
-            args = [arg for arg in args if arg != Expr(0)]
+            args = [arg for arg in args if arg is not expr_zero]
             if len(args) == 0:
-                return Expr(0)
+                return expr_zero
             if len(args) == 1:
                 return args[0]
             return Add(*args)
         if head == Mul:
             args = [self.polish_arithmetic(arg) for arg in expr.args()]
             for arg in args:
-                if arg == Expr(0):
+                if arg is expr_zero:
                     return arg
-            args = [arg for arg in args if arg != Expr(1)]
+            args = [arg for arg in args if arg is not expr_one]
             if len(args) == 0:
-                return Expr(1)
+                return expr_one
             if len(args) == 1:
                 return args[0]
             return Mul(*args)
         if head == Div:
             args = [self.polish_arithmetic(arg) for arg in expr.args()]
             p, q = args
-            if q == Expr(1):
+            if q is expr_one:
                 return p
         if head == Pow:
             args = [self.polish_arithmetic(arg) for arg in expr.args()]
             x, y = args
-            if y == Expr(0):
-                return Expr(1)
-            if y == Expr(1):
+            if y is expr_zero:
+                return expr_one
+            if y is expr_one:
                 return x
-            if y == Expr(-1):
+            if y is expr_neg_one:
                 return 1 / x
         return head(*args)
 
@@ -1757,7 +2652,7 @@ class Brain(object):
         for blob in blobs:
             if blob.head() in (Pow, Sqrt):
                 if blob.head() == Sqrt:
-                    expo = Div(1, 2)
+                    expo = expr_half
                     base = blob.args()[0]
                 if blob.head() == Pow:
                     expo = blob.args()[1]
@@ -1824,7 +2719,7 @@ class Brain(object):
         qgens = [fmpz_mpoly_q(x) for x in gens]
 
         blobs_list = list(blobs)   # todo: useful to sort?
-        blobs_list = sorted(blobs_list, key=lambda x: (not self.is_real(x), self.complexity(x), str(x)))
+        blobs_list = self.sort_expressions(blobs_list)
 
         blobs = {blob : qgens[blobs_list.index(blob)] for blob in blobs}
 
@@ -1878,7 +2773,7 @@ class Brain(object):
                 return idealize(process(x) - process(y))
             if head == Add:
                 if not args:
-                    return process(Expr(0))
+                    return process(expr_zero)
                 if len(args) == 1:
                     return process(args[0])
                 s = process(args[0])
@@ -1887,7 +2782,7 @@ class Brain(object):
                 return s
             if head == Mul:
                 if not args:
-                    return process(Expr(1))
+                    return process(expr_one)
                 if len(args) == 1:
                     return process(args[0])
                 s = process(args[0])
@@ -1914,7 +2809,7 @@ class Brain(object):
 
         def poly_as_expr(pol):
             if not pol:
-                return Expr(0)
+                return expr_zero
             terms = []
             for i in range(len(pol)):
                 c = pol.coefficient(i)
@@ -1932,7 +2827,7 @@ class Brain(object):
             return Add(*terms)
 
         if poly_q.p == 0:
-            return Expr(0)
+            return expr_zero
 
         if poly_q.q == 1:
             return self.polish_arithmetic(poly_as_expr(poly_q.p))
@@ -1942,65 +2837,57 @@ class Brain(object):
     def evaluate_fmpq(self, expr):
         if expr.is_integer():
             return self._fmpq(int(expr))
-        elif expr.head() == Neg:
-            x, = expr.args()
-            return -self.evaluate_fmpq(x)
-        elif expr.head() == Sub:
-            x, y = expr.args()
-            return self.evaluate_fmpq(x) - self.evaluate_fmpq(y)
-        elif expr.head() == Add:
-            s = self._fmpq(0)
-            for x in expr.args():
-                s += self.evaluate_fmpq(x)
-            return s
-        elif expr.head() == Mul:
-            s = self._fmpq(1)
-            for x in expr.args():
-                s *= self.evaluate_fmpq(x)
-            return s
-        elif expr.head() == Div:
-            x, y = expr.args()
-            return self.evaluate_fmpq(x) / self.evaluate_fmpq(y)
-        elif expr.head() == Pow:
-            x, y = expr.args()
-            y = self.simple(y)
-            if y.is_integer():
-                a = self.evaluate_fmpq(x)
-                b = int(y)
-                if abs(a) == 1:
-                    b = b % 2
-                # todo: more systematic solution
-                if a.height_bits() * abs(b) < 10000:
-                    return a ** b
+        handler = fmpq_head_handlers.get(expr.head())
+        if handler is not None:
+            return handler(self, expr.args())
         raise NotImplementedError
 
     def evaluate_fmpq_poly(self, expr, var):
-        from flint import fmpq_poly, fmpq
+        fmpq_poly = self._fmpq_poly
+        fmpq = self._fmpq
         if expr == var:
             return fmpq_poly([0,1])
         elif expr.is_integer():
             return fmpq_poly([fmpq(int(expr))])
-        elif expr.head() == Neg:
-            x, = expr.args()
+        head = expr.head()
+        args = expr.args()
+        if head == Neg:
+            x, = args
             return -self.evaluate_fmpq_poly(x, var)
-        elif expr.head() == Sub:
-            x, y = expr.args()
+        elif head == Sub:
+            x, y = args
             return self.evaluate_fmpq_poly(x, var) - self.evaluate_fmpq_poly(y, var)
-        elif expr.head() == Add:
+        elif head == Add:
+            n = 0
             s = fmpq_poly()
-            for x in expr.args():
-                s += self.evaluate_fmpq_poly(x, var)
-            return s
-        elif expr.head() == Mul:
-            s = fmpq_poly([1])
-            for x in expr.args():
-                s *= self.evaluate_fmpq_poly(x, var)
-            return s
-        elif expr.head() == Div:
-            x, y = expr.args()
+            for x in args:
+                v = x._integer
+                if v is not None:
+                    n += v
+                else:
+                    s += self.evaluate_fmpq_poly(x, var)
+            return s + n
+        elif head == Mul:
+            n = 1
+            factors = []
+            for x in args:
+                v = x._integer
+                if v is not None:
+                    n *= v
+                else:
+                    factors.append(self.evaluate_fmpq_poly(x, var))
+            # multiply pairwise so that the operands stay balanced in degree
+            while len(factors) > 1:
+                factors = [factors[k] * factors[k+1] if k + 1 < len(factors) else factors[k]
+                    for k in range(0, len(factors), 2)]
+            if factors:
+                return factors[0] * n
+            return fmpq_poly([n])
+        elif head == Div:
+            x, y = args
             return self.evaluate_fmpq_poly(x, var) / self.evaluate_fmpq(y)
-        elif expr.head() == Pow:
-            x, y = expr.args()
+        elif head == Pow:
+            x, y = args
             x = self.evaluate_fmpq_poly(x, var)
             y = self.evaluate_fmpq(y)
             if y.q == 1 and y.p >= 0:
@@ -2011,22 +2898,98 @@ class Brain(object):
             v = self.evaluate_fmpq(expr)
             return fmpq_poly([v])
 
+    def evaluate_fmpq_ratfunc(self, expr, var):
+        """
+        Convert expr to a rational function of var, returned as a pair
+        (numerator, denominator) of fmpq_polys.
+        """
+        if var not in expr._symbols_frozenset():
+            return self._fmpq_poly([self.evaluate_fmpq(expr)]), self._fmpq_poly([1])
+        head = expr.head()
+        args = expr.args()
+        if head == Div:
+            x, y = args
+            p1, q1 = self.evaluate_fmpq_ratfunc(x, var)
+            p2, q2 = self.evaluate_fmpq_ratfunc(y, var)
+            if p2 == 0:
+                raise ZeroDivisionError
+            return p1 * q2, q1 * p2
+        elif head == Pow:
+            x, y = args
+            y = self.evaluate_fmpq(y)
+            if y.q != 1:
+                raise NotImplementedError
+            p, q = self.evaluate_fmpq_ratfunc(x, var)
+            e = int(y.p)
+            if e < 0:
+                if p == 0:
+                    raise ZeroDivisionError
+                p, q = q, p
+                e = -e
+            # same size limit as for rational powers (see _fmpq_Pow)
+            bits = 0
+            for r in (p, q):
+                bits += max(r.degree(), 0) + r.numer().height_bits() + r.denom().bit_length()
+            if bits * e >= 10000:
+                raise NotImplementedError
+            return p ** e, q ** e
+        elif head == Neg:
+            x, = args
+            p, q = self.evaluate_fmpq_ratfunc(x, var)
+            return -p, q
+        elif head == Add or head == Sub:
+            p, q = self.evaluate_fmpq_ratfunc(args[0], var)
+            for k in range(1, len(args)):
+                p2, q2 = self.evaluate_fmpq_ratfunc(args[k], var)
+                if head == Sub:
+                    p2 = -p2
+                if q == q2:
+                    p += p2
+                else:
+                    p, q = p * q2 + p2 * q, q * q2
+            return p, q
+        elif head == Mul:
+            p, q = self.evaluate_fmpq_ratfunc(args[0], var)
+            for k in range(1, len(args)):
+                p2, q2 = self.evaluate_fmpq_ratfunc(args[k], var)
+                p, q = p * p2, q * q2
+            return p, q
+        return self.evaluate_fmpq_poly(expr, var), self._fmpq_poly([1])
+
+    def fmpq_poly_partial_sum(self, poly):
+        """
+        Given a polynomial p, returns the polynomial F with
+        F(n) = p(0) + p(1) + ... + p(n-1), using Faulhaber's formula.
+        Sums over any integer range a..b are then F(b+1) - F(a).
+        """
+        fmpq = self._fmpq
+        bin_uiui = self._fmpz.bin_uiui
+        coeffs = [fmpq(0)] * (poly.degree() + 2)
+        for k, c in enumerate(poly.coeffs()):
+            if c == 0:
+                continue
+            c = c / (k + 1)
+            for j in range(k + 1):
+                coeffs[k + 1 - j] += c * bin_uiui(k + 1, j) * fmpq.bernoulli(j)
+        return self._fmpq_poly(coeffs)
+
     def evaluate_fmpq_mat(self, expr):
-        from flint import fmpq_mat, fmpq
-        if expr.head() == Matrix2x1:
-            a, b = expr.args()
+        fmpq_mat = self._fmpq_mat
+        head = expr.head()
+        args = expr.args()
+        if head == Matrix2x1:
+            a, b = args
             a = self.evaluate_fmpq(a)
             b = self.evaluate_fmpq(b)
             return fmpq_mat([[a],[b]])
-        if expr.head() == Matrix2x2:
-            a, b, c, d = expr.args()
+        if head == Matrix2x2:
+            a, b, c, d = args
             a = self.evaluate_fmpq(a)
             b = self.evaluate_fmpq(b)
             c = self.evaluate_fmpq(c)
             d = self.evaluate_fmpq(d)
             return fmpq_mat([[a,b],[c,d]])
-        if expr.head() == Matrix:
-            args = expr.args()
+        if head == Matrix:
             if len(args) == 1 and args[0].head() in (List, Tuple):
                 rows = args[0].args()
                 eval_rows = []
@@ -2049,41 +3012,47 @@ class Brain(object):
                     b = int(b)
                     c = int(c)
                     d = int(d)
+                    # Substitute the row index once per row and build the
+                    # column indices once; cells that do not depend on the
+                    # column index are evaluated once per row.
+                    free = elem.free_variables()
+                    cols = [Expr(jj) for jj in range(c, d+1)]
                     rows = []
                     for ii in range(a, b+1):
-                        rows.append([])
-                        for jj in range(c, d+1):
-                            # xxx
-                            val = elem.replace({i:Expr(ii), j:Expr(jj)}, semantic=True)
-                            val = self.evaluate_fmpq(val)
-                            rows[-1].append(val)
+                        if i in free:
+                            row_elem = elem.replace({i:Expr(ii)}, semantic=True)
+                        else:
+                            row_elem = elem
+                        if j in free:
+                            row = [self.evaluate_fmpq(row_elem.replace({j:jj}, semantic=True)) for jj in cols]
+                        else:
+                            row = [self.evaluate_fmpq(row_elem)] * len(cols)
+                        rows.append(row)
                     return fmpq_mat(rows)
-        if expr.head() == Neg:
-            A, = args()
+        if head == Neg:
+            A, = args
             return -self.evaluate_fmpq_mat(A)
-        if expr.head() == Sub:
-            A, B = args()
+        if head == Sub:
+            A, B = args
             return self.evaluate_fmpq_mat(A) - self.evaluate_fmpq_mat(B)
-        if expr.head() == Add and len(expr.args()) >= 1:
-            args = expr.args()
+        if head == Add and len(args) >= 1:
             A = self.evaluate_fmpq_mat(args[0])
             for B in args[1:]:
                 A += self.evaluate_fmpq_mat(B)
             return A
-        if expr.head() == Mul and len(expr.args()) >= 1:
-            args = expr.args()
+        if head == Mul and len(args) >= 1:
             A = self.evaluate_fmpq_mat(args[0])
             for B in args[1:]:
                 A *= self.evaluate_fmpq_mat(B)
             return A
-        if expr.head() == Pow:
-            mat, exp = expr.args()
+        if head == Pow:
+            mat, exp = args
             exp = self.simple(exp)
             if exp.is_integer():
                 mat = self.evaluate_fmpq_mat(mat)
                 return mat ** int(exp)
-        if expr.head() == HilbertMatrix:
-            n, = expr.args()
+        if head == HilbertMatrix:
+            n, = args
             n = self.simple(n)
             if n.is_integer() and int(n) >= 0:
                 n = int(n)
@@ -2091,7 +3060,7 @@ class Brain(object):
         raise NotImplementedError
 
     def _evaluate_alg(self, expr):
-        from .algebraic import alg
+        alg = self._alg
         if expr.is_atom():
             if expr.is_integer():
                 return alg(int(expr))
@@ -2100,79 +3069,17 @@ class Brain(object):
             if expr == GoldenRatio:
                 return alg.phi()
             raise ValueError
-        head = expr.head()
-        if head == Pos:
-            x, = expr.args()
-            return self._evaluate_alg(x)
-        elif head == Neg:
-            x, = expr.args()
-            return -self._evaluate_alg(x)
-        elif head == Sub:
-            x, y = expr.args()
-            return self._evaluate_alg(x) - self._evaluate_alg(y)
-        elif head == Add:
-            s = alg(0)
-            for x in expr.args():
-                s += self._evaluate_alg(x)
-            return s
-        elif head == Mul:
-            s = alg(1)
-            for x in expr.args():
-                s *= self._evaluate_alg(x)
-            return s
-        elif head == Div:
-            x, y = expr.args()
-            return self._evaluate_alg(x) / self._evaluate_alg(y)
-        elif head == Sqrt:
-            x, = expr.args()
-            return self._evaluate_alg(x).sqrt()
-        elif head == Pow:
-            x, y = expr.args()
-            x = self._evaluate_alg(x)
-            y = self._evaluate_alg(y)
-            return x ** y
-        elif head == Sign:
-            x, = expr.args()
-            return self._evaluate_alg(x).sgn()
-        elif head == Re:
-            x, = expr.args()
-            return self._evaluate_alg(x).real
-        elif head == Im:
-            x, = expr.args()
-            return self._evaluate_alg(x).imag
-        elif head == Abs:
-            x, = expr.args()
-            return abs(self._evaluate_alg(x))
-        elif head in (Exp, Cos, Sin, Tan, Cot, Sec, Csc):
-            x, = expr.args()
-            if head == Exp:
-                v = self.simple(x / (Pi * ConstI))
-            else:
-                v = self.simple(x / Pi)
-            v = self._evaluate_alg(v)
-            if v.is_rational():
-                v = v.fmpq()
-                if head == Exp:
-                    return alg.exp_pi_i(v)
-                elif head == Cos:
-                    return alg.cos_pi(v)
-                elif head == Sin:
-                    return alg.sin_pi(v)
-                elif head == Tan:
-                    return alg.tan_pi(v)
-                elif head == Cot:
-                    return alg.cot_pi(v)
-                elif head == Sec:
-                    return alg.sec_pi(v)
-                elif head == Csc:
-                    return alg.csc_pi(v)
+        handler = alg_head_handlers.get(expr.head())
+        if handler is not None:
+            return handler(self, expr.args())
         raise NotImplementedError
 
     def evaluate_alg(self, expr):
-        if ("evaluate_alg", expr) in self.simple_cache:
-            val = self.simple_cache[("evaluate_alg", expr)]
+        val = self.simple_cache.get(("evaluate_alg", expr), _MISSING)
+        if val is not _MISSING:
             if val is None:
                 raise NotImplementedError
+            return val
 
         # try exact computation
         from .algebraic import alg_get_degree_limit, alg_set_degree_limit
@@ -2201,9 +3108,20 @@ class Brain(object):
             return None
 
     def alg_to_expression(self, x):
-        from .algebraic import alg
+        """
+        Returns an expression for the algebraic number x, or None.
+        The result only depends on x, so it is cached for the lifetime
+        of the brain.
+        """
+        x = self._alg(x)
+        v = self.alg_expr_cache.get(x, _MISSING)
+        if v is _MISSING:
+            v = self._alg_to_expression(x)
+            self.alg_expr_cache[x] = v
+        return v
 
-        x = alg(x)
+    def _alg_to_expression(self, x):
+        alg = self._alg
 
         if x.is_rational():
             x = x.fmpq()
@@ -2249,12 +3167,17 @@ class Brain(object):
                 else:
                     return Sub(A, Mul(-b, B))
 
-        from flint import fmpz_poly, fmpq
+        fmpz_poly = self._fmpz_poly
+        fmpq = self._fmpq
 
         pol = x.minpoly()
         d = pol.degree()
-        # identify roots of unity
-        n = pol.is_cyclotomic()
+        # identify roots of unity (cyclotomic polynomials are monic
+        # with constant term +/- 1)
+        if pol[d] == 1 and abs(pol[0]) == 1:
+            n = pol.is_cyclotomic()
+        else:
+            n = 0
         if n > 0:
             pol2 = fmpz_poly.cyclotomic(n)
             if pol == pol2:
@@ -2274,10 +3197,8 @@ class Brain(object):
                     if u.minpoly().is_cyclotomic():
                         return v * self.alg_to_expression(u)
 
-        fmpq = self._fmpq
         # try depression
-        deg = x.degree()
-        pol = x.minpoly()
+        deg = d
         a = pol[deg]
         b = pol[deg-1]
         if b != 0:
@@ -2308,9 +3229,9 @@ class Brain(object):
                             t = self._fmpq(k,n) + self._fmpq(1,2)
                             k, n = t.p, t.q
                         B = self.simple_Exp_two_pi_i_k_n(k, n)
-                        if B == Expr(1):
+                        if B is expr_one:
                             return A
-                        if B == Expr(-1):
+                        if B is expr_neg_one:
                             return Neg(A)
                         if B == ConstI:
                             return A * B
@@ -2331,15 +3252,17 @@ class Brain(object):
             C = Pow(C, Div(1, 3))
             w1 = self.simple_Exp_two_pi_i_k_n(1, 3)
             w2 = self.simple_Exp_two_pi_i_k_n(2, 3)
-            x0 = (int(b) + C + int(D0) / C) / (-3*a)
-            x1 = (int(b) + w1*C + w2 * int(D0) / C) / int(-3*a)
-            x2 = (int(b) + w2*C + w1 * int(D0) / C) / int(-3*a)
-            if self.evaluate_alg(x0) == x:
-                return x0
-            if self.evaluate_alg(x1) == x:
-                return x1
-            if self.evaluate_alg(x2) == x:
-                return x2
+            # identify the root among the candidates using the algebraic
+            # values of C and w1, w2 rather than evaluating each expression
+            C_alg = C3.root(3)
+            w1_alg = alg.exp_two_pi_i(self._fmpq(1, 3))
+            w2_alg = alg.exp_two_pi_i(self._fmpq(2, 3))
+            if (b + C_alg + D0 / C_alg) / (-3*a) == x:
+                return (int(b) + C + int(D0) / C) / (-3*a)
+            if (b + w1_alg*C_alg + w2_alg * D0 / C_alg) / (-3*a) == x:
+                return (int(b) + w1*C + w2 * int(D0) / C) / int(-3*a)
+            if (b + w2_alg*C_alg + w1_alg * D0 / C_alg) / (-3*a) == x:
+                return (int(b) + w2*C + w1 * int(D0) / C) / int(-3*a)
         if x.degree() == 4:
             # see: http://eqworld.ipmnet.ru/en/solutions/ae/ae0108.pdf
 
@@ -2380,12 +3303,14 @@ class Brain(object):
                     resroots2.append(r)
 
             resroots3 = []
+            resroots3_alg = []
             for r in resroots2:
                 v = r.sqrt()
                 if v.degree() <= 2:
                     resroots3.append(self.alg_to_expression(v))
                 else:
                     resroots3.append(Sqrt(self.alg_to_expression(r)))
+                resroots3_alg.append(v)
 
             # todo: when one term has degree <= 2, consider subtracting
             # it and obtaining a simpler expression for the sum
@@ -2394,10 +3319,12 @@ class Brain(object):
 
             a, b, c = resroots3
             xs = [a+b+c, a+b-c, a-b+c, a-b-c, -a+b+c, -a+b-c, -a-b+c, -a-b-c]
-            for xn in xs:
-                xn = xn / 2
-                xn += shift
-                if self.evaluate_alg(xn) == x:
+            a, b, c = resroots3_alg
+            xs_alg = [a+b+c, a+b-c, a-b+c, a-b-c, -a+b+c, -a+b-c, -a-b+c, -a-b-c]
+            for xn, xn_alg in zip(xs, xs_alg):
+                if xn_alg / 2 + shift == x:
+                    xn = xn / 2
+                    xn += shift
                     return xn
 
         if not x.is_real():
@@ -2405,9 +3332,9 @@ class Brain(object):
             if re is not None:
                 im = self.alg_to_expression(x.imag)
                 if im is not None:
-                    if im == Expr(0):
+                    if im is expr_zero:
                         return re
-                    elif re == Expr(0):
+                    elif re is expr_zero:
                         return im*ConstI
                     else:
                         return re + im*ConstI
@@ -2415,31 +3342,11 @@ class Brain(object):
 
     def simple_Exp_two_pi_i_k_n(self, k, n):
         k = k % n
-        if k == 0:
-            return Expr(1)
-        if n == 2 * k:
-            return Expr(-1)
-        if n == 4 * k:
-            return ConstI
-        if 3 * n == 4 * k:
-            return -ConstI
-        if n == 8 * k:
-            return Sqrt(2)/2 * (1 + ConstI)
-        if 3 * n == 8 * k:
-            return Sqrt(2)/2 * (-1 + ConstI)
-        if 5 * n == 8 * k:
-            return Sqrt(2)/2 * (-1 - ConstI)
-        if 7 * n == 8 * k:
-            return Sqrt(2)/2 * (1 - ConstI)
-        if n == 3 * k:
-            return (-1 + Sqrt(3)*ConstI)/2
-        if 2 * n == 3 * k:
-            return (-1 - Sqrt(3)*ConstI)/2
-        if n == 6 * k:
-            return (1 + Sqrt(3)*ConstI)/2
-        if 5 * n == 6 * k:
-            return (1 - Sqrt(3)*ConstI)/2
-        u = 2 * self._fmpq(k, n)
+        u = self._fmpq(k, n)
+        v = exp_two_pi_i_table.get((int(u.p), int(u.q)))
+        if v is not None:
+            return v
+        u *= 2
         p = int(u.p)
         q = int(u.q)
         if p == 1:
@@ -2532,7 +3439,7 @@ class Brain(object):
         
         """
         if len(terms) == 0:
-            return Expr(0)
+            return expr_zero
         if len(terms) == 1:
             return self.simple(terms[0])
         # todo: we want to avoid recursive Add simplifies if possible...
@@ -2551,100 +3458,119 @@ class Brain(object):
                     return UnsignedInfinity
                 signs = [Sign(x) for x in infinities]
                 same = [self.simple(Equal(s, signs[0])) for s in signs[1:]]
-                if all(s == True_ for s in same):
+                if all(s is True_ for s in same):
                     if signs[0] == Undefined:
                         return UnsignedInfinity
                     return self.simple(Mul(signs[0], Infinity))
                 if False_ in same:
                     return Undefined
             return Add(*terms)
-        constant_term = self._fmpz(0)
-        term_coeff = {}
-        def iter_term_coeff(terms):
-            for x in terms:
-                if x.is_integer():
-                    yield Expr(1), self._fmpz(int(x))
+        fmpz = self._fmpz
+        fmpq = self._fmpq
+        fmpz_one = fmpz(1)
+        fmpz_neg_one = fmpz(-1)
+        constant_term = fmpz(0)
+        def extract_rational_content(x):
+            coeff = fmpz_one
+            if x.head() == Mul:
+                old_factors = list(x.args())
+                factors = []
+                for fac in old_factors:
+                    fac, c = extract_rational_content(fac)
+                    coeff *= c
+                    factors.append(fac)
+                if factors == old_factors:
+                    return x, fmpz_one
+                else:
+                    return self.simple(Mul(*factors)), coeff
+            if x.head() == Div:
+                old_p, old_q = x.args()
+                p, pc = extract_rational_content(old_p)
+                q, qc = extract_rational_content(old_q)
+                if old_p == p and old_q == q:
+                    return x, fmpz_one
+                else:
+                    return self.simple(Div(p, q)), pc / fmpq(qc)
+            if x.head() == Pow:
+                a, b = x.args()
+                if b.is_integer():
+                    fac, c = extract_rational_content(a)
+                    if fac != a:
+                        e = int(b)
+                        if abs(c) == 1:
+                            e %= 2
+                        if c.height_bits() * e < 10000:
+                            return fac ** b, c ** e
+                return x, fmpz_one
+            # todo: robustly standardize sign content of Add, Sub, Neg, ... ?
+            if x.head() == Neg:
+                a, = x.args()
+                return a, fmpz_neg_one
+            try:
+                v = self.evaluate_fmpq(x)
+                return expr_one, v
+            except NotImplementedError:
+                pass
+            return x, fmpz_one
+
+        # flatten nested Add/Sub/Neg into (term, coefficient) pairs, in
+        # left-to-right order, with an explicit stack
+        def term_coeffs(terms):
+            out = []
+            stack = [(x, 1) for x in reversed(terms)]
+            while stack:
+                x, sign = stack.pop()
+                v = x._integer
+                if v is not None:
+                    c = fmpz(v)
+                    out.append((expr_one, c if sign == 1 else -c))
                     continue
                 head = x.head()
-                if head == Add:
-                    for t, c in iter_term_coeff(x.args()):
-                        yield t, c
-                elif head == Sub:
+                if head is Add:
+                    stack.extend((t, sign) for t in reversed(x.args()))
+                elif head is Sub:
                     x, y = x.args()
-                    for t, c in iter_term_coeff([x]):
-                        yield t, c
-                    for t, c in iter_term_coeff([y]):
-                        yield t, -c
-                elif head == Neg:
+                    stack.append((y, -sign))
+                    stack.append((x, sign))
+                elif head is Neg:
                     x, = x.args()
-                    for t, c in iter_term_coeff([x]):
-                        yield t, -c
-                elif head in (Mul, Div, Pow):
-                    def extract_rational_content(x):
-                        coeff = self._fmpz(1)
-                        if x.head() == Mul:
-                            old_factors = list(x.args())
-                            factors = []
-                            for fac in old_factors:
-                                fac, c = extract_rational_content(fac)
-                                coeff *= c
-                                factors.append(fac)
-                            if factors == old_factors:
-                                return x, self._fmpz(1)
-                            else:
-                                return self.simple(Mul(*factors)), coeff
-                        if x.head() == Div:
-                            old_p, old_q = x.args()
-                            p, pc = extract_rational_content(old_p)
-                            q, qc = extract_rational_content(old_q)
-                            if old_p == p and old_q == q:
-                                return x, self._fmpz(1)
-                            else:
-                                return self.simple(Div(p, q)), pc / self._fmpq(qc)
-                        if x.head() == Pow:
-                            a, b = x.args()
-                            if b.is_integer():
-                                fac, c = extract_rational_content(a)
-                                if fac != a:
-                                    e = int(b)
-                                    if abs(c) == 1:
-                                        e %= 2
-                                    if c.height_bits() * e < 10000:
-                                        return fac ** b, c ** e
-                            return x, self._fmpz(1)
-                        # todo: robustly standardize sign content of Add, Sub, Neg, ... ?
-                        if x.head() == Neg:
-                            a, = x.args()
-                            return a, self._fmpz(-1)
-                        try:
-                            v = self.evaluate_fmpq(x)
-                            return Expr(1), v
-                        except NotImplementedError:
-                            pass
-                        return x, self._fmpz(1)
-                    yield extract_rational_content(x)
+                    stack.append((x, -sign))
+                elif head is Mul or head is Div or head is Pow:
+                    t, c = extract_rational_content(x)
+                    out.append((t, c if sign == 1 else -c))
                 else:
-                    yield x, self._fmpz(1)
-        for t, c in iter_term_coeff(terms):
+                    out.append((x, fmpz_one if sign == 1 else fmpz_neg_one))
+            return out
+
+        # collect coefficients in parallel lists, indexed by object
+        # identity for hash-consed expressions
+        term_list = []
+        coeff_list = []
+        position = {}
+        for t, c in term_coeffs(terms):
             # todo: detect rationals
             #if t.is_integer() and c.is_integer():
             #    t = int(t)
             #    c = int(c)
             #    constant_term += t * c
             #    continue
-            if t in term_coeff:
-                term_coeff[t] += c
+            key = id(t) if t._args is not None or t._symbol is not None else t
+            i = position.get(key)
+            if i is None:
+                position[key] = len(term_list)
+                term_list.append(t)
+                coeff_list.append(c)
             else:
-                term_coeff[t] = c
+                coeff_list[i] += c
         terms = []
-        for t, c in term_coeff.items():
+        for t, c in zip(term_list, coeff_list):
             if c == 0:
                 continue
             elif c == 1:
                 terms.append(t)
             elif c == -1:
-                if t == Expr(1):
-                    terms.append(Expr(-1))
+                if t is expr_one:
+                    terms.append(expr_neg_one)
                 else:
                     terms.append(Neg(t))
             else:
@@ -2658,11 +3584,11 @@ class Brain(object):
                 else:
                     c = int(c)
                     terms.append(self.simple_Mul(t, Expr(c)))
-        terms = sorted(terms, key=lambda x: (not self.is_real(x), self.complexity(x), str(x)))
+        terms = self.sort_expressions(terms)
         if constant_term != 0:
             terms = [Expr(int(constant_term))] + terms
         if len(terms) == 0:
-            return Expr(0)
+            return expr_zero
         if len(terms) == 1:
             return terms[0]
         if len(terms) == 2 and terms[1].head() == Neg:
@@ -2684,7 +3610,7 @@ class Brain(object):
         Simple product.
         """
         if len(factors) == 0:
-            return Expr(1)
+            return expr_one
         #if len(factors) == 1:
         #    return self.simple(factors[0])
         #print("BEGIN MUL", factors)
@@ -2708,10 +3634,10 @@ class Brain(object):
                     others.append(fac)
             if infinities and not others:
                 s = self.simple(Mul(*(Sign(x) for x in infinities + nonzero)))
-                if self.equal(s, Expr(1)):
+                if self.equal(s, expr_one):
                     return Infinity
-                if self.equal(s, Expr(-1)):
-                    return -Infinity
+                if self.equal(s, expr_neg_one):
+                    return neg_infinity
                 if s == Undefined:
                     return UnsignedInfinity
                 return Mul(s, Infinity)
@@ -2720,46 +3646,70 @@ class Brain(object):
             return Mul(*factors)
 
         for x in factors:
-            if x == Expr(0):
-                return Expr(0)
-        prefactor = self._fmpz(1)
-        base_exp = {}
-        def iter_base_exp(factors):
-            for x in factors:
+            if x is expr_zero:
+                return expr_zero
+        fmpz = self._fmpz
+        fmpq = self._fmpq
+        prefactor = fmpz(1)
+        # flatten nested Mul/Div/Pow into (base, exponent) pairs, in
+        # left-to-right order, with an explicit stack; ops records how
+        # the exponents of a subexpression change on the way up: None
+        # negates, an integer exponent multiplies
+        def base_exps(factors):
+            # ops records the negations and integer powers enclosing a
+            # factor; since they are all integers, k is their product and
+            # integer exponents are scaled by it without calling simple_Mul
+            out = []
+            def up(e, ops, k):
+                if e.is_integer():
+                    return Expr(int(e) * k)
+                for op in ops:
+                    if op is None:
+                        e = self.simple_Neg(e)
+                    else:
+                        e = self.simple_Mul(e, op)
+                return e
+            stack = [(x, (), 1) for x in reversed(factors)]
+            while stack:
+                x, ops, k = stack.pop()
                 head = x.head()
-                if head == Mul:
-                    for b, e in iter_base_exp(x.args()):
-                        yield b, e
-                elif head == Div:
+                if head is Mul:
+                    stack.extend((f, ops, k) for f in reversed(x.args()))
+                elif head is Div:
                     p, q = x.args()
-                    for b, e in iter_base_exp([p]):
-                        yield b, e
-                    for b, e in iter_base_exp([q]):
-                        yield b, self.simple_Neg(e)
-                elif head == Exp:
+                    stack.append((q, (None,) + ops, -k))
+                    stack.append((p, ops, k))
+                elif head is Exp:
                     v, = x.args()
-                    yield ConstE, v
-                elif head == Pow:
+                    out.append((ConstE, up(v, ops, k)))
+                elif head is Pow:
                     b, e = x.args()
                     #b = self.simple(b)
                     if e.is_integer():
-                        for b2, e2 in iter_base_exp([b]):
-                            yield b2, self.simple_Mul(e2, e)
+                        stack.append((b, (e,) + ops, int(e) * k))
                     else:
-                        yield b, e
-                elif head == Sqrt:
+                        out.append((b, up(e, ops, k)))
+                elif head is Sqrt:
                     v, = x.args()
-                    yield v, Div(1, 2)
-                elif head == Neg:
+                    if k % 2:
+                        out.append((v, up(expr_half, ops, k)))
+                    else:
+                        out.append((v, Expr(k // 2)))
+                elif head is Neg:
                     v, = x.args()
-                    yield Expr(-1), Expr(1)
-                    for b, e in iter_base_exp([v]):
-                        yield b, e
+                    out.append((expr_neg_one, Expr(k)))
+                    stack.append((v, ops, k))
                 else:
-                    yield x, Expr(1)
-
-        # iterate over all factors; extract rational numbers
-        for b, e in iter_base_exp(factors):
+                    out.append((x, Expr(k)))
+            return out
+
+        # iterate over all factors; extract rational numbers, and collect
+        # exponents in parallel lists (indexed as in simple_Add)
+        base_list = []
+        exp_list = []
+        position = {}
+        int_exps = {}
+        for b, e in base_exps(factors):
             if b.is_integer() and e.is_integer():
                 bb = int(b)
                 ee = int(e)
@@ -2767,26 +3717,36 @@ class Brain(object):
                     if bb == -1:
                         if ee % 2:
                             prefactor = -prefactor
-                    elif ee >= 0:
-                        prefactor *= self._fmpz(bb)**ee
+                    elif bb == 0 and ee < 0:
+                        prefactor *= fmpq(1,bb**(-ee))
                     else:
-                        prefactor *= self._fmpq(1,bb**(-ee))
+                        # powers of the same integer are combined first
+                        int_exps[bb] = int_exps.get(bb, 0) + ee
                     continue
-            if b in base_exp:
-                base_exp[b] += e
+            key = id(b) if b._args is not None or b._symbol is not None else b
+            i = position.get(key)
+            if i is None:
+                position[key] = len(base_list)
+                base_list.append(b)
+                exp_list.append(e)
             else:
-                base_exp[b] = e
+                exp_list[i] += e
+        for bb, ee in int_exps.items():
+            if ee > 0:
+                prefactor *= fmpz(bb)**ee
+            elif ee < 0:
+                prefactor *= fmpq(1,bb**(-ee))
         factors = []
         den_factors = []
 
         # simplify individual powers
-        for b, e in base_exp.items():
+        for b, e in zip(base_list, exp_list):
 
             e = self.simple(e)
             if b == ConstE:
-                if e == Expr(0):
+                if e is expr_zero:
                     continue
-                if e == Expr(1):
+                if e is expr_one:
                     factors.append(b)
                     continue
                 v = self.simple(e / (Pi * ConstI))
@@ -2826,7 +3786,7 @@ class Brain(object):
             elif e.head() == Neg:
                 e, = e.args()
                 den_factors.append(Pow(b, e))
-            elif e == Div(1, 2):
+            elif e is expr_half:
                 factors.append(Sqrt(b))
             else:
                 factors.append(Pow(b, e))
@@ -2836,26 +3796,26 @@ class Brain(object):
             prefactor = Expr(int(prefactor.p))
         else:
             prefactor = Expr(int(prefactor))
-            prefactor_den = Expr(1)
-        factors = sorted(factors, key=lambda x: (not self.is_real(x), self.complexity(x), str(x)))
-        den_factors = sorted(den_factors, key=lambda x: (not self.is_real(x), self.complexity(x), str(x)))
-        if prefactor != Expr(1):
+            prefactor_den = expr_one
+        factors = self.sort_expressions(factors)
+        den_factors = self.sort_expressions(den_factors)
+        if prefactor is not expr_one:
             factors = [prefactor] + factors
-        if prefactor_den != Expr(1):
+        if prefactor_den is not expr_one:
             den_factors = [prefactor_den] + den_factors
         if len(factors) == 0:
-            num = Expr(1)
+            num = expr_one
         elif len(factors) == 1:
             num = factors[0]
         else:
             num = Mul(*factors)
         if len(den_factors) == 0:
-            den = Expr(1)
+            den = expr_one
         elif len(den_factors) == 1:
             den = den_factors[0]
         else:
             den = Mul(*den_factors)
-        if den == Expr(1):
+        if den is expr_one:
             return num
         else:
             return Div(num, den)
@@ -2876,7 +3836,7 @@ class Brain(object):
             if self.is_infinity(y):
                 return Undefined
         if self.is_infinity(y) and self.is_complex(x):
-            return Expr(0)
+            return expr_zero
         # c / 0
         if self.is_zero(y):
             if self.is_complex(x):
@@ -2899,15 +3859,15 @@ class Brain(object):
                 b = int(y)
                 if 0 <= b <= 2:
                     return Expr(a**b)
-            if y == Expr(0):
-                return Expr(1)
-            if y == Expr(1):
+            if y is expr_zero:
+                return expr_one
+            if y is expr_one:
                 return x
-            if x == Expr(1):
-                return Expr(1)
-            if x == Expr(0):
+            if x is expr_one:
+                return expr_one
+            if x is expr_zero:
                 if self.is_positive(y):
-                    return Expr(0)
+                    return expr_zero
                 if self.is_negative(y):
                     return UnsignedInfinity
 
@@ -2923,7 +3883,7 @@ class Brain(object):
         x = self.simple(x)
         if self.is_complex(x):
             if self.is_zero(x):
-                return Expr(1)
+                return expr_one
             if self.is_one(x):
                 return ConstE
         return Exp(x)
@@ -2933,11 +3893,11 @@ class Brain(object):
         x = self.simple(x)
         if self.is_complex(x):
             if self.is_zero(x):
-                return -Infinity
-            if self.equal(x, Expr(1)):
-                return Expr(0)
+                return neg_infinity
+            if self.equal(x, expr_one):
+                return expr_zero
             if self.equal(x, ConstE):
-                return Expr(1)
+                return expr_one
             if x.is_integer():
                 n = self._fmpz(int(x))
                 fac = n.factor_smooth()
@@ -2998,7 +3958,7 @@ class Brain(object):
                     b //= content
                     if v > 0:
                         y = a + b * Sqrt(c)
-                        tail = Expr(0)
+                        tail = expr_zero
                     else:
                         y = -a + (-b) * Sqrt(c)
                         tail = Pi * ConstI
@@ -3006,7 +3966,7 @@ class Brain(object):
                     tail += Log(content)
                     tail -= Log(den)
                     tail = self.simple(tail)
-                    if tail == Expr(0):
+                    if tail is expr_zero:
                         return Log(y)
                     return self.simple(Log(y) + tail)
 
@@ -3020,38 +3980,15 @@ class Brain(object):
 
     def simple_Sin(self, x):
         x = self.simple(x)
-        if x == Expr(0):
+        if x is expr_zero:
             return x
         if self.is_complex(x):
             v = self.simple(x / Pi)
             if self.is_integer(v):
-                return Expr(0)
+                return expr_zero
             v = self.simple(x * (120 / Pi))
             if v.is_integer():
-                v = int(v)
-                v = v % 240
-                def _sin(v):
-                    if v > 60:
-                        v = 120 - v
-                    if v == 0: return Expr(0)
-                    if v == 10: return (Sqrt(2)*(Sqrt(3)-1))/4   # todo: sqrt(6)?
-                    if v == 12: return (Sqrt(5)-1)/4
-                    if v == 15: return Sqrt(2-Sqrt(2))/2
-                    if v == 20: return Div(1,2)
-                    if v == 30: return Sqrt(2)/2
-                    if v == 36: return (Sqrt(5)+1)/4
-                    if v == 40: return Sqrt(3)/2
-                    if v == 45: return Sqrt(Sqrt(2)+2)/2
-                    if v == 50: return (Sqrt(2)*(Sqrt(3)+1))/4
-                    if v == 60: return Expr(1)
-                    if v > 30:
-                        return Cos(self.simple(Pi*(60-v)/120))
-                    else:
-                        return Sin(self.simple(Pi*v/120))
-                if v >= 120:
-                    return self.simple(-_sin(v-120))
-                else:
-                    return _sin(v)
+                return self.simple_Sin_pi_120(int(v))
             if self.is_negative(x):
                 return -Sin(self.simple(-x))
             v = self.simple(x / ConstI)
@@ -3059,14 +3996,40 @@ class Brain(object):
                 return self.simple(Sinh(v) * ConstI)
         return Sin(x)
 
+    def simple_Sin_pi_120(self, v):
+        """
+        Simplified form of Sin(Pi*v/120) for an integer v. There are only
+        240 distinct values, which are remembered for the lifetime of the
+        brain.
+        """
+        v = v % 240
+        res = self.sin_pi_120_cache[v]
+        if res is None:
+            def _sin(v):
+                if v > 60:
+                    v = 120 - v
+                w = sin_pi_120_table.get(v)
+                if w is not None:
+                    return w
+                if v > 30:
+                    return Cos(self.simple(Pi*(60-v)/120))
+                else:
+                    return Sin(self.simple(Pi*v/120))
+            if v >= 120:
+                res = self.simple(-_sin(v-120))
+            else:
+                res = _sin(v)
+            self.sin_pi_120_cache[v] = res
+        return res
+
     def simple_Cos(self, x):
         x = self.simple(x)
-        if x == Expr(0):
-            return Expr(1)
+        if x is expr_zero:
+            return expr_one
         if self.is_complex(x):
             v = self.simple(x * (120 / Pi))
             if v.is_integer():
-                return self.simple(Sin((int(v)+60)*Pi/120))
+                return self.simple_Sin_pi_120(int(v) + 60)
             if self.is_negative(x):
                 return Cos(self.simple(-x))
             v = self.simple(x / ConstI)
@@ -3080,21 +4043,18 @@ class Brain(object):
         Return an expression equivalent to Sqrt(x), simplified if possible.
         """
         x = self.simple(x)
-        if x in (Expr(0), Expr(1), Infinity, UnsignedInfinity, Undefined):
+        if x in (expr_zero, expr_one, Infinity, UnsignedInfinity, Undefined):
             return x
-        if x == Expr(-1):
+        if x is expr_neg_one:
             return ConstI
-        if x == -Infinity:
+        if x == neg_infinity:
             return ConstI * Infinity
         if x.is_integer():
-            # todo: call an actual square root function
             v = int(x)
             real = v >= 0
-            v = abs(v)
-            if v < 1e100:
-                r = int(round(v ** 0.5))
-                if r * r == v:
-                    return Expr(r) if real else Expr(r)*ConstI
+            r, rem = self._fmpz(abs(v)).sqrtrem()
+            if rem == 0:
+                return Expr(r) if real else Expr(r)*ConstI
         # todo: wanted?
         if self.is_negative(x):
             return self.simple_Sqrt(-x) * ConstI
@@ -3115,33 +4075,32 @@ class Brain(object):
         if x.is_integer():
             v = int(x)
             if v > 0:
-                return Expr(1)
+                return expr_one
             if v < 0:
-                return Expr(-1)
-            return Expr(0)
+                return expr_neg_one
+            return expr_zero
         if x == Undefined or x == UnsignedInfinity:
             return Undefined
-        if x == Infinity:
-            return Expr(1)
+        if x is Infinity:
+            return expr_one
         if x == Neg(Infinity):
-            return Expr(-1)
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+            return expr_neg_one
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0:
                 if real > 0:
-                    return Expr(1)
+                    return expr_one
                 if real < 0:
-                    return Expr(-1)
+                    return expr_neg_one
             if real == 0:
                 if imag >= 0:
                     return ConstI
                 if imag < 0:
                     return -ConstI
         if self.is_positive(x):
-            return Expr(1)
+            return expr_one
         if self.is_negative(x):
-            return Expr(-1)
+            return expr_neg_one
         if x.head() == Exp and self.is_complex(x):
             return self.simple(Exp(ConstI * Im(x.args()[0])))
         if x.head() == Mul and self.is_infinity(x):
@@ -3158,35 +4117,34 @@ class Brain(object):
         if x.is_integer():
             v = int(x)
             if v > 0:
-                return Expr(1)
+                return expr_one
             if v < 0:
-                return Expr(-1)
-            return Expr(0)
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+                return expr_neg_one
+            return expr_zero
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0:
                 if real > 0:
-                    return Expr(1)
+                    return expr_one
                 if real < 0:
-                    return Expr(-1)
+                    return expr_neg_one
             if real == 0:
                 if imag > 0:
-                    return Expr(1)
+                    return expr_one
                 if imag < 0:
-                    return Expr(-1)
+                    return expr_neg_one
         # todo: exact tests for the real and imaginary part ...
         if self.is_positive(x):
-            return Expr(1)
+            return expr_one
         if self.is_negative(x):
-            return Expr(-1)
+            return expr_neg_one
         return Csgn(x)
 
     # todo: optimizations; delay symbolic evaluation; definition for nonreals...
     def simple_Max(self, *args):
         args = [self.simple(x) for x in args]
         if len(args) == 0:
-            return -Infinity
+            return neg_infinity
         if len(args) == 1:
             return args[0]
         if len(args) == 2:
@@ -3252,9 +4210,8 @@ class Brain(object):
             return x
         if self.is_infinity(x):
             return Infinity
-        val = self.complex_enclosure(x)
-        if val is not None:
-            real, imag = val.real, val.imag
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
             if imag == 0:
                 if real >= 0:
                     return x
@@ -3283,38 +4240,15 @@ class Brain(object):
             return Re(x)
         if self.is_real(x):
             return x
-        if x.head() == Add:
-            return self.simple_Add(*[self.simple_Re(t) for t in x.args()])
-        if x.head() == Sub:
-            a, b = x.args()
-            return self.simple_Sub(self.simple_Re(a), self.simple_Re(b))
-        if x.head() == Neg:
-            a, = x.args()
-            return self.simple_Neg(self.simple_Re(a))
-        if x.head() == Mul:
-            real = []
-            nonreal = []
-            for t in x.args():
-                if self.is_real(t):
-                    real.append(t)
-                else:
-                    nonreal.append(t)
-            if real:
-                return self.simple(Mul(*real) * Re(Mul(*nonreal)))
-        if x.head() == Div:
-            a, b = x.args()
-            if self.is_not_zero(b):
-                if self.is_real(b):
-                    if self.is_real(a):
-                        return a / b
-                    return self.simple(Re(a) / b)
-        if x.head() == Exp:
-            a, = x.args()
-            return self.simple(Exp(Re(a)) * Cos(Im(a)))
-        v = self.complex_enclosure(x)
-        if v is not None:
-            if v.real == 0:
-                return Expr(0)
+        handler = re_head_handlers.get(x.head())
+        if handler is not None:
+            v = handler(self, x)
+            if v is not None:
+                return v
+        real, imag = self.enclosure_parts(x)
+        if real is not None:
+            if real == 0:
+                return expr_zero
         return Re(x)
 
     def simple_Im(self, x):
@@ -3322,30 +4256,14 @@ class Brain(object):
         if not self.is_complex(x):
             return Im(x)
         if self.is_real(x):
-            return Expr(0)
-        if x == ConstI:
-            return Expr(1)
-        if x.head() == Add:
-            return self.simple_Add(*[self.simple_Im(t) for t in x.args()])
-        if x.head() == Sub:
-            a, b = x.args()
-            return self.simple_Sub(self.simple_Im(a), self.simple_Im(b))
-        if x.head() == Neg:
-            a, = x.args()
-            return self.simple_Neg(self.simple_Im(a))
-        if x.head() == Mul:
-            real = []
-            nonreal = []
-            for t in x.args():
-                if self.is_real(t):
-                    real.append(t)
-                else:
-                    nonreal.append(t)
-            if real:
-                return self.simple(Mul(*real) * Im(Mul(*nonreal)))
-        if x.head() == Exp:
-            a, = x.args()
-            return self.simple(Exp(Re(a)) * Sin(Im(a)))
+            return expr_zero
+        if x is ConstI:
+            return expr_one
+        handler = im_head_handlers.get(x.head())
+        if handler is not None:
+            v = handler(self, x)
+            if v is not None:
+                return v
         xdivi = self.simple(x / ConstI)
         if self.is_real(xdivi):
             return xdivi
@@ -3355,10 +4273,10 @@ class Brain(object):
         x = self.simple(x)
         if not self.is_complex(x):
             return Arg(x)
-        if x == Expr(0):
+        if x is expr_zero:
             return x
         if self.is_nonnegative(x):
-            return Expr(0)
+            return expr_zero
         if self.is_negative(x):
             return Pi
         if self.is_positive(x / ConstI):
@@ -3375,6 +4293,11 @@ class Brain(object):
         x = self.simple(x)
         if self.is_integer(x):
             return x
+        # exact rational: no enclosure needed
+        try:
+            return Expr(self.evaluate_fmpq(x).floor())
+        except (NotImplementedError, ZeroDivisionError):
+            pass
         # xxx: dynamic precision / bounds
         v = self.real_enclosure(Floor(x))
         if v is not None:
@@ -3388,6 +4311,11 @@ class Brain(object):
         x = self.simple(x)
         if self.is_integer(x):
             return x
+        # exact rational: no enclosure needed
+        try:
+            return Expr(self.evaluate_fmpq(x).ceil())
+        except (NotImplementedError, ZeroDivisionError):
+            pass
         # xxx: dynamic precision / bounds
         v = self.real_enclosure(Ceil(x))
         if v is not None:
@@ -3412,7 +4340,7 @@ class Brain(object):
                         return DirichletCharacter(*args)
                     a = char.chi_exponent(n)
                     if a is None:
-                        return Expr(0)
+                        return expr_zero
                     b = char.group().exponent()
                     return self.simple_Exp_two_pi_i_k_n(a, b)
         return DirichletCharacter(*args)
@@ -3450,19 +4378,29 @@ class Brain(object):
                             return Set(var, ForElement(var, domain))
                         else:
                             return Set(var, ForElement(var, domain), orig_cond)
-                    from .algebraic import alg
-                    roots = alg.polynomial_roots(poly)
+                    # multiplicities are not needed, so only the
+                    # squarefree part has to be factored
+                    if poly.degree() > 1:
+                        g = poly.gcd(poly.derivative())
+                        if g.degree() > 0:
+                            poly = poly // g
+                    roots = self._alg.polynomial_roots(poly)
                     roots = [r for (r, multiplicity) in roots]
                     roots_expr = []
+                    # every root is a complex number
+                    trivial_cond = domain == CC and orig_cond is True_
                     for r in roots:
                         r = self.alg_to_expression(r)
                         if r is None:
                             return Zeros(*args)   # unable to express
+                        if trivial_cond:
+                            roots_expr.append(r)
+                            continue
                         r_cond = cond.replace({var:r}, semantic=True)
                         r_cond = self.simple(r_cond)
-                        if r_cond == True_:
+                        if r_cond is True_:
                             roots_expr.append(r)
-                        elif r_cond == False_:
+                        elif r_cond is False_:
                             pass
                         else:
                             return Zeros(*args)   # unable to decide?
@@ -3477,7 +4415,7 @@ class Brain(object):
             if z.is_integer():
                 n = int(z)
                 if n <= 0:
-                    return Expr(0)
+                    return expr_zero
                 if n <= 100:
                     p = f = self._fmpz(1)
                     for k in range(2, n-1):
@@ -3519,7 +4457,7 @@ class Brain(object):
         if A.head() == IdentityMatrix:
             n, = A.args()
             if self.is_integer(n) and self.is_nonnegative(n):
-                return Expr(1)
+                return expr_one
         if A.head() == HilbertMatrix:
             n, = A.args()
             if self.is_integer(n) and self.is_nonnegative(n):
@@ -3620,25 +4558,48 @@ class Brain(object):
                 b = self.simple(b)
                 cond = self.simple(cond)
                 # Sum must be empty if the condition is always false
-                if cond == False_:
-                    return Expr(0)
+                if cond is False_:
+                    return expr_zero
                 # Todo: when do we want to pre-simplify?
                 # with self.assuming(cond):
                 #     expr = self.simple(expr)
                 if a.is_integer() and b.is_integer():
                     a = int(a)
                     b = int(b)
+                    p = q = None
+                    if cond is True_:
+                        try:
+                            p, q = self.evaluate_fmpq_ratfunc(expr, var)
+                        except (NotImplementedError, ZeroDivisionError):
+                            pass
+                        # polynomial summand: closed form, unless adding up
+                        # the terms is cheaper (Faulhaber costs O(deg^2))
+                        if (q is not None and q.degree() == 0 and a <= b and
+                                (b - a > 100 or b - a + 1 > p.degree())):
+                            F = self.fmpq_poly_partial_sum(p / q[0])
+                            return self.simple(Expr(F(b+1) - F(a)))
                     if b - a <= 100:
-                        if cond == True_:
+                        if cond is True_:
+                            # rational function summand: add up exact
+                            # values unless a pole is hit
+                            if p is not None:
+                                total = 0
+                                for i in range(a,b+1):
+                                    d = q(i)
+                                    if d == 0:
+                                        break
+                                    total += p(i) / d
+                                else:
+                                    return self.simple(Expr(total))
                             terms = [expr.replace({var:i}, semantic=True) for i in range(a,b+1)]
                         else:
                             terms = []
                             for i in range(a,b+1):
                                 include = self.simple(cond.replace({var:i}, semantic=True))
-                                if include == True_:
+                                if include is True_:
                                     term = expr.replace({var:i}, semantic=True)
                                     terms.append(expr.replace({var:i}, semantic=True))
-                                elif include == False_:
+                                elif include is False_:
                                     continue
                                 else:
                                     # todo: break if a large number of unknowns? (ugly)
@@ -3649,7 +4610,7 @@ class Brain(object):
                 # Possibly simplified if symbolic output
                 with self.assuming(cond):
                     expr = self.simple(expr)
-                if cond == True_:
+                if cond is True_:
                     args = [expr, For(var, a, b)]
                 else:
                     args = [expr, For(var, a, b), cond]
@@ -3671,8 +4632,8 @@ class Brain(object):
                 b = self.simple(b)
                 cond = self.simple(cond)
                 # Product must be empty if the condition is always false
-                if cond == False_:
-                    return Expr(1)
+                if cond is False_:
+                    return expr_one
                 # Todo: when do we want to pre-simplify?
                 # with self.assuming(cond):
                 #     expr = self.simple(expr)
@@ -3680,16 +4641,16 @@ class Brain(object):
                     a = int(a)
                     b = int(b)
                     if b - a <= 100:
-                        if cond == True_:
+                        if cond is True_:
                             terms = [expr.replace({var:i}, semantic=True) for i in range(a,b+1)]
                         else:
                             terms = []
                             for i in range(a,b+1):
                                 include = self.simple(cond.replace({var:i}, semantic=True))
-                                if include == True_:
+                                if include is True_:
                                     term = expr.replace({var:i}, semantic=True)
                                     terms.append(expr.replace({var:i}, semantic=True))
-                                elif include == False_:
+                                elif include is False_:
                                     continue
                                 else:
                                     # todo: break if a large number of unknowns? (ugly)
@@ -3700,7 +4661,7 @@ class Brain(object):
                 # Possibly simplified if symbolic output
                 with self.assuming(cond):
                     expr = self.simple(expr)
-                if cond == True_:
+                if cond is True_:
                     args = [expr, For(var, a, b)]
                 else:
                     args = [expr, For(var, a, b), cond]
@@ -3711,17 +4672,32 @@ class Brain(object):
         defs = list(args[1:])
 
         # todo: semantic substitutions (stopping at new bound variables)
-        def replace_func(expr, func, func_args, func_value):
+        def replace_func(expr, func, func_args, func_value, memo=None):
+            # memo: shared subexpressions are rewritten only once
+            if memo is None:
+                memo = {}
+            elif expr in memo:
+                return memo[expr]
+            # subtrees that never mention func stay as they are
+            if func._symbol is not None and func not in expr._symbols_frozenset():
+                return expr
             if expr.head() == func:
                 args = expr.args()
                 if len(args) != len(func_args):
                     raise ValueError("function called with wrong number of arguments")
-                return func_value.replace(dict(zip(func_args, args)))
-            if expr.is_atom():
+                result = func_value.replace(dict(zip(func_args, args)))
+            elif expr.is_atom():
                 return expr
-            head = replace_func(expr.head(), func, func_args, func_value)
-            args = [replace_func(arg, func, func_args, func_value) for arg in expr.args()]
-            return head(*args)
+            else:
+                parts = expr._args
+                new_parts = [replace_func(x, func, func_args, func_value, memo) for x in parts]
+                # leave unchanged branches as they are
+                if all(a is b for a, b in zip(parts, new_parts)):
+                    result = expr
+                else:
+                    result = new_parts[0](*new_parts[1:])
+            memo[expr] = result
+            return result
 
         try:
 
@@ -3787,42 +4763,46 @@ class Brain(object):
                 if n >= 4 and n % 2 == 0 and n <= 20:
                     c = (-1)**(n//2+1) * fmpq.bernoulli(n) / (2 * fmpz.fac_ui(n)) * 2**n
                     return self.simple(Expr(c) * Pi**n)
-            if s == Infinity:
-                return Expr(1)
+            if s is Infinity:
+                return expr_one
             if s.head() == RiemannZetaZero:
                 n, = s.args()
                 if self.is_integer(n) and self.is_not_zero(n):
-                    return Expr(0)
+                    return expr_zero
         if len(args) == 2:
             s, r = args
             if r.is_integer() and int(r) >= 0:
                 r = int(r)
                 if r == 0:
                     return self.simple(RiemannZeta(s))
-                if r == 1 and s == Expr(0):
+                if r == 1 and s is expr_zero:
                     return -(Log(2*Pi)/2)
-                if s == Expr(1):
+                if s is expr_one:
                     return UnsignedInfinity
-                if s == Infinity:
-                    return Expr(0)
+                if s is Infinity:
+                    return expr_zero
         return RiemannZeta(*args)
 
     def simple_Cases(self, *args):
         unknown = []
         for arg in args:
             val, cond = arg.args()
-            cond = self.simple(cond)
-            if cond == True_:
-                return self.simple(val)
-            if cond == False_:
-                continue
+            if cond is not Otherwise:
+                cond = self.simple(cond)
+                if cond is True_:
+                    return self.simple(val)
+                if cond is False_:
+                    continue
             unknown.append((val, cond))
+        # every other case was ruled out
+        if len(unknown) == 1 and unknown[0][1] is Otherwise:
+            return self.simple(unknown[0][0])
         otherwise_cond = None
         unknown2 = []
         for val, cond in unknown:
-            if cond == Otherwise:
+            if cond is Otherwise:
                 if otherwise_cond is None:
-                    otherwise_cond = And(*(Not(cond) for (val, cond) in unknown if cond != Otherwise))
+                    otherwise_cond = And(*(Not(cond) for (val, cond) in unknown if cond is not Otherwise))
                     otherwise_cond = self.simple(otherwise_cond)
                 with self.assuming(otherwise_cond):
                     val = self.simple(val)
@@ -3830,98 +4810,84 @@ class Brain(object):
                 with self.assuming(cond):
                     val = self.simple(val)
             unknown2.append((val, cond))
-        if len(unknown2) == 1 and unknown2[0][1] == Otherwise:
-            return unknown2[0][0]
         return Cases(*unknown2)
 
     def simple_AiryAi(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 2:
-            if args[1] == Expr(0):
+            if args[1] is expr_zero:
                 args = [args[0]]
         if len(args) == 1:
             x, = args
-            if x == Expr(0):
-                return (Gamma(Div(1,3)) / (2*3**Div(1,6)*Pi))
-            if x == Infinity:
-                return Expr(0)
-            if x == -Infinity:
-                return Expr(0)
+            if x is expr_zero:
+                return airy_values_at_zero[AiryAi, 0]
+            if x is Infinity:
+                return expr_zero
+            if x == neg_infinity:
+                return expr_zero
             if x.head() == AiryAiZero:
-                if len(x.args()) == 1 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) == True_:
-                    return Expr(0)
+                if len(x.args()) == 1 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) is True_:
+                    return expr_zero
         if len(args) == 2:
             x, r = args
             if r.is_integer():
                 n = int(r)
-                if x == Expr(0):
+                if x is expr_zero:
                     if n % 3 == 2:
-                        return Expr(0)
+                        return expr_zero
                     if n == 1:
-                        return -(1/(3**Div(1,3) * Gamma(Div(1,3))))
-                if self.is_complex(x):
-                    if n == 2:
-                        return (x * AiryAi(x)).simple()
-                    if n == 3:
-                        return (AiryAi(x) + x * AiryAi(x, 1)).simple()
-                    if n == 4:
-                        return (x**2 * AiryAi(x) + 2 * AiryAi(x, 1)).simple()
-                    # todo: could implement higher derivatives
+                        return airy_values_at_zero[AiryAi, 1]
+                if self.is_complex(x) and n in airy_derivatives:
+                    return self.simple(airy_derivatives[n](AiryAi, x))
             if x.head() == AiryAiZero:
-                if len(x.args()) == 2 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) == True_:
-                    if self.equal(r, x.args()[1]) and self.simple(Element(r, ZZGreaterEqual(0))) == True_:
-                        return Expr(0)
+                if len(x.args()) == 2 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) is True_:
+                    if self.equal(r, x.args()[1]) and self.simple(Element(r, ZZGreaterEqual(0))) is True_:
+                        return expr_zero
         return AiryAi(*args)
 
     def simple_AiryBi(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 2:
-            if args[1] == Expr(0):
+            if args[1] is expr_zero:
                 args = [args[0]]
         if len(args) == 1:
             x, = args
-            if x == Expr(0):
-                return (3**Div(1,3) * Gamma(Div(1,3))) / (2*Pi)
-            if x == Infinity:
+            if x is expr_zero:
+                return airy_values_at_zero[AiryBi, 0]
+            if x is Infinity:
                 return Infinity
-            if x == -Infinity:
-                return Expr(0)
+            if x == neg_infinity:
+                return expr_zero
             if x.head() == AiryBiZero:
-                if len(x.args()) == 1 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) == True_:
-                    return Expr(0)
+                if len(x.args()) == 1 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) is True_:
+                    return expr_zero
         if len(args) == 2:
             x, r = args
             if r.is_integer():
                 n = int(r)
-                if x == Expr(0):
+                if x is expr_zero:
                     if n % 3 == 2:
-                        return Expr(0)
+                        return expr_zero
                     if n == 1:
-                        return 3**Div(1,6) / Gamma(Div(1,3))
-                if self.is_complex(x):
-                    if n == 2:
-                        return (x * AiryBi(x)).simple()
-                    if n == 3:
-                        return (AiryBi(x) + x * AiryBi(x, 1)).simple()
-                    if n == 4:
-                        return (x**2 * AiryBi(x) + 2 * AiryBi(x, 1)).simple()
-                    # todo: could implement higher derivatives
+                        return airy_values_at_zero[AiryBi, 1]
+                if self.is_complex(x) and n in airy_derivatives:
+                    return self.simple(airy_derivatives[n](AiryBi, x))
             if x.head() == AiryBiZero:
-                if len(x.args()) == 2 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) == True_:
-                    if self.equal(r, x.args()[1]) and self.simple(Element(r, ZZGreaterEqual(0))) == True_:
-                        return Expr(0)
+                if len(x.args()) == 2 and self.simple(Element(x.args()[0], ZZGreaterEqual(1))) is True_:
+                    if self.equal(r, x.args()[1]) and self.simple(Element(r, ZZGreaterEqual(0))) is True_:
+                        return expr_zero
         return AiryBi(*args)
 
     def simple_Erf(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 1:
             x, = args
-            if x == Expr(0):
-                return Expr(0)
-            if x == Infinity:
-                return Expr(1)
-            if x == -Infinity:
-                return Expr(-1)
+            if x is expr_zero:
+                return expr_zero
+            if x is Infinity:
+                return expr_one
+            if x == neg_infinity:
+                return expr_neg_one
             if self.is_negative(x):
                 return -Erf(self.simple(-x))
             return Erf(x)
@@ -3931,12 +4897,12 @@ class Brain(object):
         args = [self.simple(arg) for arg in args]
         if len(args) == 1:
             x, = args
-            if x == Expr(0):
-                return Expr(1)
-            if x == Infinity:
-                return Expr(0)
-            if x == -Infinity:
-                return Expr(2)
+            if x is expr_zero:
+                return expr_one
+            if x is Infinity:
+                return expr_zero
+            if x == neg_infinity:
+                return expr_two
             return Erfc(x)
         return Erfc(*args)
 
@@ -3945,48 +4911,72 @@ class Brain(object):
         if len(args) == 2:
             s, a = args
             if self.is_complex(s) and self.is_complex(a):
-                if s == Expr(1):
+                if s is expr_one:
                     return UnsignedInfinity
-                if s == Expr(0):
+                if s is expr_zero:
                     return self.simple(Div(1,2) - a)
-                if self.simple(Element(s, ZZLessEqual(0))) == True_:
+                if self.simple(Element(s, ZZLessEqual(0))) is True_:
                     n = Neg(s)
                     return self.simple(-BernoulliPolynomial(n+1, a) / (n+1))
-                if self.simple(Element(s, ZZGreaterEqual(2))) == True_ and self.simple(Element(a, ZZLessEqual(0))) == True_:
+                if self.simple(Element(s, ZZGreaterEqual(2))) is True_ and self.simple(Element(a, ZZLessEqual(0))) is True_:
                     return UnsignedInfinity
                 if a.is_integer():
                     n = int(a)
                     if n == 1:
                         return self.simple(RiemannZeta(s))
                     if n >= 2 and n <= 50:
+                        if s.is_integer() and 2 <= int(s) <= 20:
+                            # exact rational value of the finite sum
+                            e = int(s)
+                            fmpq = self._fmpq
+                            total = sum(fmpq(1, k**e) for k in range(1, n))
+                            return self.simple(RiemannZeta(s) - Expr(total))
                         return self.simple(RiemannZeta(s) - Add(*(1/k**s for k in range(1, n))))
                 if self.is_rational(a):
-                    bval = {(s,       Div(1,2)) : (2**s-1)*RiemannZeta(s),
-                            (Expr(2), Div(1,4)) : Pi**2 + 8*ConstCatalan,
-                            (Expr(2), Div(3,4)) : Pi**2 - 8*ConstCatalan,
-                            (Expr(3), Div(1,4)) : 28*RiemannZeta(3) + Pi**3,
-                            (Expr(3), Div(3,4)) : 28*RiemannZeta(3) - Pi**3,
-                            (Expr(3), Div(1,6)) : 91*RiemannZeta(3) + 2*Sqrt(3)*Pi**3,
-                            (Expr(3), Div(5,6)) : 91*RiemannZeta(3) - 2*Sqrt(3)*Pi**3}
-                    for sval, aval in bval:
-                        if s == sval:
+                    # a - aval must be an integer for one of the special a
+                    candidates = [(expr_half, None)] + hurwitz_zeta_special_values.get(s, [])
+                    try:
+                        x = self.evaluate_fmpq(a)
+                    except NotImplementedError:
+                        x = None
+                    for aval, bval in candidates:
+                        if x is not None:
+                            # compare fractional parts exactly
+                            v = x - self.evaluate_fmpq(aval)
+                            if v.q != 1:
+                                continue
+                            n = int(v.p)
+                        else:
                             v = self.simple(a - aval)
-                            if v.is_integer():
-                                n = int(v)
-                                if n >= 0 and n <= 20:
-                                    return self.simple(bval[(s, aval)] - Add(*(1/(k+aval)**s for k in range(n))))
-                                if n >= -20 and n < 0:
-                                    return self.simple(bval[(s, aval)] + Add(*(1/(k-(-n)+aval)**s for k in range(-n))))
+                            if not v.is_integer():
+                                continue
+                            n = int(v)
+                        if bval is None:
+                            bval = (2**s-1)*RiemannZeta(s)
+                        if s.is_integer() and -20 <= n <= 20:
+                            # exact rational value of the finite sum
+                            e = int(s)
+                            x0 = self.evaluate_fmpq(aval)
+                            if n >= 0:
+                                acc = sum(1 / (x0 + k)**e for k in range(n))
+                                return self.simple(bval - Expr(acc))
+                            else:
+                                acc = sum(1 / (x0 + k + n)**e for k in range(-n))
+                                return self.simple(bval + Expr(acc))
+                        if n >= 0 and n <= 20:
+                            return self.simple(bval - Add(*(1/(k+aval)**s for k in range(n))))
+                        if n >= -20 and n < 0:
+                            return self.simple(bval + Add(*(1/(k-(-n)+aval)**s for k in range(-n))))
         return HurwitzZeta(*args)
 
     def simple_DigammaFunction(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 2:
-            if args[1] == Expr(0):
+            if args[1] is expr_zero:
                 args = [args[0]]
         if len(args) == 1:
             z, = args
-            if z == Infinity:
+            if z is Infinity:
                 return Infinity
             if z.is_integer():
                 n = int(z)
@@ -4004,8 +4994,7 @@ class Brain(object):
                     n = p // q
                     p = p % q
                     assert 1 <= p < q
-                    s = -ConstGamma - Log(2*q) - (Pi/2)*Cot(Pi*p/q)
-                    s += 2 * sum(Cos(2*Pi*k*p/q)*Log(Sin(Pi*k/q)) for k in range(1, (q-1)//2+1))
+                    s = digamma_rational_table[int(p), int(q)]
                     if n > 0:
                         x = self._fmpq(p, q)
                         s += sum(1/(x+k) for k in range(n))
@@ -4019,17 +5008,25 @@ class Brain(object):
             z, r = args
             if r.is_integer():
                 if int(r) >= 1:
-                    if z == Infinity:
-                        return Expr(0)
+                    if z is Infinity:
+                        return expr_zero
                     if self.is_complex(z):
                         pole = self.simple(Element(z, ZZLessEqual(0)))
-                        if pole == True_:
+                        if pole is True_:
                             return UnsignedInfinity
-                        if pole == False_:
+                        if pole is False_:
                             return self.simple((-1)**(r+1) * Factorial(r) * HurwitzZeta(r + 1, z))
         return DigammaFunction(*args)
 
     def _gamma_fmpq(self, x):
+        # the result only depends on x
+        v = self.gamma_fmpq_cache.get(x)
+        if v is None:
+            v = self._compute_gamma_fmpq(x)
+            self.gamma_fmpq_cache[x] = v
+        return v
+
+    def _compute_gamma_fmpq(self, x):
         # https://arxiv.org/abs/math/0403510
         p = x.p
         q = x.q
@@ -4048,153 +5045,15 @@ class Brain(object):
                 for k in range(-n):
                     r /= (c + n + k)
             return self.simple(r * self._gamma_fmpq(c))
-        if q not in [2,3,4,5,6,8,10,12,15,20,24,30,60]:
+        entry = gamma_fmpq_table.get((int(q), int(p)))
+        if entry is None:
             return G(p, q)
-        S = Sqrt
-        A = 5 + S(5)
-        B = 5 - S(5)
-        C = S(5 + 2*S(5))
-        D = S(5 - 2*S(5))
-        def gamma(ppi, qpi, p2, q2, p3, q3, p5, q5, r, s):
-            f = Pow(Pi, Div(ppi, qpi)) * Pow(2, Div(p2, q2)) * Pow(3, Div(p3, q3)) * Pow(5, Div(p5, q5))
-            f = self.simple(f)
-            return Mul(f, r, s)
-        if q == 2:
-            if p == 1:
-                return Sqrt(Pi)
-        if q == 3:
-            if p == 2:
-                return 2*Pi/(Sqrt(3) * G(1,3))
-        if q == 4:
-            if p == 3:
-                return Sqrt(2) * Pi / G(1,4)
-        if q == 5:
-            if p == 3:
-                return Pi * S(2) / S(5) * S(B) * G(2, 5)**-1
-            if p == 4:
-                return Pi * S(2) / S(5) * S(A) * G(1, 5)**-1
-        if q == 6:
-            if p == 1:
-                return Gamma(Div(1,3))**2 * Sqrt(3) / (Sqrt(Pi) * Pow(2,Div(1,3)))
-            if p == 5:
-                return 2*Pow(Pi,Div(3,2)) * Pow(2,Div(1,3)) / (Sqrt(3) * Gamma(Div(1,3))**2)
-        if q == 8:
-            if p == 3:
-                return Sqrt(Pi) * S(S(2)-1) * G(1,4)**-1 * G(1,8)
-            if p == 5:
-                return Sqrt(Pi) * 2**Div(3,4) * G(1,4) * G(1,8)**-1
-            if p == 7:
-                return Pi * 2**Div(3,4) * S(S(2)+1) * G(1,8)**-1
-        if q == 10:
-            if p == 1:
-                return gamma(-1, 2, -7, 10, 0, 1, 0, 1, S(A), G(1,5) * G(2,5))
-            if p == 3:
-                return gamma(1, 2, -3, 5, 0, 1, -1, 2, B, G(1,5) * G(2,5)**-1)
-            if p == 7:
-                return Sqrt(Pi) * 2**Div(3,5) * G(1,5)**-1 * G(2,5)
-            if p == 9:
-                return gamma(3, 2, 7, 10, 0, 1, -1, 2, S(A), G(1,5)**-1 * G(2,5)**-1)
-        if q == 12:
-            if p == 1:
-                return gamma(-1, 2, -1, 4, 3, 8, 0, 1, S(S(3)+1), G(1,3) * G(1,4))
-            if p == 5:
-                return gamma(1, 2, 1, 4, -1, 8, 0, 1, S(S(3)-1), G(1,4) * G(1,3)**-1)
-            if p == 7:
-                return gamma(1, 2, 1, 4, 1, 8, 0, 1, S(S(3)-1), G(1,3) * G(1,4)**-1)
-            if p == 11:
-                return gamma(3, 2, 3, 4, -3, 8, 0, 1, S(S(3)+1), G(1,3)**-1 * G(1,4)**-1)
-        if q == 15:
-            if p == 2:
-                return gamma(0, 1, -1, 1, -7, 20, -1, 3, S(B) * S(S(15)-D), G(1,3)**-1 * G(2,5) * G(1,15))
-            if p == 4:
-                return gamma(0, 1, -3, 2, -3, 10, -1, 2, S(A) * S(S(15)-C) * S(S(15)-D), G(1,5)**-1 * G(2,5) * G(1,15))
-            if p == 7:
-                return gamma(0, 1, -1, 1, 9, 20, -1, 6, S(B) * S(S(15)+D), G(1,3) * G(1,5) * G(1,15)**-1)
-            if p == 8:
-                return gamma(1, 1, 1, 2, -9, 20, -1, 3, S(S(15)-C), G(1,3)**-1 * G(1,5)**-1 * G(1,15))
-            if p == 11:
-                return 2 * Pi * 3**Div(3,10) * G(1,5) * G(2,5)**-1 * G(1,15)**-1
-            if p == 13:
-                return gamma(1, 1, 1, 2, 7, 20, -1, 6, S(S(15)+C), G(1,3) * G(2,5)**-1 * G(1,15)**-1)
-            if p == 14:
-                return gamma(1, 1, -1, 2, 0, 1, -1, 2, S(A) * S(S(15)+C) * S(S(15)+D), G(1,15)**-1)
-        if q == 20:
-            if p == 3:
-                return gamma(1, 2, -21, 20, 0, 1, -7, 8, B * S(S(10)-S(B)), G(2,5)**-1 * G(1,20))
-            if p == 7:
-                return gamma(1, 2, -3, 20, 0, 1, -3, 8, S(S(10)-S(A)), G(1,5)**-1 * G(1,20))
-            if p == 9:
-                return gamma(1, 1, -1, 5, 0, 1, -1, 2, S(S(10)-S(A)) * S(S(10)-S(B)), G(1,5)**-1 * G(2,5)**-1 * G(1,20))
-            if p == 11:
-                return 2**Div(1,5) * Sqrt(A) * G(1,5) * G(2,5) * G(1,20)**-1
-            if p == 13:
-                return gamma(1, 2, 3, 20, 0, 1, -1, 8, S(B) * S(S(10)+S(B)), G(1,5) * G(1,20)**-1)
-            if p == 17:
-                return gamma(1, 2, 1, 20, 0, 1, -1, 8, S(A) * S(S(10)+S(A)), G(2,5) * G(1,20)**-1)
-            if p == 19:
-                return gamma(1, 1, 0, 1, 0, 1, -1, 2, S(A) * S(S(10)+S(A)) * S(S(10)+S(B)), G(1,20)**-1)
-        if q == 24:
-            if p == 5:
-                return gamma(1, 2, -1, 6, -1, 2, 0, 1, S(S(2)-1) * S(S(3)-1), G(1,3)**-1 * G(1,24))
-            if p == 7:
-                return gamma(1, 2, -1, 4, -3, 8, 0, 1, S(S(3)-1) * S(S(3)-S(2)), G(1,4)**-1 * G(1,24))
-            if p == 11:
-                return gamma(1, 1, 1, 12, -3, 8, 0, 1, S(S(2)-1) * S(S(3)-S(2)), G(1,3)**-1 * G(1,4)**-1 * G(1,24))
-            if p == 13:
-                return gamma(0, 1, 2, 3, 3, 8, 0, 1, S(S(3)+1), G(1,3) * G(1,4) * G(1,24)**-1)
-            if p == 17:
-                return gamma(1, 2, 1, 1, 3, 8, 0, 1, S(S(2)+1), G(1,4) * G(1,24)**-1)
-            if p == 19:
-                return gamma(1, 2, 11, 12, 1, 2, 0, 1, S(S(3)+S(2)), G(1,3) * G(1,24)**-1)
-            if p == 23:
-                return gamma(1, 1, 3, 4, 0, 1, 0, 1, S(S(2)+1) * S(S(3)+1) * S(S(3)+S(2)), G(1,24)**-1)
-        if q == 30:
-            if p == 1:
-                return gamma(-1, 2, -16, 15, 9, 20, -1, 6, S(A) * S(S(15)+C), G(1,3) * G(1,5))
-            if p == 7:
-                return gamma(-1, 2, -22, 15, 3, 20, -1, 6, S(B) * S(S(15)+D), G(1,3) * G(2,5))
-            if p == 11:
-                return gamma(1, 2, -11, 15, -1, 20, -1, 3, S(A) * S(S(15)-C), G(1,3)**-1 * G(1,5))
-            if p == 13:
-                return gamma(1, 2, -41, 30, 7, 20, -2, 3, B * S(S(15)-D), G(1,3) * G(2,5)**-1)
-            if p == 17:
-                return gamma(1, 2, -2, 15, -7, 20, -1, 3, S(B) * S(S(15)-D), G(1,3)**-1 * G(2,5))
-            if p == 19:
-                return gamma(1, 2, -23, 30, 1, 20, -2, 3, A * S(S(15)-C), G(1,3) * G(1,5)**-1)
-            if p == 23:
-                return gamma(3, 2, -1, 30, -3, 20, -5, 6, B * S(S(15)+D), G(1,3)**-1 * G(2,5)**-1)
-            if p == 29:
-                return gamma(3, 2, -13, 30, -9, 20, -5, 6, A * S(S(15)+C), G(1,3)**-1 * G(1,5)**-1)
-        if q == 60:
-            if p == 11:
-                return gamma(1, 2, -5,4, -1,2, -17,24,  S(A) * S(S(15) - C) * S(S(10) - S(A)), G(1,3)**-1 * G(1,60))
-            if p == 13:
-                return gamma(1, 2, -13, 10, -3, 20, -3, 8,  S(B) * S(S(3) + 1) * S(S(5) - S(3)) * S(S(15) - D), G(2,5)**-1 * G(7,60))
-            if p == 17:
-                return gamma(1, 2, -3, 4, -1, 2, -11, 24, S(B) * S(S(15) - D) * S(S(10) - S(B)), G(1,3)**-1 * G(7,60))
-            if p == 19:
-                return gamma(1, 2, -7, 5, -9, 20, -5, 8, S(A) * S(S(3) - 1) * S(S(5) - S(3)) * S(S(15) - C), G(1,5)**-1 * G(1,60))
-            if p == 23:
-                return gamma(1, 1, -11, 20, -3, 20, -7, 12, S(B) * S(S(3) + 1) * S(S(5) - S(3)) * S(S(10) - S(B)), G(1,3)**-1 * G(2,5)**-1 * G(7,60))
-            if p == 29:
-                return gamma(1, 1, -23, 20, -9, 20, -7, 12, S(A) * S(S(3) - 1) * S(S(5) - S(3)) * S(S(10) - S(A)), G(1,3)**-1 * G(1,5)**-1 * G(1,60))
-            if p == 31:
-                return gamma(0, 1, -1, 10, 9, 20, -1, 6, S(A) * S(S(15) + C), G(1,3) * G(1,5) * G(1,60)**-1)
-            if p == 37:
-                return gamma(0, 1, -7, 10, 3, 20, -1, 6, S(B) * S(S(15) + D), G(1,3) * G(2,5) * G(7,60)**-1)
-            if p == 41:  # typo corrected
-                return gamma(1, 2, 3, 20, 9, 20, -1, 8, S(A) * S(S(10) + S(A)), G(1,5) * G(1,60)**-1)
-            if p == 43:
-                return gamma(1, 2, -1, 2, 1, 2, -7, 24, S(B) * S(S(3)-1) * S(S(5) + S(3)), G(1,3) * G(7,60)**-1)
-            if p == 47: # typo corrected
-                return gamma(1, 2, 1, 20, 3, 20, -3, 8, S(B) * S(S(10) + S(B)), G(2,5) * G(7,60)**-1)
-            if p == 49:
-                return gamma(1, 2, 0, 1, 1, 2, -1, 24, S(A) * S(S(3) + 1) * S(S(5) + S(3)), G(1,3) * G(1,60)**-1)
-            if p == 53:
-                return gamma(1, 1, -5, 4, 0, 1, -3, 4, B * S(S(3) - 1) * S(S(5) + S(3)) * S(S(15) + D) * S(S(10) + S(B)), G(7,60)**-1)
-            if p == 59:
-                return gamma(1, 1, -5, 4, 0, 1, -3, 4, A * S(S(3) + 1) * S(S(5) + S(3)) * S(S(15) + C) * S(S(10) + S(A)), G(1,60)**-1)
-        return G(p, q)
+        if type(entry) is not tuple:
+            return entry
+        ppi, qpi, p2, q2, p3, q3, p5, q5, r, s = entry
+        f = Pow(Pi, Div(ppi, qpi)) * Pow(2, Div(p2, q2)) * Pow(3, Div(p3, q3)) * Pow(5, Div(p5, q5))
+        f = self.simple(f)
+        return Mul(f, r, s)
 
     def simple_Gamma(self, *args):
         args = [self.simple(arg) for arg in args]
@@ -4207,7 +5066,7 @@ class Brain(object):
                     return UnsignedInfinity
                 if n <= 100:
                     return Expr(fmpz.fac_ui(n - 1))
-            if z == Infinity:
+            if z is Infinity:
                 return Infinity
             if self.is_rational(z):
                 m = self.simple(z * 60)
@@ -4222,14 +5081,13 @@ class Brain(object):
     def simple_Factorial(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 1:
-            fmpz = self._fmpz
             z, = args
             if z.is_integer():
                 n = int(z)
                 if n < 0:
                     return UnsignedInfinity
                 if n <= 100:
-                    return Expr(fmpz.fac_ui(n))
+                    return small_factorials[n]
         return Factorial(*args)
 
     def simple_RisingFactorial(self, *args):
@@ -4258,15 +5116,15 @@ class Brain(object):
                     if kv >= 0 and nv >= 0 and nv <= 1000 and kv <= 1000:
                         return Expr(fmpz.bin_uiui(nv, kv))
                     if nv >= 0 and (kv < 0 or kv > nv):
-                        return Expr(0)
+                        return expr_zero
                     if nv >= 0 and (kv == 0 or kv == nv):
-                        return Expr(1)
+                        return expr_one
                     if nv < 0 and kv >= 0:
                         return self.simple((-1)**kv * Binomial(-nv+kv-1, kv))
                     if nv < 0 and kv <= nv:
                         return self.simple((-1)**(nv-kv) * Binomial(-kv-1, nv-kv))
                     if nv < 0 or kv < 0:
-                        return Expr(0)
+                        return expr_zero
                 if k.is_integer():
                     kv = int(k)
                     if kv >= 0 and kv <= 30:
@@ -4285,7 +5143,7 @@ class Brain(object):
             if z.is_integer():
                 n = int(z)
                 if n < 0:
-                    return Expr(0)
+                    return expr_zero
                 if n <= 1000:
                     return Expr(fmpz.bell_number(n))
         return BellNumber(*args)
@@ -4325,7 +5183,7 @@ class Brain(object):
         Bs = [self.simple(b) for b in Bs]
         z = self.simple(z)
         all_complex = all(self.is_complex(a) for a in (As + Bs + [z]))
-        prefactor = Expr(1)
+        prefactor = expr_one
         try:
             if all_complex:
 
@@ -4333,12 +5191,12 @@ class Brain(object):
                 # Todo: is this a wise definition?
                 at_zero = self.is_zero(z)
                 if at_zero:
-                    val = Expr(1)
+                    val = expr_one
                     if regularized:
                         for b in Bs:
                             # todo: unnecessary; div by UnsignedInfinity ought to be simplified
                             if b.is_integer() and int(b) <= 0:
-                                return Expr(0)
+                                return expr_zero
                             val *= (1 / Gamma(b))
                     return self.simple(val)
 
@@ -4359,12 +5217,35 @@ class Brain(object):
                 # with certainty, we are potentially adding too many
                 # terms, incorrectly adding a pole. This must be avoided.
                 if terminating is not None and not regularized:
-                    if any(self.simple(Element(b, Range(terminating + 1, 0))) != False_ for b in Bs):
-                        if any(self.simple(Element(a, Range(terminating + 1, 0))) != False_ for a in As):
+                    if any(self.simple(Element(b, Range(terminating + 1, 0))) is not False_ for b in Bs):
+                        if any(self.simple(Element(a, Range(terminating + 1, 0))) is not False_ for a in As):
                             terminating = None
 
                 # Todo: fast code here (use recurrences when possible)
                 if terminating is not None:
+                    if terminating >= -30 and not regularized:
+                        # rational parameters: sum exactly, using the ratio
+                        # of consecutive terms
+                        try:
+                            fAs = [self.evaluate_fmpq(a) for a in As]
+                            fBs = [self.evaluate_fmpq(b) for b in Bs]
+                            fz = self.evaluate_fmpq(z)
+                        except (NotImplementedError, ZeroDivisionError):
+                            fz = None
+                        if fz is not None:
+                            term = total = self._fmpq(1)
+                            for k in range(-terminating):
+                                den = k + 1
+                                for b in fBs:
+                                    den *= b + k
+                                if den == 0:
+                                    break
+                                for a in fAs:
+                                    term *= a + k
+                                term = term * fz / den
+                                total += term
+                            else:
+                                return self.simple(Expr(total))
                     if terminating >= -30:
                         terms = []
                         for k in range(-terminating + 1):
@@ -4375,7 +5256,7 @@ class Brain(object):
                                 for b in Bs:
                                     # todo: unnecessary; div by UnsignedInfinity ought to be simplified
                                     if b.is_integer() and int(b) + k <= 0:
-                                        P += [Expr(0)]
+                                        P += [expr_zero]
                                     else:
                                         P += [1/Gamma(b + k)]
                             else:
@@ -4389,9 +5270,13 @@ class Brain(object):
                 remove_Bi = set()
                 for i in range(len(Bs)):
                     b = Bs[i]
-                    if self.simple(Element(b, ZZLessEqual(0))) == False_:
+                    if b.is_integer():
+                        pole = int(b) <= 0
+                    else:
+                        pole = self.simple(Element(b, ZZLessEqual(0))) is not False_
+                    if not pole:
                         for j in range(len(As)):
-                            if self.equal(As[j], b):
+                            if As[j] is b or self.equal(As[j], b):
                                 del As[j]
                                 remove_Bi.add(i)
                                 break
@@ -4404,7 +5289,7 @@ class Brain(object):
                 # Now try step 2
                 res = self.simple_hypergeometric_2(As, Bs, z, regularized)
                 if res is not None:
-                    if prefactor != Expr(1):
+                    if prefactor is not expr_one:
                         res = self.simple(prefactor * res)
                     return res
 
@@ -4420,39 +5305,14 @@ class Brain(object):
         if p == 0 and q == 0:
             res = self.simple(prefactor * Exp(z))
 
-        if regularized:
-            if p == 0 and q == 1:
-                res = Hypergeometric0F1Regularized(Bs[0], z)
-            elif p == 1 and q == 1:
-                res = Hypergeometric1F1Regularized(As[0], Bs[0], z)
-            elif p == 1 and q == 2:
-                res = Hypergeometric1F2Regularized(As[0], Bs[0], Bs[1], z)
-            elif p == 2 and q == 1:
-                res = Hypergeometric2F1Regularized(As[0], As[1], Bs[0], z)
-            elif p == 2 and q == 2:
-                res = Hypergeometric2F2Regularized(As[0], As[1], Bs[0], Bs[1], z)
-            elif p == 3 and q == 2:
-                res = Hypergeometric3F2Regularized(As[0], As[1], As[2], Bs[0], Bs[1], z)
-            else:
-                res = HypergeometricPFQRegularized(As, Bs, z)
+        head = hypergeometric_heads.get((p, q, regularized))
+        if head is not None:
+            res = head(*(As + Bs + [z]))
+        elif regularized:
+            res = HypergeometricPFQRegularized(As, Bs, z)
         else:
-            if p == 0 and q == 1:
-                res = Hypergeometric0F1(Bs[0], z)
-            elif p == 1 and q == 1:
-                res = Hypergeometric1F1(As[0], Bs[0], z)
-            elif p == 1 and q == 2:
-                res = Hypergeometric1F2(As[0], Bs[0], Bs[1], z)
-            elif p == 2 and q == 0:
-                res = Hypergeometric2F0(As[0], As[1], Bs[0], z)
-            elif p == 2 and q == 1:
-                res = Hypergeometric2F1(As[0], As[1], Bs[0], z)
-            elif p == 2 and q == 2:
-                res = Hypergeometric2F2(As[0], As[1], Bs[0], Bs[1], z)
-            elif p == 3 and q == 2:
-                res = Hypergeometric3F2(As[0], As[1], As[2], Bs[0], Bs[1], z)
-            else:
-                res = HypergeometricPFQ(As, Bs, z)
-        if prefactor == Expr(1):
+            res = HypergeometricPFQ(As, Bs, z)
+        if prefactor is expr_one:
             return res
         else:
             return prefactor * res
@@ -4494,7 +5354,14 @@ class Brain(object):
                 if n % 2 == 1 and abs(n) <= 7:
                     # todo: implement this in a much better way
                     fmpq = self._fmpq
+                    # the recurrences revisit the same b; z is fixed
+                    memo = {}
                     def _0f1(b, z):
+                        v = memo.get(b)
+                        if v is None:
+                            v = memo[b] = _0f1_uncached(b, z)
+                        return v
+                    def _0f1_uncached(b, z):
                         if b == fmpq(1,2):
                             return self.simple(Cosh(2 * Sqrt(z)))
                         if b == fmpq(-1,2):
@@ -4518,27 +5385,27 @@ class Brain(object):
         # Gauss 2F1
         if p == 2 and q == 1:
             a, b, c = As[0], As[1], Bs[0]
-            if self.equal(z, Expr(1)):
-                if self.is_complex(a) and self.is_complex(b) and self.is_complex(c) and self.simple(NotElement(c, ZZLessEqual(0))) == True_:
+            if self.equal(z, expr_one):
+                if self.is_complex(a) and self.is_complex(b) and self.is_complex(c) and self.simple(NotElement(c, ZZLessEqual(0))) is True_:
                     v = Greater(Re(c-a-b), 0)
                     v = self.simple(v)
-                    if v == True_:
+                    if v is True_:
                         if regularized:
                             return self.simple(Gamma(c-a-b) / (Gamma(c-a) * Gamma(c - b)))
                         else:
                             return self.simple(Gamma(c) * Gamma(c-a-b) / (Gamma(c-a) * Gamma(c-b)))
-                    if v == False_:
-                        if self.simple(And(NotElement(a, ZZLessEqual(0)), NotElement(b, ZZLessEqual(0)))) == True_:
-                            if self.simple(Equal(c - a - b, 0)) == True_:
+                    if v is False_:
+                        if self.simple(And(NotElement(a, ZZLessEqual(0)), NotElement(b, ZZLessEqual(0)))) is True_:
+                            if self.simple(Equal(c - a - b, 0)) is True_:
                                 if regularized:
                                     return self.simple(1 / (Sign(Gamma(a)) * Sign(Gamma(b))) * Infinity)
                                 else:
                                     return self.simple(Sign(Gamma(c)) / (Sign(Gamma(a)) * Sign(Gamma(b))) * Infinity)
-                            if self.simple(Less(Re(c-a-b), 0)) == True_:
+                            if self.simple(Less(Re(c-a-b), 0)) is True_:
                                 return UnsignedInfinity
-                            if self.simple(Equal(Re(c-a-b), 0)) == True_:
+                            if self.simple(Equal(Re(c-a-b), 0)) is True_:
                                 return Undefined
-            if self.is_complex(a) and self.is_complex(b) and self.is_complex(c) and self.simple(NotElement(c, ZZLessEqual(0))) == True_:
+            if self.is_complex(a) and self.is_complex(b) and self.is_complex(c) and self.simple(NotElement(c, ZZLessEqual(0))) is True_:
                 try:
                     v = self.simple_hypgeom_2f1_half(a, b, c, z, regularized)
                     return v
@@ -4568,7 +5435,7 @@ class Brain(object):
             if c <= 0 and c.q == 1:
                 raise ValueError
             if a == 0 or b == 0:
-                return Expr(1)
+                return expr_one
             if a > b:
                 a, b = b, a
             if b == c:
@@ -4668,9 +5535,9 @@ class Brain(object):
         zero_cond = False
         one_cond = False
 
-        if not_zero != True_:
-            val_zero = v.replace({x:Expr(0)}).simple()
-            if val_zero != Expr(1):
+        if not_zero is not True_:
+            val_zero = v.replace({x:expr_zero}).simple()
+            if val_zero is not expr_one:
                 zero_cond = True
 
         if rc - ra - rb == 0:
@@ -4680,8 +5547,8 @@ class Brain(object):
         else:
             true_val_one = Undefined
 
-        if not_one != True_:
-            val_one = v.replace({x:Expr(1)}).simple()
+        if not_one is not True_:
+            val_one = v.replace({x:expr_one}).simple()
             if not self.equal(val_one, true_val_one):
                 one_cond = True
 
@@ -4778,29 +5645,7 @@ class Brain(object):
                 v = None
             if v is not None and v.degree() == 2:
                 a, b, c = v.as_quadratic()
-                h = self._fmpq(1,2)
-                # Produce exact values.
-                # https://en.wikipedia.org/wiki/J-invariant#Special_values
-                # Todo: implement an algorithm!
-                modjtab = {
-                    (-h, h, -3) : Expr(0),
-                    (0, 1, -1) : Expr(1728),
-                    (0, 2, -1) : Expr(66**3),
-                    (0, 3, -1) : 64*(2+Sqrt(3))**2*(21+20*Sqrt(3))**3,
-                    (0, 4, -1) : 27*(724+513*Sqrt(2))**3,
-                    (0, 1, -2) : Expr(20**3),
-                    (0, 2, -2) : 1000*(19+13*Sqrt(2))**3,
-                    (0, 2, -3) : 13500*(30+17*Sqrt(3))**3,
-                    (-h, 1, -1) : 27*(724-513*Sqrt(2))**3,
-                    (0, 1, -6) : 432 * (14 + 9*Sqrt(2))**3 * (2 - Sqrt(2)),
-                    (-h, h, -7) : Expr(-15**3),
-                    (-h, h, -11) : Expr(-32**3),
-                    (-h, h, -19) : Expr(-96**3),
-                    (-h, h, -43) : Expr(-960**3),
-                    (-h, h, -67) : Expr(-5280**3),
-                    (-h, h, -163) : Expr(-640320**3),
-                }
-                val = modjtab.get((a, b, c))
+                val = modular_j_values.get(quadratic_key(a, b, c))
                 if val is not None:
                     return val
         return ModularJ(*args)
@@ -4811,9 +5656,9 @@ class Brain(object):
             x, y = args
             v = self.equal(x, y)
             if x == True:
-                return Expr(1)
+                return expr_one
             if x == False:
-                return Expr(0)
+                return expr_zero
         return KroneckerDelta(*args)
 
     def simple_Totient(self, *args):
@@ -4943,17 +5788,13 @@ class Brain(object):
                     bb = b % 24
                     cc = c % 24
                     dd = d % 24
-                    def kronecker(a, b):
-                        if b < 0:
-                            return kronecker(a, -b)
-                        if b == 1:
-                            return fmpz(1)
-                        return fmpz(a).jacobi(b)
+                    # c > 0 here, and a is odd when c is even, so both
+                    # symbols are Jacobi symbols with a positive odd modulus.
                     if cc % 2 == 1:
-                        u = kronecker(a, c)
+                        u = fmpz(a).jacobi(c)
                         aa = aa*bb + 2*aa*cc - 3*cc + cc*dd*(1-aa*aa)
                     else:
-                        u = kronecker(c, a)
+                        u = fmpz(c).jacobi(abs(a))
                         aa = aa*bb - aa*cc + 3*aa - 3 + cc*dd*(1-aa*aa)
                     assert u in (-1, 1)
                     if u == -1:
@@ -4980,47 +5821,7 @@ class Brain(object):
                 v = None
             if v is not None and v.degree() == 2:
                 a, b, c = v.as_quadratic()
-                h = self._fmpq(1,2)
-                h3 = self._fmpq(1,3)
-                # http://mathworld.wolfram.com/EllipticLambdaFunction.html
-                # -163: jjj's fxtbook
-                # Todo: fill in more values
-                x11 = (17+3*Sqrt(33))**Div(1,3)
-                T163 = (1+557403*Sqrt(489))**Div(1,3)
-                modlamtab = {
-                    (0, 1, -1) : Expr(1)/2,
-                    (0, 1, -2) : (Sqrt(2) - 1)**2,
-                    (0, 2, -1) : 17 - 12*Sqrt(2),
-                    (0, 1, -3) : ((Sqrt(3)-1)**2/8),
-                    (0, 1, -5) : (Div(1,2)-Sqrt(Sqrt(5)-2)),
-                    (0, 1, -6) : (2-Sqrt(3))**2*(Sqrt(3)-Sqrt(2))**2,
-                    (0, 1, -7) : ((3-Sqrt(7))**2/32),
-                    (0, 2, -2) : ((1+Sqrt(2)-Sqrt(2*Sqrt(2)+2))**4),
-                    (0, 3, -1) : ((Sqrt(2)-3**Div(1,4))**2*(Sqrt(3)-1)**2/4),
-                    (0, 1, -10) : ((Sqrt(10)-3)**2*(Sqrt(2)-1)**4),
-                    (0, 2, -3)  : (Sqrt(3)-Sqrt(2))**4 * (Sqrt(2)-1)**4,
-                    (0, 2, -3)  : (Sqrt(3)-Sqrt(2))**4 * (Sqrt(2)-1)**4,
-                    (0, 1, -13) : (Sqrt(5*Sqrt(13)-17) - Sqrt(19-5*Sqrt(13)))**2 / 4,
-                    (0, 1, -14) : (-11-8*Sqrt(2)-2*(Sqrt(2)+2)*Sqrt(5+4*Sqrt(2))+Sqrt(11+8*Sqrt(2))*(2+2*Sqrt(2)+Sqrt(2)*Sqrt(5+4*Sqrt(2))))**2,
-                    (0, 1, -15) : (3-Sqrt(5))**2*(Sqrt(5)-Sqrt(3))**2*(2-Sqrt(3))**2/128,
-                    (0, 4, -1)  : (33+24*Sqrt(2)-4*Sqrt(140+99*Sqrt(2)))**2,
-                    (0, 1, -18) : (Sqrt(2)-1)**6 * (2-Sqrt(3))**6,
-                    (0, 1, -22) : (3*Sqrt(11)-7*Sqrt(2))**2 * (10-3*Sqrt(11))**2,
-                    (0, 1, -30) : (Sqrt(3)-Sqrt(2))**4 * (2-Sqrt(3))**2 * (Sqrt(6)-Sqrt(5))**2 * (4-Sqrt(15))**2,
-                    (0, 1, -34) : (Sqrt(2)-1)**4 * (3*Sqrt(2)-Sqrt(17))**2 * (Sqrt(297+72*Sqrt(17))-Sqrt(296+72*Sqrt(17)))**2,
-                    (0, 1, -42) : (Sqrt(2)-1)**4 * (2-Sqrt(3))**4 * (Sqrt(7)-Sqrt(6))**2 * (8-3*Sqrt(7))**2,
-                    (0, 1, -58) : (13*Sqrt(58)-99)**2 * (Sqrt(2)-1)**12,
-                    (0, 1, -163) : (2 - Sqrt(3 + 80040*T163 - 2*80040**2/(3*T163)))/4,
-                    (0, 1, -210) : (Sqrt(2)-1)**4*(2-Sqrt(3))**2*(Sqrt(7)-Sqrt(6))**4*(8-3*Sqrt(7))**2*(Sqrt(10)-3)**4*(4-Sqrt(15))**4*(Sqrt(15)-Sqrt(14))**2*(6-Sqrt(35))**2,
-                    (-h, h, -3) : -self.simple_Exp_two_pi_i_k_n(1, 3),
-                    (0, h, -6)  : 1 - (2-Sqrt(3))**2*(Sqrt(2)+Sqrt(3))**2,
-                    (0, h, -10) : 1 - (1+Sqrt(2))**4*(Sqrt(10)-3)**2,
-                    (0, h, -58) : 1 - (13*Sqrt(58)-99)**2 * (Sqrt(2)+1)**12,
-                    (0, 2*h3, -3) : (833 + 588*Sqrt(2) - 480*Sqrt(3) - 340*Sqrt(6)),
-                    # (0, 1, -11) : (Sqrt(1+2*x11-4/x11) - Sqrt(11+2*x11-4/x11))**2 / 24,  todo: incorrect in mathworld?
-                    # (0, h3, -15) : (8 + Sqrt(3*(23-7*Sqrt(5))/2))/16,   todo: incorrect in mathworld?
-                }
-                val = modlamtab.get((a, b, c))
+                val = modular_lambda_values.get(quadratic_key(a, b, c))
                 if val is None:
                     val = ModularLambda(self.simple(a + b*Sqrt(c)))
                 transform = [n%2 for n in transform]
@@ -5051,21 +5852,7 @@ class Brain(object):
                     val = Exp(-Pi*ConstI/24) * DedekindEta(2*t)**3 / (DedekindEta(t) * DedekindEta(4*t))
                     val = self.simple(val)
                 else:
-                    etai = Gamma(Div(1,4)) / (2 * Pi**Div(3,4))
-                    modetatab = {
-                        (0, 1, -1) : etai,
-                        (0, 2, -1) : etai / 2**Div(3,8),
-                        (0, 3, -1) : etai / (3**Div(3,8) * (2+Sqrt(3))**Div(1,12)),
-                        (0, 4, -1) : etai / (2**Div(13,16) * (1+Sqrt(2))**Div(1,4)),
-                        (0, 5, -1) : etai / Sqrt(5*GoldenRatio),
-                        (0, 6, -1) : (1/6**Div(3,8)) * ((5-Sqrt(3))/2 - 3**Div(3,4)/Sqrt(2))**Div(1,6) * etai,
-                        (0, 7, -1) : (1/Sqrt(7)) * (-Div(7,2) + Sqrt(7) + Div(1,2)*Sqrt(-7+4*Sqrt(7)))**Div(1,4) * etai,
-                        (0, 8, -1) : (1/2**Div(41,32)) * Sqrt(2**Div(1,4) - 1) / (1+Sqrt(2))**Div(1,8) * etai,
-                        (0, 16, -1) : (1/2**Div(113,64)) * (2**Div(1,4)-1)**Div(1,4) / (1+Sqrt(2))**Div(1,16) * Sqrt(-2**Div(5,8) + Sqrt(1+Sqrt(2))) * etai,
-                        (0, 1, -3) : 3**Div(1,8) / 2**Div(4,3) * Gamma(Div(1,3))**Div(3,2) / Pi,
-                        (-h, h, -3) : Exp(-Pi*ConstI/24) * 3**Div(1,8) * Gamma(Div(1,3))**Div(3,2) / (2*Pi),
-                    }
-                    val = modetatab.get((a, b, c))
+                    val = dedekind_eta_values.get(quadratic_key(a, b, c))
                 if val is not None:
                     a, b, c, d = transform
                     tau = v.expr()
@@ -5080,11 +5867,11 @@ class Brain(object):
             z, = args
             if self.is_zero(z):
                 return Pi / 2
-            if self.equal(z, Expr(1)):
+            if self.equal(z, expr_one):
                 return Infinity
-            if self.equal(z, Expr(-1)):
+            if self.equal(z, expr_neg_one):
                 return Gamma(Div(1,4))**2 / (4*Sqrt(2*Pi))
-            if self.equal(z, Expr(2)):
+            if self.equal(z, expr_two):
                 return Gamma(Div(1,4))**2 / (4*Sqrt(2*Pi)) * (1-ConstI)
             if self.equal(z, Div(1, 2)):
                 return Gamma(Div(1,4))**2 / (4*Sqrt(Pi))
@@ -5099,13 +5886,13 @@ class Brain(object):
         args = [self.simple(arg) for arg in args]
         if len(args) == 1:
             z, = args
-            if z == Expr(0):
+            if z is expr_zero:
                 return Pi / 2
-            if z == Expr(1):
-                return Expr(1)
-            if z == Expr(-1):
+            if z is expr_one:
+                return expr_one
+            if z is expr_neg_one:
                 return Sqrt(2) * (Gamma(Div(1,4))**2 / (8*Sqrt(Pi)) + Pi**Div(3,2) / Gamma(Div(1,4))**2)
-            if z == Expr(2):
+            if z is expr_two:
                 return (Sqrt(2)*Pi**Div(3,2)/Gamma(Div(1,4))**2 * (1+ConstI))
             if self.equal(z, Div(1, 2)):
                 return (Gamma(Div(1,4))**2 / (8*Sqrt(Pi)) + Pi**Div(3,2) / Gamma(Div(1,4))**2)
@@ -5135,7 +5922,7 @@ class Brain(object):
             phi, m = args
             if self.is_complex(phi) and self.is_complex(m):
                 if self.is_zero(phi):
-                    return Expr(0)
+                    return expr_zero
                 if self.is_zero(m):
                     return phi
                 r = self.simple(phi * 2 / Pi)
@@ -5168,7 +5955,7 @@ class Brain(object):
             phi, m = args
             if self.is_complex(phi) and self.is_complex(m):
                 if self.is_zero(phi):
-                    return Expr(0)
+                    return expr_zero
                 if self.is_zero(m):
                     return phi
                 r = self.simple(phi * 2 / Pi)
@@ -5196,17 +5983,17 @@ class Brain(object):
     def simple_AGM(self, *args):
         args = [self.simple(arg) for arg in args]
         if len(args) == 1:
-            args = [Expr(1), args[0]]
+            args = [expr_one, args[0]]
         if len(args) == 2:
             a, b = args
             if self.is_complex(a) and self.is_complex(b):
                 if self.equal(a, b):
                     return a
                 if self.is_zero(a) or self.is_zero(b):
-                    return Expr(0)
+                    return expr_zero
                 c = self.simple(a + b)
                 if self.is_zero(c):
-                    return Expr(0)
+                    return expr_zero
                 if self.is_not_zero(c) and self.is_not_zero(a) and self.is_not_zero(b):
                     t = self.simple(a / b)
                     neg = self.is_negative(a / b)
@@ -5225,14 +6012,14 @@ class Brain(object):
                         if self.is_negative(u):
                             return self.simple(AGM(x, -y))
                     if self.is_positive(a) and self.is_positive(b):
-                        if a == Expr(1):
+                        if a is expr_one:
                             return AGM(a, b)
-                        if b == Expr(1):
+                        if b is expr_one:
                             return AGM(b, a)
                         if self.greater(b, a):
-                            return a * AGM(Expr(1), self.simple(b / a))
+                            return a * AGM(expr_one, self.simple(b / a))
                         else:
-                            return b * AGM(Expr(1), self.simple(a / b))
+                            return b * AGM(expr_one, self.simple(a / b))
 
         return AGM(*args)
 
@@ -5317,10 +6104,10 @@ class Brain(object):
             x, = args
             if self.is_complex(x):
                 if self.is_zero(x):
-                    return Expr(0)
-                if self.equal(x, Expr(1)):
+                    return expr_zero
+                if self.equal(x, expr_one):
                     return Pi/2
-                if self.equal(x, Expr(-1)):
+                if self.equal(x, expr_neg_one):
                     return -(Pi/2)
                 if self.equal(x, Sqrt(2) / 2):
                     return Pi/4
@@ -5334,9 +6121,9 @@ class Brain(object):
                 except NotImplementedError:
                     pass
                 if self.is_real(x):
-                    if self.greater(x, Expr(1)):
+                    if self.greater(x, expr_one):
                         return Pi/2 - Acosh(x) * ConstI
-                    if self.less(x, Expr(-1)):
+                    if self.less(x, expr_neg_one):
                         return Acosh(x) * ConstI - Pi/2
                 if self.is_real(x / ConstI):
                     return self.simple(Asinh(x / ConstI) * ConstI)
@@ -5344,7 +6131,7 @@ class Brain(object):
 
     def _simple_Atan_rational(self, p, q):
         if p == 0:
-            return Expr(0)
+            return expr_zero
         from .algebraic import gaussian_integer
         fmpq = self._fmpq
         a, b = q, p
@@ -5390,10 +6177,10 @@ class Brain(object):
             # todo: is_extended_complex; allow meromorphic argument (in particular, tan)
             if self.is_complex(x):
                 if self.is_zero(x):
-                    return Expr(0)
-                if self.equal(x, Expr(1)):
+                    return expr_zero
+                if self.equal(x, expr_one):
                     return Pi/4
-                if self.equal(x, Expr(-1)):
+                if self.equal(x, expr_neg_one):
                     return -(Pi/4)
                 if self.equal(x, ConstI):
                     return ConstI * Infinity
@@ -5446,11 +6233,11 @@ class Brain(object):
             x, = args
             if self.is_complex(x):
                 if self.is_zero(x):
-                    return Expr(0)
-                if self.equal(x, Expr(1)):
+                    return expr_zero
+                if self.equal(x, expr_one):
                     return Infinity
-                if self.equal(x, Expr(-1)):
-                    return -Infinity
+                if self.equal(x, expr_neg_one):
+                    return neg_infinity
                 if self.equal(x, ConstI):
                     return Pi/4 * ConstI
                 if self.equal(x, ConstI):
@@ -5458,11 +6245,11 @@ class Brain(object):
                 if self.is_real(x) == False:
                     return self.simple(Atan(x / ConstI) * ConstI)
                 # now x is real -- express using logarithm
-                if self.less(Abs(x), Expr(1)):
+                if self.less(Abs(x), expr_one):
                     return self.simple(Log((1+x)/(1-x)) / 2)
-                if self.greater(x, Expr(1)):
+                if self.greater(x, expr_one):
                     return self.simple(Log((1+x)/(x-1)) / 2 - Pi*ConstI/2)
-                if self.less(x, Expr(-1)):
+                if self.less(x, expr_neg_one):
                     return self.simple(Log(((-x)-1)/((-x)+1)) / 2 + Pi*ConstI/2)
             if x == Undefined:
                 return x
@@ -5575,7 +6362,7 @@ class Brain(object):
                 args = [x, y, z]
                 if xzero:
                     if yzero and zzero:
-                        return Expr(0)
+                        return expr_zero
                     if yzero:
                         return self.simple(Sqrt(z) / 2)
                     if self.equal(y, z):
@@ -5679,7 +6466,7 @@ class Brain(object):
                         return self.simple(res)
                     if self.equal(y, z):
                         cond = Or(NotElement(y, OpenInterval(-Infinity, 0)), GreaterEqual(Im(w), 0))
-                        if self.simple(cond) == True_:
+                        if self.simple(cond) is True_:
                             return self.simple(3*Pi/(2*(y*Sqrt(w) + w*Sqrt(y))))
                     if self.equal(w, Sqrt(y)*Sqrt(z)):
                         return self.simple(3/(2*(Sqrt(y)*Sqrt(z))) * CarlsonRF(0, y, z))
@@ -5719,8 +6506,8 @@ class Brain(object):
                 if n == 2:
                     return Matrix2x2(1, 0, 0, 1)
                 if 3 <= n <= 10:
-                    zero = Expr(0)
-                    one = Expr(1)
+                    zero = expr_zero
+                    one = expr_one
                     return Matrix([[one if i == j else zero for j in range(n)] for i in range(n)])
         return IdentityMatrix(*args)
 
@@ -5738,7 +6525,7 @@ class Brain(object):
                 if n == 2 and m == 2:
                     return Matrix2x2(0, 0, 0, 0)
                 elif m <= 10 and n <= 10:
-                    zero = Expr(0)
+                    zero = expr_zero
                     row = List(*(zero for i in range(m)))
                     return Matrix(List(*(row for j in range(n))))
         return ZeroMatrix(*args)
@@ -5807,30 +6594,30 @@ class Brain(object):
                 if var in a.subexpressions():
                     assumptions_by_var[var] = assumptions_by_var.get(var, [])
                     assumptions_by_var[var].append(a)
-        base_sets = {var:some_everything for var in variables}
+        base_sets = {var:some_everything() for var in variables}
         for var in variables:
             if var in assumptions_by_var:
                 for a in assumptions_by_var[var]:
                     if a.head() == Element and a.args()[0] == var:
                         S = a.args()[1]
                         if S == PP:
-                            base_sets[var] = some_primes
+                            base_sets[var] = some_primes()
                         elif S == ZZ:
-                            base_sets[var] = some_integers
+                            base_sets[var] = some_integers()
                         elif S == QQ:
-                            base_sets[var] = some_rationals
+                            base_sets[var] = some_rationals()
                         elif S == RR:
-                            base_sets[var] = some_reals
+                            base_sets[var] = some_reals()
                         elif S == CC:
-                            base_sets[var] = some_complexes
+                            base_sets[var] = some_complexes()
                         elif S == HH:
-                            base_sets[var] = some_upper_half_plane
+                            base_sets[var] = some_upper_half_plane()
                         elif S == AlgebraicNumbers:
-                            base_sets[var] = some_algebraics
+                            base_sets[var] = some_algebraics()
                         elif S.head() in (ZZLessEqual, ZZGreaterEqual, Range):
-                            base_sets[var] = some_integers
+                            base_sets[var] = some_integers()
                         elif S.head() in (ClosedInterval, OpenInterval, OpenClosedInterval, ClosedOpenInterval):
-                            base_sets[var] = some_extended_reals
+                            base_sets[var] = some_extended_reals()
         # structural domain statements (todo)
         for asm in assumptions:
             if asm.head() == Element:
@@ -5838,17 +6625,37 @@ class Brain(object):
                 if S == SL2Z and x.head() == Matrix2x2:
                     for ak in x.args():
                         if ak in variables:
-                            base_sets[ak] = some_integers
+                            base_sets[ak] = some_integers()
         base_sets = [base_sets[var] for var in variables]
         found = 0
         count = 0
         cartesian_iterator = randomized_cartesian
         # cartesian_iterator = custom_cartesian
 
+        # Assumptions involving a single variable only need to be checked
+        # once for each value of that variable.
+        single_var = {}
+        for var in variables:
+            for a in assumptions_by_var.get(var, ()):
+                single_var[a] = None if a in single_var else var
+        checked = {}
+
         for values in cartesian_iterator(*base_sets):
             assignment = {var:val for (var,val) in zip(variables, values)}
             # todo: when the assumptions for the variables are pure domain statements with simple domains, we could skip the checks
-            ok = all(self.simple(a.replace(assignment, semantic=True)) == True_ for a in assumptions)
+            ok = True
+            for a in assumptions:
+                var = single_var.get(a)
+                if var is None:
+                    ok = self.simple(a.replace(assignment, semantic=True)) is True_
+                else:
+                    val = assignment[var]
+                    ok = checked.get((a, val))
+                    if ok is None:
+                        ok = self.simple(a.replace({var: val}, semantic=True)) is True_
+                        checked[a, val] = ok
+                if not ok:
+                    break
             if count > max_candidates:
                 break
             count += 1
@@ -5865,31 +6672,34 @@ class Brain(object):
         if assumptions is None:
             assumptions = True_
 
+        free_variables = frozenset(free_variables)
         match_values = {}
 
-        def match_recursive(expr, rule):
-            if rule in free_variables:
-                if rule in match_values:
-                    if expr != match_values[rule]:
-                        raise ValueError
-                else:
-                    match_values[rule] = expr
-                return
-            if expr == rule:
-                return
-            expr_head = expr.head()
-            rule_head = rule.head()
-            expr_args = expr.args()
-            rule_args = rule.args()
-            if expr_head != rule_head or expr_head is None or len(expr_args) != len(rule_args):
-                raise ValueError
-            for a, b in zip(expr_args, rule_args):
-                match_recursive(a, b)
-
-        try:
-            match_recursive(expr, rule)
-        except ValueError:
-            return None
+        # Walk expr and rule in parallel with an explicit stack, visiting
+        # subexpressions depth-first from left to right.
+        stack = [(expr, rule)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            e, r = pop()
+            if r in free_variables:
+                v = match_values.get(r)
+                if v is None:
+                    match_values[r] = e
+                elif e != v:
+                    return None
+                continue
+            if e == r:
+                continue
+            e_head = e.head()
+            if e_head is None or e_head != r.head():
+                return None
+            e_args = e.args()
+            r_args = r.args()
+            if len(e_args) != len(r_args):
+                return None
+            for i in range(len(e_args) - 1, -1, -1):
+                push((e_args[i], r_args[i]))
 
         #print("MATCH", rule, match_values)
 
@@ -5900,7 +6710,7 @@ class Brain(object):
 
         #print("ASSUMPTIONS", assumptions)
 
-        if assumptions == True_:
+        if assumptions is True_:
             return match_values
         else:
             return None
@@ -5946,6 +6756,8 @@ class Brain(object):
 
 
 
+Brain._simple_dispatch = simple_dispatch_table(Brain)
+
 class FungrimBrain(Brain):
 
     def __init__(self, *args, **kwargs):
@@ -5986,11 +6798,21 @@ class FungrimBrain(Brain):
                 content = formula.args()[0]
                 if content.head() == Equal and len(content.args()) == 2:
                     eid = entry.id()
-                    lhs_head = content.args()[0].head()
-                    if lhs_head in self.match_db:
-                        self.match_db[lhs_head].add(eid)
+                    # A rule can only match calls with the same head and
+                    # the same number of arguments as its left-hand side.
+                    lhs = content.args()[0]
+                    if lhs.is_atom():
+                        continue
+                    key = (lhs.head(), len(lhs.args()))
+                    if key in self.match_db:
+                        self.match_db[key].append(eid)
                     else:
-                        self.match_db[lhs_head] = set([eid])
+                        self.match_db[key] = [eid]
+
+        # Fix the order in which rules are tried, so that ties between
+        # equally simple rewrites are broken the same way in every run.
+        for ids in self.match_db.values():
+            ids.sort()
 
     def simple(self, expr):
         """
@@ -6004,8 +6826,8 @@ class FungrimBrain(Brain):
         if expr.is_atom():
             return expr
 
-        if expr in self.simple_cache:
-            v = self.simple_cache[expr]
+        v = self.simple_cache.get(expr, _MISSING)
+        if v is not _MISSING:
             if v is None:
                 return expr
             return v
@@ -6015,32 +6837,52 @@ class FungrimBrain(Brain):
 
 
         def fungrim_simplify(expr):
-            if expr in self.expr_db:
-                return self.expr_db[expr]
+            v = self.expr_db.get(expr)
+            if v is not None:
+                return v
             if expr.is_atom():
                 return expr
 
+            # Rewriting depends on the assumptions (through simple and
+            # match), so results live in the current context's cache.
+            key = ("fungrim", expr)
+            v = self.simple_cache.get(key)
+            if v is not None:
+                return v
+            v = fungrim_rewrite(expr)
+            self.simple_cache[key] = v
+            return v
+
+        def fungrim_rewrite(expr):
             head = expr.head()
-            expr = head(*(self.simple(arg) for arg in expr.args()))
-            if head in self.match_db:
-                exprs = set((self.rewrite_fungrim(expr, id, recursive=False), id) for id in self.match_db[head])
-                #for e in exprs:
-                #    print(e, self.complexity(e[0]))
-                expr2, id = min(exprs, key=lambda v: self.complexity(v[0]))
-                if expr2 != expr and self.complexity(expr2) < self.complexity(expr):
-                    expr = self.simple(expr2)
+            args = expr.args()
+            expr = head(*(self.simple(arg) for arg in args))
+            ids = self.match_db.get((head, len(args)))
+            if ids is not None:
+                # Keep the first rewrite of least complexity, if it is
+                # simpler than expr itself.
+                best = None
+                best_cost = self.complexity(expr)
+                for id in ids:
+                    expr2 = self.rewrite_fungrim(expr, id, recursive=False)
+                    if expr2 == expr:
+                        continue
+                    cost = self.complexity(expr2)
+                    if cost < best_cost:
+                        best = expr2
+                        best_cost = cost
+                if best is not None:
+                    expr = self.simple(best)
             return expr
 
         if self.expr_db:
             expr = fungrim_simplify(expr)
 
         head = expr.head()
-        if head is not None and head.is_symbol():
-            s = head._symbol
-            f = "simple_" + s
-            if hasattr(self, f):
-                args = expr.args()
-                expr2 = getattr(self, f)(*args)
+        if head is not None and head._symbol is not None:
+            f = self._simple_dispatch.get(head._symbol)
+            if f is not None:
+                expr2 = f(self, *expr.args())
                 if self.expr_db and expr2 != expr:
                     expr2 = fungrim_simplify(expr2)
                 expr = expr2
@@ -6112,10 +6954,29 @@ class TestBrain(object):
         assert b.simple(Element(x, QQ)) == False_
         assert b.simple(NotElement(x, QQ)) == True_
 
+        b = Brain([x], Element(x, HH))
+        assert b.is_positive(Im(x)) is True
+        assert b.is_zero(Im(x)) is False
+        assert b.simple(GreaterEqual(Im(x), 0)) == True_
+        assert b.simple(Element(Sqrt(Im(x)), RR)) == True_
+
     def test_simple(self):
         b = Brain()
         assert b.simple(Element(Add(3, 5), ZZ)) == True_
         assert b.simple(And(Not(False_), Or(True_, False_))) == True_
+        assert b.simple(And(Element(x, RR), Equal(2, 3), Element(y, RR))) == False_
+        assert b.simple(And(Element(x, RR), True_, Element(x, RR), Element(y, RR))) == And(Element(x, RR), Element(y, RR))
+        assert b.simple(Or(Element(x, RR), False_, Element(x, RR))) == Element(x, RR)
+        assert b.simple(Sum(n**2, For(n, 1, 10))) == Expr(385)
+        assert b.simple(Sum(Div(n, 3) - n**3, For(n, -2, 7))) == Div(-2300, 3)
+        assert b.simple(Sum(Div(1, n*(n+1)), For(n, 1, 10))) == Div(10, 11)
+        assert b.simple(Sum(n**3, For(n, 1, 1000))) == Expr(250500250000)
+        assert b.simple(Sum(n**1500, For(n, 1, 3))) == Expr(1 + 2**1500 + 3**1500)
+        assert b.simple(Sum(n**100000, For(n, 1, 2))) == Add(1, Pow(2, 100000))
+        assert b.simple(Floor(Div(-7, 2))) == Expr(-4)
+        assert b.simple(Ceil(Div(-7, 2))) == Expr(-3)
+        assert b.simple(Sqrt(10**120)) == Expr(10**60)
+        assert b.simple(Sqrt(-(10**40+1)**2)) == Expr(10**40+1) * ConstI
 
     def test_is_positive(self):
         b = Brain()
@@ -6126,6 +6987,44 @@ class TestBrain(object):
         assert b.is_positive(Pi - 3) is True
         assert b.is_positive(Pi - 4) is False
 
+    def test_cached_predicates(self):
+        b = Brain([x], Element(x, RR))
+        assert b.is_integer(x) is None
+        assert b.is_integer(x) is None
+        with b.assuming(Element(x, ZZ)):
+            assert b.is_integer(x) is True
+        assert b.is_integer(x) is None
+        assert b.element(x, RR) is True
+        assert b.element(x, ZZ) is None
+        with b.assuming(Element(x, ZZ)):
+            assert b.outer_caches[0][("element", x, RR)] is True
+            assert b.element(x, RR) is True
+            assert b.element(x, ZZ) is True
+        assert b.element(x, ZZ) is None
+        assert ("element", x, RR) in b.simple_cache
+        b.clear_cache()
+        assert ("element", x, RR) not in b.simple_cache
+        assert b.element(x, RR) is True
+
+    def test_enclosure_cache(self):
+        b = Brain([x], Element(x, RR))
+        assert b.complex_enclosure(Pi) is not None
+        v = b.arb_cache[Pi]
+        with b.assuming(Element(x, ZZ)):
+            assert b.arb_cache[Pi] is v
+        assert b.arb_cache[Pi] is v
+
+    def test_complexity(self):
+        b = Brain()
+        assert b.complexity(Expr(3)) == 3
+        assert b.complexity(Expr(-3)) == 4
+        c = b.complexity(Neg)
+        assert b.complexity(Neg(3)) == c + 2*3 + 1
+        expr = Expr(3)
+        for k in range(200):
+            expr = Neg(expr)
+        assert b.complexity(expr) == (c + 1) * (2**200 - 1) + 3 * 2**200
+
     def test_is_algebraic(self):
         b = Brain()
         assert b.is_algebraic(ConstI) is True
@@ -6150,9 +7049,15 @@ class TestBrain(object):
         assert b.element(Expr(3) * Expr(-4) + Pow(5, 2) - Expr(1), ZZ) is True
         assert b.element(Factorial(10**20), ZZ) is True
         assert b.element(Pi, ZZ) is False
+        assert b.element(Expr(997), PP) is True
+        assert b.element(Expr(999), PP) is False
         assert b.element(Pi, Set(Pi)) is True
         assert b.element(Pi, Union(ZZ, Set(Pi))) is True
         assert b.element(Pi, SetMinus(RR, QQ)) is True
+        assert b.element(Pi, Union(ZZ, QQ)) is False
+        assert b.element(Pi, Intersection(RR, QQ)) is False
+        assert b.element(Pi, Intersection(RR, CC)) is True
+        assert b.element(Expr(3), SetMinus(ZZ, Set(3))) is False
         assert b.element(Div(3, 2), ZZ) in (False, None)  # todo: implement calculation
 
         points = [-Infinity, Expr(-3), Expr(0), Expr(3), Infinity, ConstI]
@@ -6252,6 +7157,26 @@ class TestBrain(object):
         assert b.equal(Expr(3), Expr(-3)) is False
         assert b.equal(Expr(3), Pi) is False
         assert b.equal(Expr(3), ConstI) is False
+        assert b.equal(Div(1, 3), Div(2, 6)) is True
+        assert b.equal(Div(1, 3), Div(1, 2) - Div(1, 6)) is True
+        assert b.equal(Div(1, 3), Div(1, 4)) is False
+        assert b.equal(1+x, x+1) is None
+        assert b.simple(Equal(Pi, Pi, Pi)) == True_
+        assert b.simple(Equal(Pi, Pi, 3, Pi)) == False_
+        assert b.simple(Equal(x, x, Pi)) == Equal(x, x, Pi)
+
+    def test_order(self):
+        b = Brain()
+        for a, c in [(Expr(2), Expr(3)), (Expr(2), Pi), (-Infinity, Pi), (Pi, Infinity), (-Infinity, Infinity)]:
+            assert b.simple(Less(a, c)) == True_
+            assert b.simple(LessEqual(a, c)) == True_
+            assert b.simple(Greater(a, c)) == False_
+            assert b.simple(GreaterEqual(a, c)) == False_
+            assert b.simple(Greater(c, a)) == True_
+            assert b.simple(GreaterEqual(c, a)) == True_
+        assert b.simple(Less(Pi, Pi)) == False_
+        assert b.simple(LessEqual(Infinity, Infinity)) == True_
+        assert b.simple(Greater(-Infinity, -Infinity)) == False_
 
     def test_Sqrt(self):
         b = Brain()
@@ -6336,6 +7261,14 @@ class TestBrain(object):
         assert Cases(Tuple(x / x, NotEqual(x, 0)), Tuple(2, Equal(x, 0))).eval(Element(x, CC)) == Cases(Tuple(1, NotEqual(x, 0)), Tuple(2, Equal(x, 0)))
         assert Cases(Tuple(3, Equal(x, 0)), Tuple(x / x, Otherwise)).eval(Element(x, CC)) == Cases(Tuple(3, Equal(x, 0)), Tuple(1, Otherwise))
 
+    def test_match(self):
+        b = Brain()
+        assert b.match(Sin(2)**2 + Cos(2)**2, Sin(x)**2 + Cos(x)**2, [x]) == {x: Expr(2)}
+        assert b.match(Sin(2)**2 + Cos(3)**2, Sin(x)**2 + Cos(x)**2, [x]) is None
+        assert b.match(Sin(2) + 1, Sin(x) + y, [x, y]) == {x: Expr(2), y: Expr(1)}
+        assert b.match(Sin(2, 1), Sin(x), [x]) is None
+        assert b.match(Gamma(Div(1,2)), Gamma(x), [x], Element(x, ZZ)) is None
+
     def test_fungrim(self):
         b = FungrimBrain()
         assert b.simple(RiemannZeta(2) / Pi**2) == Div(1,6)
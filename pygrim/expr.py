@@ -1,10 +1,32 @@
 # -*- coding: utf-8 -*-
 
+import weakref
+
 int_types = (int, type(1<<128))
 
 katex_function = []
 
+# Integer atoms in this range are shared instances, see Expr.__new__.
 int_cache = {}
+int_cache_min = -128
+int_cache_max = 256
+
+# Symbol atoms are always shared instances, so that builtin constants
+# such as True_ or Infinity can be tested with "is".
+symbol_cache = {}
+
+# Non-atomic expressions are hash-consed: at any time there is at most one
+# live instance per (head, args) tuple, so structural equality of
+# non-atomic expressions is object identity. The table holds weak
+# references so that it does not keep expressions alive.
+call_cache = {}
+
+class _CallRef(weakref.ref):
+    __slots__ = ("key",)
+
+def _call_cache_remove(ref):
+    if call_cache.get(ref.key) is ref:
+        del call_cache[ref.key]
 
 def escape_title(name):
     # paren = name.find("(")
@@ -34,6 +56,8 @@ class Expr(object):
     perform structural comparison.
     """
 
+    __slots__ = ("_hash", "_symbol", "_integer", "_text", "_args", "_str", "_symbol_set", "__weakref__")
+
     def __new__(self, arg=None, symbol_name=None, call=None):
         """
         Expr(expr) creates a copy of expr (this may actually return
@@ -47,23 +71,52 @@ class Expr(object):
         """
         if isinstance(arg, Expr):
             return arg
+        if type(arg) is int:
+            v = int_cache.get(arg)
+            if v is not None:
+                return v
+        elif symbol_name is not None:
+            v = symbol_cache.get(symbol_name)
+            if v is not None:
+                return v
         self = object.__new__(Expr)
         self._hash = None
         self._symbol = None
         self._integer = None
         self._text = None
         self._args = None
+        self._str = None
+        self._symbol_set = None
         if symbol_name is not None:
             self._symbol = symbol_name
+            self._hash = hash(symbol_name)
+            symbol_cache[symbol_name] = self
         elif isinstance(arg, str):
             self._text = arg
+            self._hash = hash(arg)
         elif isinstance(arg, int_types):
             if isinstance(arg, bool):
                 return [False_, True_][arg]
             self._integer = int(arg)
+            self._hash = hash(self._integer)
+            # int subclasses miss the lookup above; never replace
+            # the canonical instance, since callers compare with `is`
+            if int_cache_min <= self._integer <= int_cache_max:
+                return int_cache.setdefault(self._integer, self)
         elif call is not None:
-            self._args = tuple(Expr(obj) for obj in call)
-            assert len(self._args) >= 1
+            args = tuple(obj if type(obj) is Expr else Expr(obj) for obj in call)
+            assert len(args) >= 1
+            ref = call_cache.get(args)
+            if ref is not None:
+                v = ref()
+                if v is not None:
+                    return v
+            self._args = args
+            # the hashes of the arguments are already known, so this is cheap
+            self._hash = hash(args)
+            ref = _CallRef(self, _call_cache_remove)
+            ref.key = args
+            call_cache[args] = ref
         elif isinstance(arg, list):
             return List(*(Expr(x) for x in arg))
         elif isinstance(arg, tuple):
@@ -125,13 +178,14 @@ class Expr(object):
         return self
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if type(self) != type(other):
             return False
-        if hash(self) != hash(other):
+        # distinct non-atomic expressions are never equal (hash-consing)
+        if self._args is not None or other._args is not None:
             return False
-        if self._args is not None:
-            if other._args is not None:
-                return self._args == other._args
+        if self._hash != other._hash:
             return False
         if self._symbol is not None:
             if other._symbol is not None:
@@ -151,19 +205,13 @@ class Expr(object):
         return not (self == other)
 
     def __hash__(self):
-        if self._hash is None:
-            if self._symbol is not None:
-                self._hash = hash(self._symbol)
-            elif self._integer is not None:
-                self._hash = hash(self._integer)
-            elif self._text is not None:
-                self._hash = hash(self._text)
-            else:
-                self._hash = hash(self._args)
+        # computed on construction
         return self._hash
 
     def __int__(self):
-        return int(self._integer)
+        if self._integer is None:
+            raise TypeError("not an integer: %s" % self)
+        return self._integer
 
     def is_atom(self):
         """Returns True if self is an atom (symbol, integer or text),
@@ -237,8 +285,13 @@ class Expr(object):
             s = self._text.replace('"', '\\"')
             return '"' + s + '"'
         elif self._args is not None:
-            fstr = self._args[0].str(level, **kwargs)
-            argstrs = [arg.str(level+1, **kwargs) for arg in self._args[1:]]
+            if kwargs:
+                fstr = self._args[0].str(level, **kwargs)
+                argstrs = [arg.str(level+1, **kwargs) for arg in self._args[1:]]
+            else:
+                # shared subexpressions reuse their memoized strings
+                fstr = str(self._args[0])
+                argstrs = [str(arg) for arg in self._args[1:]]
             if self._args[0] == Entry:
                 s = fstr + "(" + ",\n    ".join(argstrs) + ")"
             else:
@@ -250,7 +303,10 @@ class Expr(object):
     def __str__(self):
         #if self.is_integer():
         #    return "Expr(%s)" % int(self)
-        return self.str()
+        s = self._str
+        if s is None:
+            s = self._str = self.str()
+        return s
 
     def __repr__(self):
         #if self.is_integer():
@@ -393,6 +449,21 @@ class Expr(object):
         search(self, bound)
         return frozenset(variables)
 
+    def _symbols_frozenset(self):
+        """
+        The set of all symbols in this expression, memoized on the node.
+        """
+        s = self._symbol_set
+        if s is None:
+            if self._symbol is not None:
+                s = frozenset((self,))
+            elif self._args is None:
+                s = frozenset()
+            else:
+                s = frozenset().union(*(arg._symbols_frozenset() for arg in self._args))
+            self._symbol_set = s
+        return s
+
     def replace(self, rules, semantic=False):
         """
         Replace subexpressions of self with exact matches in the given
@@ -403,6 +474,13 @@ class Expr(object):
             return rules[self]
         if self.is_atom() or not rules:
             return self
+        # nothing to do if all keys are symbols not occurring in self
+        symbols = self._symbols_frozenset()
+        for key in rules:
+            if type(key) is not Expr or key._symbol is None or key in symbols:
+                break
+        else:
+            return self
         if not semantic:
             return Expr(call=(arg.replace(rules, semantic=False) for arg in self._args))
         expr = self
@@ -527,12 +605,13 @@ class Expr(object):
             >>> list(And(And(a, b), c).head_args_flattened(Or))
             [And(And(a, b), c)]
         """
-        if self.head() == head:
-            for x in self.args():
-                for t in x.head_args_flattened(head):
-                    yield t
-        else:
-            yield self
+        stack = [self]
+        while stack:
+            x = stack.pop()
+            if x.head() == head:
+                stack.extend(reversed(x.args()))
+            else:
+                yield x
 
     def latex(self, in_small=False, **kwargs):
         from .latex import latex
@@ -1306,6 +1385,32 @@ class TestExpr:
                 getattr(self, method)()
                 print("OK!")
 
+    def test_int_cache(self):
+        assert Expr(0) is Expr(0)
+        assert Expr(-1) is Expr(-1)
+        assert Expr(10**30) == Expr(10**30)
+        assert Expr(3) == Expr(3) and hash(Expr(3)) == hash(3)
+        import enum
+        class E(enum.IntEnum):
+            ZERO = 0
+        zero = Expr(0)
+        assert Expr(E.ZERO) is zero
+        assert Expr(0) is zero and type(zero._integer) is int
+
+    def test_symbol_cache(self):
+        assert Expr(symbol_name="Infinity") is Infinity
+        assert Expr(True) is True_
+        assert Expr(symbol_name="x") is x
+
+    def test_hash_consing(self):
+        assert Add(x, 10**30) is Add(x, Expr(10**30))
+        assert Sin(x + 1) is Sin(Add(x, 1))
+        assert Sin(x + 1) != Sin(x + 2)
+        assert hash(Sin(x + 1)) == hash(Sin(Add(x, 1)))
+        e = Sin(x + 1)
+        assert str(e) == "Sin(Add(x, 1))"
+        assert str(e) is str(Sin(Add(x, 1)))
+
     def test_free_variables(self):
         assert (x+y+1).free_variables() == set([x, y])
         assert (Pi+1).free_variables() == set()
@@ -1334,6 +1439,9 @@ class TestExpr:
                 Where(Sum(a_(i) * 5, For(i, 1, n)), Def(Tuple(a_(i), For(i, 1, n)), S))
         assert Where(f(b), Def(f(z), z+a)).replace({f:g}, semantic=True) == Where(f(b), Def(f(z), z+a))
         assert Where(f(b), Def(f(z), z+a)).replace({f:g, z:w}, semantic=True) == Where(f(b), Def(f(z), z+a))
+        e = Sin(x+1) * Cos(y)
+        assert e.replace({z:2}) is e
+        assert e.replace({Cos(y):3}) == Sin(x+1) * 3
         assert Where(f(b), Def(f(z), z+a), Def(b, f(a))).replace({f:g, z:w}, semantic=True) == Where(f(b), Def(f(z), z+a), Def(b, f(a)))
         assert Where(f(b), Def(f(z), z+a)).replace({f:g, z:w, a:b, b:a}, semantic=True) == Where(f(a), Def(f(z), z+b))
         assert Where(a*d-b*c+e, Def(Matrix2x2(a, b, c, d), M)).replace({a:2, M:S, e:7}, semantic=True) == Where(a*d-b*c+7, Def(Matrix2x2(a, b, c, d), S))